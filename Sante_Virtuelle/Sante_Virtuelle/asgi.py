@@ -13,18 +13,23 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Sante_Virtuelle.settings')
+
 from django.core.asgi import get_asgi_application
+
+# Initialiser Django avant d'importer les consumers (qui importent les modèles)
+django_asgi_app = get_asgi_application()
+
 from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
 from sante_app import routing
-
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Sante_Virtuelle.settings')
+from sante_app.middleware import JWTAuthMiddlewareStack
 
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
-    "websocket": AuthMiddlewareStack(
+    "http": django_asgi_app,
+    # Jeton JWT (?token=) ou session Django
+    "websocket": JWTAuthMiddlewareStack(
         URLRouter(
             routing.websocket_urlpatterns
         )
     ),
-})
\ No newline at end of file
+})
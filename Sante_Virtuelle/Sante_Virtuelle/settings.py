@@ -237,14 +237,144 @@ SIMPLE_JWT = {
 }
 
 # ============================================
-# CHANNELS CONFIGURATION FOR WEBSOCKET
+# CACHE CONFIGURATION
 # ============================================
 
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-    },
+# CACHE_REDIS_URL : cache partagé entre workers (grilles de disponibilité,
+# cache public, compteurs tamponnés...). Obligatoire dès qu'il y a plusieurs
+# workers : LocMemCache est propre à chaque processus, une invalidation faite
+# par un worker n'atteint pas les autres.
+# L'alias 'lecteurs' reçoit les marqueurs éphémères de dédoublonnage des vues
+# (voir sante_app/compteur_vues.py) : CACHE_LECTEURS_REDIS_URL peut désigner
+# une autre instance Redis pour qu'ils n'évincent jamais le cache principal.
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', '')
+
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+            'KEY_PREFIX': 'asv',
+        },
+        'lecteurs': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('CACHE_LECTEURS_REDIS_URL', CACHE_REDIS_URL),
+            'KEY_PREFIX': 'asv-lecteurs',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'sante-virtuelle',
+            'OPTIONS': {
+                'MAX_ENTRIES': 10000,
+            },
+        },
+        'lecteurs': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'sante-virtuelle-lecteurs',
+            'OPTIONS': {
+                'MAX_ENTRIES': 10000,
+            },
+        },
+    }
+
+# ============================================
+# NOTIFICATIONS EMAIL (OUTBOX)
+# ============================================
+
+NOTIFICATION_OUTBOX_BATCH_SIZE = 50     # emails par lot
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS = 5    # essais avant échec définitif
+NOTIFICATION_OUTBOX_BACKOFF = 60        # secondes, doublé à chaque échec
+NOTIFICATION_OUTBOX_LEASE = 600         # secondes de bail d'un lot réservé (> durée d'envoi d'un lot)
+NOTIFICATION_OUTBOX_INTERVAL = 15       # secondes entre deux passages du scheduler
+NOTIFICATION_RATE_LIMIT = 0             # emails par seconde (0 = pas de limite)
+NOTIFICATION_MESSAGES_PER_CONNECTION = 100  # emails par connexion SMTP avant reconnexion
+URGENCE_MAX_MEDECINS_NOTIFIES = 5       # médecins alertés par urgence (0 = tous les disponibles)
+
+# Rappels de rendez-vous : type de rappel -> délai avant le rendez-vous (minutes)
+APPOINTMENT_REMINDER_LEAD_TIMES = {
+    '24h': 24 * 60,
+    '2h': 2 * 60,
+    '15min': 15,
 }
+APPOINTMENT_REMINDER_INTERVAL = 5       # minutes entre deux passages du scheduler
+
+# Coordination du scheduler entre workers (voir sante_app/verrous.py)
+SCHEDULER_COORDINATION = os.environ.get('SCHEDULER_COORDINATION', 'bail')  # 'bail' ou 'aucune'
+SCHEDULER_LEASE_RATIO = 0.9             # part de l'intervalle d'une tâche couverte par son bail
+SCHEDULER_HISTORY_DAYS = 14             # jours d'historique des exécutions (ExecutionTache) conservés
+
+# Tableaux de bord (voir sante_app/statistiques.py)
+STATISTICS_CACHE_TIMEOUT = 60           # secondes de validité d'un instantané
+STATISTICS_DAILY_ROLLUP = os.environ.get('STATISTICS_DAILY_ROLLUP', 'False') == 'True'
+STATISTICS_ROLLUP_RECALCUL_JOURS = 7    # jours consolidés recalculés chaque nuit
+
+# Endpoints anonymes en stale-while-revalidate (voir sante_app/cache_public.py)
+PUBLIC_CACHE_REFRESH = 60               # secondes avant recalcul d'une valeur
+PUBLIC_CACHE_STALE_TTL = 24 * 60 * 60   # durée de conservation d'une valeur périmée
+PUBLIC_CACHE_WAIT = 2                   # attente max (secondes) sur un cache froid
+
+# Recherche plein texte (voir sante_app/recherche.py et sante_app/index_memoire.py)
+SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'base')   # 'base' ou 'memoire' (un seul processus)
+SEARCH_INDEX_PATH = os.environ.get('SEARCH_INDEX_PATH') or None  # instantané de l'index en mémoire
+SEARCH_MEMORY_MAX_RESULTS = 200         # résultats classés au plus par recherche
+
+# Recherche des centres de santé à proximité (voir sante_app/geo.py)
+GEO_INDEX = os.environ.get('GEO_INDEX', 'memoire')   # 'memoire' (grille) ou 'base' (boîte englobante SQL)
+GEO_GRID_CELL_DEG = 0.05                # taille d'une cellule de la grille (environ 5,5 km)
+GEO_GRID_CHECK_INTERVAL = 10            # secondes entre deux lectures de la version de la grille en base
+
+# Vues des articles tamponnées dans le cache (voir sante_app/compteur_vues.py) ;
+# le tampon exige CACHE_REDIS_URL (vérifié au démarrage)
+ARTICLE_VIEWS_BUFFERED = os.environ.get('ARTICLE_VIEWS_BUFFERED', 'False') == 'True'
+ARTICLE_VIEWS_FLUSH_INTERVAL = 60       # secondes entre deux reports en base
+ARTICLE_VIEWS_DEDUP_WINDOW = 30 * 60    # une vue par lecteur et par article sur la fenêtre (0 : aucune)
+ARTICLE_VIEWS_DEDUP_CACHE = 'lecteurs'  # alias du cache des marqueurs de dédoublonnage
+
+# ============================================
+# CHANNELS CONFIGURATION FOR WEBSOCKET
+# ============================================
+
+# CHANNEL_REDIS_URL : une ou plusieurs URL Redis séparées par des virgules
+# (ex. "redis://redis-1:6379/0,redis://redis-2:6379/0"). Avec plusieurs URL,
+# channels_redis répartit les groupes (user_<id>, consultation_<id>) et les
+# canaux entre les serveurs par crc32(nom) modulo le nombre d'URL : tous les
+# workers doivent avoir la même liste, dans le même ordre, et ajouter ou
+# retirer un serveur déplace la plupart des groupes (les abonnements en cours
+# sont perdus jusqu'à la reconnexion des clients). Sans URL, on garde la couche
+# en mémoire : un seul worker ASGI (développement, tests).
+CHANNEL_REDIS_HOSTS = [
+    url.strip() for url in os.environ.get('CHANNEL_REDIS_URL', '').split(',') if url.strip()
+]
+
+if CHANNEL_REDIS_HOSTS:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {
+                'hosts': CHANNEL_REDIS_HOSTS,
+                'prefix': os.environ.get('CHANNEL_LAYER_PREFIX', 'asv'),
+                # Durée de vie d'un message non lu (client déconnecté), en secondes
+                'expiry': int(os.environ.get('CHANNEL_LAYER_EXPIRY', 60)),
+                # Un canal qui ne renouvelle pas son appartenance quitte le groupe
+                'group_expiry': int(os.environ.get('CHANNEL_LAYER_GROUP_EXPIRY', 24 * 60 * 60)),
+                # Messages en attente par canal avant ChannelFull
+                'capacity': int(os.environ.get('CHANNEL_LAYER_CAPACITY', 200)),
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+
+# Écriture groupée des messages de chat (voir sante_app/chat_buffer.py)
+CHAT_BUFFER_DELAY_MS = 10               # délai max avant l'écriture d'un lot
+CHAT_BUFFER_MAX_MESSAGES = 100          # taille max d'un lot
 
 # ============================================
 # AGORA CONFIGURATION FOR VIDEO CONSULTATION
@@ -27,4 +27,10 @@ PASSWORD_HASHERS = [
 ]
 
 # Disable logging during tests
-LOGGING_CONFIG = None
\ No newline at end of file
+LOGGING_CONFIG = None
+# WebSocket : couche en mémoire, même si CHANNEL_REDIS_URL est défini
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
@@ -7,7 +7,9 @@ from .models import (
     Constante, Mesure, Article,
     StructureDeSante, Service, User, Hopital,Clinique,Dentiste,Pharmacie,ContactFooter,
     ChatbotConversation, RappelMedicament, HistoriquePriseMedicament,
-    Urgence, NotificationUrgence, AuditLog  # Added AuditLog
+    Urgence, NotificationUrgence, AuditLog,  # Added AuditLog
+    NotificationOutbox, RappelRendezVous, BailTache, ExecutionTache, CompteurNonLus,
+    StatistiqueJournaliere, EtablissementSante
 )
 
 # -------------------- Patient --------------------
@@ -258,3 +260,63 @@ class NotificationUrgenceAdmin(admin.ModelAdmin):
     list_filter = ("lue", "date_envoi")
     search_fields = ("urgence__type_urgence", "medecin__user__username")
     readonly_fields = ("date_envoi",)
+
+
+# -------------------- Outbox des emails --------------------
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ("sujet", "statut", "tentatives", "prochaine_tentative", "date_creation", "date_envoi")
+    list_filter = ("statut", "date_creation")
+    search_fields = ("sujet", "destinataires")
+    readonly_fields = ("date_creation", "date_envoi", "derniere_erreur")
+
+
+# -------------------- Rappels de rendez-vous envoyés --------------------
+@admin.register(RappelRendezVous)
+class RappelRendezVousAdmin(admin.ModelAdmin):
+    list_display = ("rendez_vous", "type_rappel", "date_envoi")
+    list_filter = ("type_rappel", "date_envoi")
+    readonly_fields = ("date_envoi",)
+
+
+# -------------------- Coordination du scheduler --------------------
+@admin.register(BailTache)
+class BailTacheAdmin(admin.ModelAdmin):
+    list_display = ("nom", "proprietaire", "expire_le")
+
+
+@admin.register(ExecutionTache)
+class ExecutionTacheAdmin(admin.ModelAdmin):
+    list_display = ("tache", "debut", "duree_ms", "statut", "lignes_lues", "envois", "proprietaire")
+    list_filter = ("tache", "statut")
+    readonly_fields = ("tache", "proprietaire", "debut", "duree_ms", "statut", "lignes_lues", "envois", "erreur")
+
+
+# -------------------- Compteurs de non-lus --------------------
+@admin.register(CompteurNonLus)
+class CompteurNonLusAdmin(admin.ModelAdmin):
+    list_display = ("user", "messages", "notifications", "urgences", "date_maj")
+    search_fields = ("user__username",)
+    list_select_related = ("user",)
+
+
+# -------------------- Statistiques --------------------
+@admin.register(StatistiqueJournaliere)
+class StatistiqueJournaliereAdmin(admin.ModelAdmin):
+    list_display = ("jour", "total", "en_attente", "confirmes", "reprogrammes", "annules", "termines", "date_calcul")
+    date_hierarchy = "jour"
+
+
+# -------------------- Établissements (vue de lecture) --------------------
+@admin.register(EtablissementSante)
+class EtablissementSanteAdmin(admin.ModelAdmin):
+    """Recopiée depuis Hopital / Clinique / Pharmacie / Dentiste : consultation seulement"""
+    list_display = ("nom", "type", "source_id", "latitude", "longitude", "date_maj")
+    list_filter = ("type",)
+    search_fields = ("nom", "adresse")
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -9,8 +9,16 @@ class SanteAppConfig(AppConfig):
 
     def ready(self):
         # Import here to avoid AppRegistryNotReady exception
+        from django.db.models.signals import post_migrate
         from .scheduler import scheduler
+        from . import compteur_vues, recherche
         from . import signals  # Import signals to register them
+
+        # Vues tamponnées : refuser de démarrer sans cache partagé
+        compteur_vues.verifier_configuration()
+
+        # Index / tables de recherche plein texte, selon la base
+        post_migrate.connect(recherche.installer, sender=self)
         
         # Start the scheduler
         try:
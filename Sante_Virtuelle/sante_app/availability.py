@@ -0,0 +1,400 @@
+"""
+Moteur de disponibilité des médecins.
+
+Chaque journée d'un médecin est représentée par une grille compacte de
+créneaux (un octet par créneau) mise en cache :
+
+- ``reservations`` compte les rendez-vous actifs qui démarrent dans le créneau ;
+- ``blocages`` indique si le créneau tombe pendant la pause déjeuner ou
+  pendant une indisponibilité déclarée.
+
+La grille est construite une seule fois (trois requêtes au maximum) puis
+invalidée après le COMMIT des écritures qui la concernent (réservation,
+annulation, changement de statut, planning, indisponibilité). Chaque grille
+porte la version du médecin lue *avant* ses requêtes ; une invalidation donne
+au médecin une nouvelle version, jeton aléatoire jamais réutilisé, et
+``_lire`` rejette toute grille d'une autre version. Une lecture qui a vu la
+base avant le COMMIT d'une réservation et remet sa grille en cache après
+l'invalidation ne peut donc pas servir une grille périmée. Si la clé de
+version est évincée, la lecture suivante en crée une nouvelle et toutes les
+grilles existantes du médecin sont ignorées.
+
+Une transaction annulée ne touche pas au cache, et aucune grille n'est
+modifiée sur place (pas de lecture-modification-écriture concurrente).
+
+Avec plusieurs workers, le cache doit être partagé (CACHE_REDIS_URL, voir
+settings.py) : avec LocMemCache, l'invalidation n'atteint que le processus qui
+a écrit.
+
+Les journées sont indexées par l'id *User* du médecin, comme ``RendezVous.medecin``.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+import logging
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Statuts qui occupent un créneau (un RDV reprogrammé occupe sa nouvelle heure)
+STATUTS_ACTIFS = ('PENDING', 'CONFIRMED', 'RESCHEDULED')
+
+JOURS_SEMAINE = ['lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi', 'samedi', 'dimanche']
+
+# Codes de blocage d'un créneau
+LIBRE = 0
+PAUSE = 1
+INDISPONIBLE = 2
+
+MOTIFS = {
+    PAUSE: "Pause déjeuner",
+    INDISPONIBLE: "Médecin indisponible",
+}
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def jour_semaine(date_obj):
+    """Nom français du jour de la semaine ('lundi', ...)"""
+    return JOURS_SEMAINE[date_obj.weekday()]
+
+
+def _minutes(heure):
+    return heure.hour * 60 + heure.minute
+
+
+def _as_date(value):
+    if isinstance(value, str):
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    return value
+
+
+def _as_time(value):
+    if isinstance(value, str):
+        fmt = '%H:%M:%S' if value.count(':') == 2 else '%H:%M'
+        return datetime.strptime(value, fmt).time()
+    return value
+
+
+class JourneeMedecin:
+    """Grille des créneaux d'un médecin pour une date donnée"""
+
+    __slots__ = ('date', 'debut', 'duree', 'reservations', 'blocages', 'version')
+
+    def __init__(self, date, debut=None, duree=None, nombre=0, version=0):
+        self.date = date
+        self.debut = debut          # minutes depuis minuit, None si le médecin ne travaille pas
+        self.duree = duree          # durée d'un créneau en minutes
+        self.reservations = bytearray(nombre)
+        self.blocages = bytearray(nombre)
+        self.version = version
+
+    @property
+    def travaille(self):
+        return self.debut is not None
+
+    def index(self, heure):
+        """Index du créneau contenant ``heure`` ou None"""
+        if not self.travaille:
+            return None
+        offset = _minutes(heure) - self.debut
+        if offset < 0:
+            return None
+        idx = offset // self.duree
+        return idx if idx < len(self.reservations) else None
+
+    def heure(self, idx):
+        total = self.debut + idx * self.duree
+        return time(total // 60, total % 60)
+
+    def ajuster(self, heure, delta):
+        """Ajoute ``delta`` réservations au créneau contenant ``heure``"""
+        idx = self.index(heure)
+        if idx is None:
+            return False
+        self.reservations[idx] = max(0, min(255, self.reservations[idx] + delta))
+        return True
+
+    def creneaux(self, maintenant=None):
+        """
+        Liste des créneaux au format de l'API ``creneaux_disponibles``.
+        Les créneaux passés sont calculés à la lecture, jamais mis en cache.
+        """
+        maintenant = maintenant or timezone.now()
+        # Pour aujourd'hui, un créneau qui commence à la minute courante est déjà passé
+        limite = _minutes(maintenant.time()) if self.date == maintenant.date() else -1
+
+        slots = []
+        for idx in range(len(self.reservations)):
+            minutes = self.debut + idx * self.duree
+            motif = None
+            if minutes <= limite:
+                motif = "Heure passée"
+            elif self.blocages[idx]:
+                motif = MOTIFS[self.blocages[idx]]
+            elif self.reservations[idx]:
+                motif = "Déjà réservé"
+            slots.append({
+                'heure': f"{minutes // 60:02d}:{minutes % 60:02d}",
+                'disponible': motif is None,
+                'motif_indisponibilite': motif,
+            })
+        return slots
+
+    def creneaux_libres(self, apres=None):
+        """Itère sur les heures libres de la journée (strictement après ``apres``)"""
+        limite = _minutes(apres) if apres is not None else -1
+        for idx in range(len(self.reservations)):
+            if self.blocages[idx] or self.reservations[idx]:
+                continue
+            if self.debut + idx * self.duree <= limite:
+                continue
+            yield self.heure(idx)
+
+    def __getstate__(self):
+        return (self.date, self.debut, self.duree, bytes(self.reservations),
+                bytes(self.blocages), self.version)
+
+    def __setstate__(self, state):
+        (self.date, self.debut, self.duree, reservations, blocages, self.version) = state
+        self.reservations = bytearray(reservations)
+        self.blocages = bytearray(blocages)
+
+
+def construire_journee(date_obj, disponibilite, indisponibilites=(), heures_reservees=(), version=0):
+    """
+    Construit la grille d'une journée à partir de données déjà chargées.
+
+    ``disponibilite`` est la DisponibiliteMedecin active du jour (ou None),
+    ``indisponibilites`` les IndisponibiliteMedecin couvrant la date et
+    ``heures_reservees`` les heures des rendez-vous actifs de la journée.
+    """
+    if disponibilite is None:
+        return JourneeMedecin(date_obj, version=version)
+
+    debut = _minutes(disponibilite.heure_debut)
+    fin = _minutes(disponibilite.heure_fin)
+    duree = disponibilite.duree_consultation or 30
+    nombre = max(0, -(-(fin - debut) // duree))
+    journee = JourneeMedecin(date_obj, debut, duree, nombre, version)
+
+    pause_debut = disponibilite.pause_dejeuner_debut
+    pause_fin = disponibilite.pause_dejeuner_fin
+    plages_indispo = []
+    for indispo in indisponibilites:
+        if indispo.toute_la_journee or not (indispo.heure_debut and indispo.heure_fin):
+            plages_indispo = [(0, 24 * 60)]
+            break
+        plages_indispo.append((_minutes(indispo.heure_debut), _minutes(indispo.heure_fin)))
+
+    for idx in range(nombre):
+        minutes = debut + idx * duree
+        if pause_debut and pause_fin and _minutes(pause_debut) <= minutes < _minutes(pause_fin):
+            journee.blocages[idx] = PAUSE
+        elif any(a <= minutes < b for a, b in plages_indispo):
+            journee.blocages[idx] = INDISPONIBLE
+
+    for heure in heures_reservees:
+        journee.ajuster(heure, 1)
+    return journee
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+def _cle_version(medecin_user_id):
+    return f"disponibilite:v:{medecin_user_id}"
+
+
+def _cle_journee(medecin_user_id, date_obj):
+    return f"disponibilite:{medecin_user_id}:{date_obj.isoformat()}"
+
+
+def _nouvelle_version():
+    return uuid.uuid4().hex
+
+
+def _creer_version(medecin_user_id):
+    """
+    Version d'un médecin dont la clé est absente (jamais invalidé, ou évincé).
+    Si une invalidation a posé une version entre-temps, la grille construite
+    par l'appelant date peut-être d'avant l'écriture : elle reçoit alors une
+    version à usage unique, jamais valide en cache.
+    """
+    version = _nouvelle_version()
+    if cache.add(_cle_version(medecin_user_id), version, None):
+        return version
+    return _nouvelle_version()
+
+
+def _lire(medecin_user_id, date_obj):
+    """Retourne (journée en cache valide ou None, version courante) en un aller-retour"""
+    cle_version = _cle_version(medecin_user_id)
+    cle_journee = _cle_journee(medecin_user_id, date_obj)
+    valeurs = cache.get_many([cle_version, cle_journee])
+    version = valeurs.get(cle_version)
+    if version is None:
+        return None, _creer_version(medecin_user_id)
+    journee = valeurs.get(cle_journee)
+    if journee is not None and journee.version != version:
+        journee = None
+    return journee, version
+
+
+def charger_journee(medecin, date_obj):
+    """
+    Grille de la journée pour un profil ``Medecin`` : une lecture de cache,
+    ou trois requêtes pour la reconstruire si elle est absente.
+    """
+    from .models import DisponibiliteMedecin, IndisponibiliteMedecin, RendezVous
+
+    journee, version = _lire(medecin.user_id, date_obj)
+    if journee is not None:
+        return journee
+
+    disponibilite = DisponibiliteMedecin.objects.filter(
+        medecin=medecin, jour=jour_semaine(date_obj), actif=True
+    ).first()
+    indisponibilites = []
+    heures = []
+    if disponibilite is not None:
+        indisponibilites = list(IndisponibiliteMedecin.objects.filter(
+            medecin=medecin, date_debut__lte=date_obj, date_fin__gte=date_obj
+        ))
+        heures = RendezVous.objects.filter(
+            medecin_id=medecin.user_id, date=date_obj, statut__in=STATUTS_ACTIFS
+        ).values_list('heure', flat=True)
+
+    journee = construire_journee(date_obj, disponibilite, indisponibilites, heures, version)
+    cache.set(_cle_journee(medecin.user_id, date_obj), journee, CACHE_TIMEOUT)
+    return journee
+
+
+def charger_periode(medecins, date_debut, date_fin):
+    """
+    Grilles de plusieurs médecins sur une période, en trois requêtes
+    (disponibilités, indisponibilités, rendez-vous) quel que soit le nombre de
+    médecins et de jours. Les grilles calculées alimentent aussi le cache.
+
+    Retourne ``{medecin.id: [JourneeMedecin, ...]}`` dans l'ordre des dates.
+    """
+    from .models import DisponibiliteMedecin, IndisponibiliteMedecin, RendezVous
+
+    medecins = list(medecins)
+    if not medecins:
+        return {}
+    medecin_ids = [m.id for m in medecins]
+    user_ids = [m.user_id for m in medecins]
+    nb_jours = (date_fin - date_debut).days + 1
+    dates = [date_debut + timedelta(days=i) for i in range(nb_jours)]
+
+    versions = cache.get_many([_cle_version(user_id) for user_id in user_ids])
+
+    disponibilites = {
+        (d.medecin_id, d.jour): d
+        for d in DisponibiliteMedecin.objects.filter(medecin_id__in=medecin_ids, actif=True)
+    }
+    indisponibilites = defaultdict(list)
+    for indispo in IndisponibiliteMedecin.objects.filter(
+        medecin_id__in=medecin_ids, date_debut__lte=date_fin, date_fin__gte=date_debut
+    ):
+        indisponibilites[indispo.medecin_id].append(indispo)
+    reservations = defaultdict(list)
+    for medecin_user_id, date_rdv, heure in RendezVous.objects.filter(
+        medecin_id__in=user_ids, date__range=(date_debut, date_fin), statut__in=STATUTS_ACTIFS
+    ).values_list('medecin_id', 'date', 'heure'):
+        reservations[(medecin_user_id, date_rdv)].append(heure)
+
+    resultat = {}
+    a_cacher = {}
+    for medecin in medecins:
+        version = versions.get(_cle_version(medecin.user_id))
+        if version is None:
+            version = _creer_version(medecin.user_id)
+        journees = []
+        for date_obj in dates:
+            journee = construire_journee(
+                date_obj,
+                disponibilites.get((medecin.id, jour_semaine(date_obj))),
+                [i for i in indisponibilites[medecin.id] if i.date_debut <= date_obj <= i.date_fin],
+                reservations.get((medecin.user_id, date_obj), ()),
+                version,
+            )
+            journees.append(journee)
+            a_cacher[_cle_journee(medecin.user_id, date_obj)] = journee
+        resultat[medecin.id] = journees
+    cache.set_many(a_cacher, CACHE_TIMEOUT)
+    return resultat
+
+
+def iter_creneaux_libres(medecin, date_debut, horizon, maintenant=None):
+    """
+    Itère sur les créneaux libres ``(date, heure, duree)`` d'un médecin, dans
+    l'ordre chronologique, sur ``horizon`` jours à partir de ``date_debut``.
+
+    Le planning hebdomadaire, les indisponibilités et les rendez-vous de la
+    période sont chargés en trois requêtes ; les journées sont ensuite
+    construites en mémoire au fur et à mesure, ce qui permet à l'appelant
+    d'arrêter l'itération dès qu'il a assez de créneaux.
+    """
+    from .models import DisponibiliteMedecin, IndisponibiliteMedecin, RendezVous
+
+    maintenant = maintenant or timezone.now()
+    date_fin = date_debut + timedelta(days=horizon - 1)
+
+    disponibilites = {
+        d.jour: d for d in DisponibiliteMedecin.objects.filter(medecin=medecin, actif=True)
+    }
+    if not disponibilites:
+        return
+    indisponibilites = list(IndisponibiliteMedecin.objects.filter(
+        medecin=medecin, date_debut__lte=date_fin, date_fin__gte=date_debut
+    ))
+    reservations = defaultdict(list)
+    for date_rdv, heure in RendezVous.objects.filter(
+        medecin_id=medecin.user_id, date__range=(date_debut, date_fin), statut__in=STATUTS_ACTIFS
+    ).values_list('date', 'heure'):
+        reservations[date_rdv].append(heure)
+
+    for i in range(horizon):
+        date_obj = date_debut + timedelta(days=i)
+        disponibilite = disponibilites.get(jour_semaine(date_obj))
+        if disponibilite is None:
+            continue
+        journee = construire_journee(
+            date_obj,
+            disponibilite,
+            [ind for ind in indisponibilites if ind.date_debut <= date_obj <= ind.date_fin],
+            reservations.get(date_obj, ()),
+        )
+        apres = maintenant.time() if date_obj == maintenant.date() else None
+        for heure in journee.creneaux_libres(apres):
+            yield date_obj, heure, journee.duree
+
+
+def invalider_medecin(medecin_user_id):
+    """Invalide toutes les journées en cache d'un médecin (nouvelle version)"""
+    cache.set(_cle_version(medecin_user_id), _nouvelle_version(), None)
+
+
+def invalider_journee(medecin_user_id, date_obj):
+    """
+    Supprime la journée du cache et change la version du médecin : une grille
+    de ce jour construite avant l'écriture et remise en cache après la
+    suppression est rejetée par ``_lire``.
+    """
+    cache.delete(_cle_journee(medecin_user_id, _as_date(date_obj)))
+    invalider_medecin(medecin_user_id)
+
+
+def invalider_journee_apres_commit(medecin_user_id, date_obj):
+    """Invalide la journée une fois la transaction courante validée"""
+    transaction.on_commit(lambda: invalider_journee(medecin_user_id, date_obj))
+
+
+def invalider_medecin_apres_commit(medecin_user_id):
+    transaction.on_commit(lambda: invalider_medecin(medecin_user_id))
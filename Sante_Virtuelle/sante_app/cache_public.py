@@ -0,0 +1,128 @@
+"""
+Cache des endpoints anonymes (stale-while-revalidate).
+
+Une source publique est une fonction sans argument enregistrée avec
+``@source('nom')`` ; ``lire('nom')`` sert son résultat depuis le cache :
+
+    - valeur fraîche (moins de PUBLIC_CACHE_REFRESH secondes) : servie telle quelle ;
+    - valeur périmée : servie immédiatement, et un seul processus la recalcule
+      en arrière-plan (verrou ``cache.add``) ;
+    - pas de valeur (cache froid) : un seul appelant calcule, les autres
+      attendent le résultat au plus PUBLIC_CACHE_WAIT secondes.
+
+Une source dont les données changent peut être invalidée (``invalider``) : la
+requête suivante la recalcule comme sur un cache froid.
+
+Le scheduler rafraîchit aussi les sources déjà servies à chaque
+PUBLIC_CACHE_REFRESH : en régime normal, aucune requête HTTP n'attend la base,
+et la base n'est interrogée qu'une fois par intervalle quel que soit le trafic
+(par processus avec LocMemCache, une fois en tout avec un cache partagé).
+
+Réglages (settings.py) :
+    PUBLIC_CACHE_REFRESH     âge en secondes au-delà duquel une valeur est recalculée (60)
+    PUBLIC_CACHE_STALE_TTL   durée de conservation d'une valeur périmée, en secondes (86400)
+    PUBLIC_CACHE_WAIT        attente maximale sur un cache froid, en secondes (2)
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_SOURCES = {}
+
+VERROU_TIMEOUT = 30
+INTERVALLE_ATTENTE = 0.05
+
+
+def _reglage(nom, defaut):
+    return getattr(settings, nom, defaut)
+
+
+def _cle(nom):
+    return f'public:{nom}'
+
+
+def _cle_verrou(nom):
+    return f'public:{nom}:verrou'
+
+
+def source(nom):
+    """Décorateur : enregistre la fonction comme source publique ``nom``"""
+    def enregistrer(calcul):
+        _SOURCES[nom] = calcul
+        return calcul
+    return enregistrer
+
+
+def rafraichir(nom):
+    """Recalcule la source ``nom``, met le résultat en cache et libère le verrou"""
+    try:
+        valeur = _SOURCES[nom]()
+        cache.set(_cle(nom), (valeur, time.time()), _reglage('PUBLIC_CACHE_STALE_TTL', 24 * 60 * 60))
+        return valeur
+    finally:
+        cache.delete(_cle_verrou(nom))
+
+
+def _rafraichir_en_arriere_plan(nom):
+    def executer():
+        try:
+            rafraichir(nom)
+        except Exception as e:
+            logger.error(f"❌ Rafraîchissement du cache public '{nom}' impossible : {e}")
+        finally:
+            close_old_connections()
+
+    threading.Thread(target=executer, name=f'cache-public-{nom}', daemon=True).start()
+
+
+def lire(nom):
+    """Valeur de la source ``nom``, éventuellement périmée (voir l'en-tête du module)"""
+    entree = cache.get(_cle(nom))
+    if entree is not None:
+        valeur, calcule_le = entree
+        perimee = time.time() - calcule_le >= _reglage('PUBLIC_CACHE_REFRESH', 60)
+        if perimee and cache.add(_cle_verrou(nom), 1, VERROU_TIMEOUT):
+            _rafraichir_en_arriere_plan(nom)
+        return valeur
+
+    if cache.add(_cle_verrou(nom), 1, VERROU_TIMEOUT):
+        return rafraichir(nom)
+
+    # Un autre appelant calcule déjà la valeur : l'attendre plutôt que doubler la requête
+    limite = time.monotonic() + _reglage('PUBLIC_CACHE_WAIT', 2)
+    while time.monotonic() < limite:
+        time.sleep(INTERVALLE_ATTENTE)
+        entree = cache.get(_cle(nom))
+        if entree is not None:
+            return entree[0]
+    logger.warning(f"⚠️ Cache public '{nom}' toujours vide après attente, calcul direct")
+    return _SOURCES[nom]()
+
+
+def invalider(*noms):
+    """Oublie les valeurs en cache des sources ``noms`` (données modifiées)"""
+    cache.delete_many([_cle(nom) for nom in noms])
+
+
+def rafraichir_tout():
+    """
+    Tâche du scheduler : recalcule les sources déjà présentes en cache (une
+    source jamais demandée n'est pas calculée). Retourne le nombre de sources
+    rafraîchies.
+    """
+    rafraichies = 0
+    for nom in list(_SOURCES):
+        if cache.get(_cle(nom)) is None or not cache.add(_cle_verrou(nom), 1, VERROU_TIMEOUT):
+            continue
+        try:
+            rafraichir(nom)
+            rafraichies += 1
+        except Exception as e:
+            logger.error(f"❌ Rafraîchissement du cache public '{nom}' impossible : {e}")
+    return rafraichies
@@ -0,0 +1,147 @@
+"""
+Écriture groupée des messages de chat (write-behind).
+
+Chaque message reçu par un consumer est placé dans un tampon propre à la
+boucle asyncio du processus. Le tampon est vidé au bout de
+CHAT_BUFFER_DELAY_MS millisecondes ou dès qu'il contient
+CHAT_BUFFER_MAX_MESSAGES messages : un seul ``bulk_create`` pour tout le lot
+et, pour la messagerie, un seul UPDATE de ``Conversation.updated_at`` (la date
+du dernier message de chaque conversation du lot).
+
+``ajouter`` ne rend la main qu'après le COMMIT du lot : le consumer
+n'acquitte le message (group_send) qu'une fois celui-ci enregistré. Le tampon
+est partagé par tous les utilisateurs du processus : si le lot échoue, chaque
+message est réécrit seul (dans sa propre transaction) et seul l'appelant dont
+le message échoue encore reçoit l'exception.
+"""
+import asyncio
+import logging
+import weakref
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, DateTimeField, Value, When
+
+logger = logging.getLogger(__name__)
+
+# Un jeu de tampons par boucle asyncio (un processus ASGI = une boucle)
+_tampons = weakref.WeakKeyDictionary()
+
+
+class TamponMessages:
+    """
+    Tampon d'écriture pour un modèle de message. ``champ_conversation`` est le
+    nom du champ dont la cible reçoit la date du dernier message du lot dans
+    ``updated_at`` (None pour ne rien mettre à jour). ``apres_ecriture`` est
+    appelé avec les instances du lot, dans la même transaction.
+    """
+
+    def __init__(self, modele, champ_conversation=None, delai=None, taille_max=None, apres_ecriture=None):
+        self.modele = modele
+        self.champ_conversation = champ_conversation
+        self.apres_ecriture = apres_ecriture
+        self.delai = (delai if delai is not None else getattr(settings, 'CHAT_BUFFER_DELAY_MS', 10)) / 1000
+        self.taille_max = taille_max or getattr(settings, 'CHAT_BUFFER_MAX_MESSAGES', 100)
+        self._attente = []
+        self._minuteur = None
+        self._ecritures = set()
+
+    async def ajouter(self, **champs):
+        """Met un message en file et retourne l'instance enregistrée (avec sa clé primaire)"""
+        boucle = asyncio.get_running_loop()
+        futur = boucle.create_future()
+        self._attente.append((self.modele(**champs), futur))
+
+        if len(self._attente) >= self.taille_max:
+            self._vider()
+        elif self._minuteur is None:
+            self._minuteur = boucle.call_later(self.delai, self._vider)
+        return await futur
+
+    def _vider(self):
+        if self._minuteur is not None:
+            self._minuteur.cancel()
+            self._minuteur = None
+        lot, self._attente = self._attente, []
+        if lot:
+            tache = asyncio.ensure_future(self._ecrire_lot(lot))
+            # Garder une référence tant que l'écriture est en cours
+            self._ecritures.add(tache)
+            tache.add_done_callback(self._ecritures.discard)
+
+    async def _ecrire_lot(self, lot):
+        instances = [instance for instance, _ in lot]
+        try:
+            erreurs = await database_sync_to_async(self._ecrire)(instances)
+        except Exception as e:
+            erreurs = [e] * len(instances)
+        for (instance, futur), erreur in zip(lot, erreurs):
+            if futur.done():
+                continue
+            if erreur is None:
+                futur.set_result(instance)
+            else:
+                futur.set_exception(erreur)
+
+    def _ecrire(self, instances):
+        """
+        Écrit le lot ; s'il échoue, chaque message séparément.
+        Retourne l'erreur de chaque message (None s'il est enregistré).
+        """
+        try:
+            self._ecrire_ensemble(instances)
+            return [None] * len(instances)
+        except Exception as e:
+            if len(instances) == 1:
+                logger.error(f"❌ Échec de l'enregistrement d'un message : {e}")
+                return [e]
+            logger.warning(f"⚠️ Échec du lot de {len(instances)} message(s), écriture message par message : {e}")
+
+        auto = isinstance(self.modele._meta.pk, models.AutoField)
+        erreurs = []
+        for instance in instances:
+            if auto:
+                # Clé éventuellement attribuée par l'INSERT annulé
+                instance.pk = None
+            try:
+                self._ecrire_ensemble([instance])
+                erreurs.append(None)
+            except Exception as e:
+                logger.error(f"❌ Échec de l'enregistrement d'un message : {e}")
+                erreurs.append(e)
+        return erreurs
+
+    def _ecrire_ensemble(self, instances):
+        if not self.champ_conversation and not self.apres_ecriture:
+            # bulk_create est déjà atomique
+            self.modele.objects.bulk_create(instances)
+            return
+        with transaction.atomic():
+            self.modele.objects.bulk_create(instances)
+            if self.champ_conversation:
+                self._toucher_conversations(instances)
+            if self.apres_ecriture:
+                self.apres_ecriture(instances)
+
+    def _toucher_conversations(self, instances):
+        champ_id = f'{self.champ_conversation}_id'
+        derniers = {}
+        for instance in instances:
+            cle = getattr(instance, champ_id)
+            derniers[cle] = max(derniers.get(cle, instance.timestamp), instance.timestamp)
+
+        conversations = self.modele._meta.get_field(self.champ_conversation).related_model
+        conversations.objects.filter(pk__in=derniers).update(updated_at=Case(
+            *[When(pk=cle, then=Value(date)) for cle, date in derniers.items()],
+            output_field=DateTimeField(),
+        ))
+
+
+def tampon(nom, modele, champ_conversation=None, apres_ecriture=None):
+    """Tampon ``nom`` de la boucle asyncio courante"""
+    boucle = asyncio.get_running_loop()
+    tampons = _tampons.setdefault(boucle, {})
+    if nom not in tampons:
+        tampons[nom] = TamponMessages(modele, champ_conversation, apres_ecriture=apres_ecriture)
+    return tampons[nom]
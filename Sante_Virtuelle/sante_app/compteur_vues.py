@@ -0,0 +1,220 @@
+"""
+Compteur de vues des articles, tamponné dans le cache (write-behind).
+
+Désactivé par défaut : chaque vue est alors un UPDATE ``vues = vues + 1``.
+
+Avec ARTICLE_VIEWS_BUFFERED, une vue n'écrit pas en base : ``enregistrer``
+incrémente ``vues:article:<id>`` dans le cache (cache.incr, atomique). La
+première vue d'un article depuis le dernier report l'inscrit dans un journal
+d'articles modifiés (``vues:journal:<n>``, numéros donnés par cache.incr),
+puis pose le marqueur ``vues:modifie:<id>`` qui évite de le réinscrire. La
+tâche du scheduler ``article_views_flush`` ne lit que les articles du journal,
+toutes les ARTICLE_VIEWS_FLUSH_INTERVAL secondes : un UPDATE ``vues = vues + n``
+par lot d'articles, puis ``n`` est retranché du compteur en cache ; une vue
+comptée pendant le report reste en attente pour le passage suivant. Un arrêt
+entre l'UPDATE et la décrémentation recompterait le lot (au moins une fois,
+jamais de vue perdue par écrasement).
+
+Le marqueur n'est posé qu'après l'écriture de l'entrée du journal, et expire
+après quelques intervalles de report : un processus arrêté entre le compteur
+et le journal ne bloque pas l'article, qui est réinscrit à sa vue suivante
+(ses vues restent dans le compteur en attendant).
+
+Les compteurs et le journal n'ont pas d'expiration et doivent survivre aux
+redémarrages et être vus de tous les workers : le tampon exige un cache Redis
+(CACHE_REDIS_URL) configuré pour n'évincer que les clés qui expirent
+(``maxmemory-policy volatile-lru`` ou ``noeviction``). ``verifier_configuration``
+refuse de démarrer avec un autre cache (LocMemCache est propre à chaque
+processus et évince n'importe quelle clé).
+
+Dédoublonnage : avec ARTICLE_VIEWS_DEDUP_WINDOW > 0, un même lecteur
+(utilisateur connecté, sinon session, sinon adresse IP) ne compte qu'une vue
+par article sur la fenêtre (``cache.add``). Ces marqueurs, nombreux et
+éphémères, vont dans un cache à part (ARTICLE_VIEWS_DEDUP_CACHE) pour ne pas
+évincer les compteurs.
+
+Réglages (settings.py) :
+    ARTICLE_VIEWS_BUFFERED          vues tamponnées dans le cache (False)
+    ARTICLE_VIEWS_FLUSH_INTERVAL    secondes entre deux reports en base (60)
+    ARTICLE_VIEWS_DEDUP_WINDOW      fenêtre de dédoublonnage en secondes (1800, 0 : aucune)
+    ARTICLE_VIEWS_DEDUP_CACHE       alias du cache des marqueurs de lecteurs ('lecteurs')
+"""
+import hashlib
+import logging
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Case, F, IntegerField, Value, When
+
+logger = logging.getLogger(__name__)
+
+TAILLE_LOT = 500
+
+# Caches dont les compteurs sont partagés entre workers et incrémentés atomiquement
+BACKENDS_PARTAGES = ('django.core.cache.backends.redis.RedisCache',)
+
+CLE_JOURNAL = 'vues:journal'
+CLE_JOURNAL_LU = 'vues:journal:lu'
+CLE_JOURNAL_TROU = 'vues:journal:trou'
+
+# Durée de vie du marqueur « article inscrit au journal », en intervalles de report
+INTERVALLES_MARQUEUR = 3
+
+
+def _cle(article_id):
+    return f'vues:article:{article_id}'
+
+
+def _cle_modifie(article_id):
+    return f'vues:modifie:{article_id}'
+
+
+def _cle_entree(numero):
+    return f'vues:journal:{numero}'
+
+
+def _reglage(nom, defaut):
+    return getattr(settings, nom, defaut)
+
+
+def verifier_configuration():
+    """Au démarrage (apps.py) : le tampon exige un cache partagé entre les workers"""
+    if not _reglage('ARTICLE_VIEWS_BUFFERED', False):
+        return
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend not in BACKENDS_PARTAGES:
+        raise ImproperlyConfigured(
+            f"ARTICLE_VIEWS_BUFFERED exige un cache Redis partagé (CACHE_REDIS_URL) ; "
+            f"le cache par défaut est {backend}, dont les vues en attente seraient perdues "
+            f"(éviction, plusieurs workers, redémarrage)"
+        )
+
+
+def lecteur(request):
+    """Identité du lecteur pour le dédoublonnage : utilisateur, sinon session, sinon IP"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return f'utilisateur:{user.pk}'
+    session = getattr(request, 'session', None)
+    if session is not None and session.session_key:
+        return f'session:{session.session_key}'
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return f"ip:{x_forwarded_for.split(',')[0].strip()}"
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def _deja_vu(article_id, request):
+    fenetre = _reglage('ARTICLE_VIEWS_DEDUP_WINDOW', 30 * 60)
+    if not fenetre or request is None:
+        return False
+    empreinte = hashlib.sha256(lecteur(request).encode('utf-8')).hexdigest()[:16]
+    marqueurs = caches[_reglage('ARTICLE_VIEWS_DEDUP_CACHE', 'default')]
+    return not marqueurs.add(f'vues:vu:{article_id}:{empreinte}', 1, fenetre)
+
+
+def _incrementer(cle):
+    """cache.incr qui crée la clé au besoin ; retourne la nouvelle valeur"""
+    if cache.add(cle, 1, None):
+        return 1
+    try:
+        return cache.incr(cle)
+    except ValueError:
+        # Clé évincée entre add et incr
+        cache.set(cle, 1, None)
+        return 1
+
+
+def enregistrer(article_id, request=None):
+    """Compte une vue de l'article ; False si elle est ignorée (lecteur déjà compté)"""
+    from .models import Article
+
+    if _deja_vu(article_id, request):
+        return False
+    if not _reglage('ARTICLE_VIEWS_BUFFERED', False):
+        Article.objects.filter(pk=article_id).update(vues=F('vues') + 1)
+        return True
+    _incrementer(_cle(article_id))
+    if cache.get(_cle_modifie(article_id)) is None:
+        # Première vue depuis le dernier report : inscription au journal, puis
+        # marqueur (deux vues simultanées inscrivent l'article deux fois, sans effet)
+        cache.set(_cle_entree(_incrementer(CLE_JOURNAL)), article_id, None)
+        duree = INTERVALLES_MARQUEUR * _reglage('ARTICLE_VIEWS_FLUSH_INTERVAL', 60)
+        cache.set(_cle_modifie(article_id), 1, duree)
+    return True
+
+
+def en_attente(article_id):
+    """Vues comptées mais pas encore reportées en base"""
+    return cache.get(_cle(article_id), 0)
+
+
+def _lire_journal():
+    """
+    (premier numéro non lu, dernier numéro lu, articles inscrits entre les deux).
+    Un numéro réservé mais pas encore écrit arrête la lecture ; encore absent
+    au passage suivant (processus arrêté entre incr et set), il est abandonné.
+    """
+    fin = cache.get(CLE_JOURNAL, 0)
+    lu = cache.get(CLE_JOURNAL_LU, 0)
+    if lu > fin:
+        # Journal évincé et recommencé
+        lu = 0
+    debut, article_ids = lu + 1, set()
+    for premier in range(debut, fin + 1, TAILLE_LOT):
+        numeros = range(premier, min(premier + TAILLE_LOT, fin + 1))
+        entrees = cache.get_many([_cle_entree(n) for n in numeros])
+        for numero in numeros:
+            article_id = entrees.get(_cle_entree(numero))
+            if article_id is None and cache.get(CLE_JOURNAL_TROU) != numero:
+                cache.set(CLE_JOURNAL_TROU, numero, None)
+                return debut, lu, article_ids
+            if article_id is not None:
+                article_ids.add(article_id)
+            lu = numero
+    return debut, lu, article_ids
+
+
+def _reporter(increments):
+    """Un UPDATE ``vues = vues + n`` pour un lot {article_id: n}"""
+    from .models import Article
+
+    Article.objects.filter(pk__in=increments).update(vues=F('vues') + Case(
+        *[When(pk=article_id, then=Value(n)) for article_id, n in increments.items()],
+        output_field=IntegerField(),
+    ))
+
+
+def vider():
+    """
+    Tâche du scheduler : reporte en base les vues en attente des articles du
+    journal. Retourne {'articles', 'vues'} reportés.
+    """
+    debut, lu, article_ids = _lire_journal()
+    # Retirées avant de lire les compteurs : une vue qui arrive pendant le
+    # report réinscrit son article pour le passage suivant
+    cache.delete_many([_cle_modifie(article_id) for article_id in article_ids])
+
+    articles, vues = 0, 0
+    article_ids = sorted(article_ids)
+    for premier in range(0, len(article_ids), TAILLE_LOT):
+        valeurs = cache.get_many([_cle(article_id) for article_id in article_ids[premier:premier + TAILLE_LOT]])
+        increments = {int(cle.rsplit(':', 1)[1]): n for cle, n in valeurs.items() if n and n > 0}
+        if not increments:
+            continue
+        _reporter(increments)
+        for article_id, n in increments.items():
+            try:
+                cache.decr(_cle(article_id), n)
+            except ValueError:
+                pass
+        articles += len(increments)
+        vues += sum(increments.values())
+
+    if lu >= debut:
+        cache.delete_many([_cle_entree(n) for n in range(debut, lu + 1)])
+        cache.set(CLE_JOURNAL_LU, lu, None)
+    if vues:
+        logger.info(f"👁️ {vues} vue(s) reportée(s) sur {articles} article(s)")
+    return {'articles': articles, 'vues': vues}
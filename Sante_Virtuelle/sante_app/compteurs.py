@@ -0,0 +1,163 @@
+"""
+Compteurs de non-lus matérialisés (CompteurNonLus).
+
+Chaque écriture qui crée ou lit un message, une Notification ou une
+NotificationUrgence appelle ``ajuster`` dans sa transaction : un UPDATE
+``champ = champ + delta`` par utilisateur concerné. Les créations unitaires
+passent par les signaux (signals.py) ; les écritures groupées (bulk_create,
+UPDATE) appellent les fonctions de ce module directement.
+
+La ligne d'un utilisateur est créée à la première utilisation par un
+recomptage complet (``recompter``), qui sert aussi à corriger un compteur.
+Après le COMMIT, les nouvelles valeurs sont poussées sur le groupe WebSocket
+de l'utilisateur (événement 'badge_update').
+"""
+from collections import defaultdict
+import logging
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .temps_reel import notifier_utilisateurs
+
+logger = logging.getLogger(__name__)
+
+CHAMPS = ('messages', 'notifications', 'urgences')
+
+
+def _valeurs_reelles(user_id):
+    from .models import Message, Notification, NotificationUrgence
+
+    return {
+        'messages': Message.objects.filter(
+            conversation__participants=user_id, is_read=False
+        ).exclude(sender=user_id).count(),
+        'notifications': Notification.objects.filter(medecin__user=user_id, lu=False).count(),
+        'urgences': NotificationUrgence.objects.filter(medecin__user=user_id, lue=False).count(),
+    }
+
+
+def recompter(user_id):
+    """Recalcule et enregistre les compteurs d'un utilisateur"""
+    from .models import CompteurNonLus
+
+    compteur, _ = CompteurNonLus.objects.update_or_create(user_id=user_id, defaults=_valeurs_reelles(user_id))
+    return compteur
+
+
+def lire(user_id):
+    """Compteurs d'un utilisateur (une seule ligne, créée au besoin)"""
+    from .models import CompteurNonLus
+
+    compteur = CompteurNonLus.objects.filter(user_id=user_id).first()
+    return compteur or recompter(user_id)
+
+
+def _existants(user_ids):
+    from .models import CompteurNonLus
+
+    return set(CompteurNonLus.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+
+
+def _appliquer(user_ids, variation):
+    from .models import CompteurNonLus
+
+    CompteurNonLus.objects.filter(user_id__in=user_ids).update(
+        **{champ: Greatest(F(champ) + delta, 0) for champ, delta in variation}
+    )
+
+
+def ajuster(deltas):
+    """
+    ``deltas`` : {user_id: {'messages': +1, 'urgences': -2, ...}}.
+    Applique les variations dans la transaction courante ; un compteur ne
+    descend jamais sous zéro.
+    """
+    from .models import CompteurNonLus
+
+    deltas = {
+        user_id: {champ: delta for champ, delta in champs.items() if delta}
+        for user_id, champs in deltas.items()
+    }
+    deltas = {user_id: champs for user_id, champs in deltas.items() if champs}
+    if not deltas:
+        return
+
+    existants = _existants(deltas)
+
+    # Un seul UPDATE par variation distincte (ex. +1 urgence pour tous les médecins notifiés)
+    par_variation = defaultdict(list)
+    for user_id in existants:
+        par_variation[tuple(sorted(deltas[user_id].items()))].append(user_id)
+    for variation, user_ids in par_variation.items():
+        _appliquer(user_ids, variation)
+
+    for user_id in deltas.keys() - existants:
+        # Le recomptage inclut déjà l'écriture en cours
+        try:
+            with transaction.atomic():
+                CompteurNonLus.objects.create(user_id=user_id, **_valeurs_reelles(user_id))
+        except IntegrityError:
+            # Créé en parallèle par un recomptage qui ne voit pas l'écriture en cours
+            logger.info(f"Compteur de l'utilisateur {user_id} créé en parallèle")
+            _appliquer([user_id], tuple(sorted(deltas[user_id].items())))
+
+    user_ids = list(deltas)
+    transaction.on_commit(lambda: pousser(user_ids))
+
+
+def pousser(user_ids):
+    """Envoie les compteurs à jour sur le groupe WebSocket de chaque utilisateur"""
+    from .models import CompteurNonLus
+
+    for compteur in CompteurNonLus.objects.filter(user_id__in=user_ids):
+        notifier_utilisateurs([compteur.user_id], dict(type='badge_update', **compteur.en_dict()))
+
+
+# ---------- Messages ----------
+
+def messages_crees(messages, signe=1):
+    """+1 (ou ``signe``) pour chaque destinataire (participants hors expéditeur) de chaque message non lu"""
+    from .models import Conversation
+
+    messages = [m for m in messages if not m.is_read]
+    if not messages:
+        return
+    participants = defaultdict(list)
+    for conversation_id, user_id in Conversation.participants.through.objects.filter(
+        conversation_id__in={m.conversation_id for m in messages}
+    ).values_list('conversation_id', 'user_id'):
+        participants[conversation_id].append(user_id)
+
+    deltas = defaultdict(lambda: defaultdict(int))
+    for message in messages:
+        for user_id in participants[message.conversation_id]:
+            if user_id != message.sender_id:
+                deltas[user_id]['messages'] += signe
+    ajuster(deltas)
+
+
+def messages_lus(lecteur_id, nombre):
+    ajuster({lecteur_id: {'messages': -nombre}})
+
+
+# ---------- Notifications (articles) et urgences ----------
+
+def notifications_creees(medecin_user_id, nombre=1):
+    ajuster({medecin_user_id: {'notifications': nombre}})
+
+
+def notifications_lues(medecin_user_id, nombre):
+    ajuster({medecin_user_id: {'notifications': -nombre}})
+
+
+def urgences_notifiees(medecin_user_ids):
+    deltas = defaultdict(lambda: defaultdict(int))
+    for user_id in medecin_user_ids:
+        deltas[user_id]['urgences'] += 1
+    ajuster(deltas)
+
+
+def urgences_lues(medecin_user_id, nombre):
+    ajuster({medecin_user_id: {'urgences': -nombre}})
@@ -0,0 +1,104 @@
+"""
+Détection des conflits de rendez-vous.
+
+Les rendez-vous actifs d'un médecin pour une date sont chargés une seule fois,
+triés par heure de début, avec la durée de consultation du jour issue de
+l'index des durées du médecin (DisponibiliteMedecin). Tous les rendez-vous
+d'une même journée ont la même durée, donc les intervalles triés par début le
+sont aussi par fin : un chevauchement se vérifie par une recherche dichotomique.
+
+Utilisé par la prise de rendez-vous (RendezVousSerializer) et par toutes les
+reprogrammations (médecin, admin, proposition du patient).
+"""
+from bisect import bisect_right
+
+from django.utils.dateparse import parse_date, parse_time
+
+from .availability import STATUTS_ACTIFS, jour_semaine
+
+DUREE_PAR_DEFAUT = 30
+
+
+def _minutes(heure):
+    return heure.hour * 60 + heure.minute
+
+
+def _as_date(value):
+    if isinstance(value, str):
+        parsed = parse_date(value)
+        if parsed is None:
+            raise ValueError("Format de date invalide. Utilisez YYYY-MM-DD")
+        return parsed
+    return value
+
+
+def _as_time(value):
+    if isinstance(value, str):
+        parsed = parse_time(value)
+        if parsed is None:
+            raise ValueError("Format d'heure invalide. Utilisez HH:MM")
+        return parsed
+    return value
+
+
+def durees_par_jour(medecin_user_id):
+    """Index {jour: durée en minutes} des disponibilités actives d'un médecin (une requête)"""
+    from .models import DisponibiliteMedecin
+
+    return dict(DisponibiliteMedecin.objects.filter(
+        medecin__user_id=medecin_user_id, actif=True
+    ).values_list('jour', 'duree_consultation'))
+
+
+class PlanningJournee:
+    """Intervalles occupés d'un médecin pour une date, triés par heure de début"""
+
+    def __init__(self, date, duree, rendez_vous):
+        self.date = date
+        self.duree = duree or DUREE_PAR_DEFAUT
+        self.rendez_vous = sorted(rendez_vous, key=lambda rdv: rdv.heure)
+        self.debuts = [_minutes(rdv.heure) for rdv in self.rendez_vous]
+
+    @classmethod
+    def charger(cls, medecin_user_id, date_rdv, exclude_rdv_id=None, durees=None):
+        """Charge la journée en deux requêtes (durées, rendez-vous actifs)"""
+        from .models import RendezVous
+
+        date_rdv = _as_date(date_rdv)
+        if durees is None:
+            durees = durees_par_jour(medecin_user_id)
+        rendez_vous = RendezVous.objects.filter(
+            medecin_id=medecin_user_id, date=date_rdv, statut__in=STATUTS_ACTIFS
+        ).order_by('heure')
+        if exclude_rdv_id:
+            rendez_vous = rendez_vous.exclude(pk=exclude_rdv_id)
+        return cls(date_rdv, durees.get(jour_semaine(date_rdv)), rendez_vous)
+
+    def conflit(self, heure, duree=None):
+        """
+        Premier rendez-vous qui chevauche [heure, heure + durée), ou None.
+        Deux intervalles [a, b) et [c, d) se chevauchent si a < d et c < b.
+        """
+        debut = _minutes(_as_time(heure))
+        fin = debut + (duree or self.duree)
+        # Premier rendez-vous dont la fin (début + durée) dépasse ``debut``
+        idx = bisect_right(self.debuts, debut - self.duree)
+        if idx < len(self.debuts) and self.debuts[idx] < fin:
+            return self.rendez_vous[idx]
+        return None
+
+
+def trouver_conflit(medecin_user_id, date_rdv, heure_rdv, exclude_rdv_id=None, duree=None):
+    """Rendez-vous actif du médecin qui chevauche le créneau demandé, ou None"""
+    planning = PlanningJournee.charger(medecin_user_id, date_rdv, exclude_rdv_id)
+    return planning.conflit(heure_rdv, duree)
+
+
+def check_appointment_conflict(medecin_user, date_rdv, heure_rdv, duration_minutes=None, exclude_rdv_id=None):
+    """
+    Check if there's a conflict with existing appointments
+    Returns tuple: (has_conflict, conflicting_appointment)
+    """
+    medecin_user_id = getattr(medecin_user, 'pk', medecin_user)
+    conflit = trouver_conflit(medecin_user_id, date_rdv, heure_rdv, exclude_rdv_id, duration_minutes)
+    return conflit is not None, conflit
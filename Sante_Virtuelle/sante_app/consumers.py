@@ -1,14 +1,59 @@
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from django.contrib.auth.models import AnonymousUser
-from .models import User, Message, Conversation, Consultation, ConsultationMessage
+from django.conf import settings
+from django.core.cache import cache
+from . import compteurs
+from .chat_buffer import tampon
+from .models import Message, Conversation, Consultation, ConsultationMessage
 from django.utils import timezone
 
+
+def _cle_participants(consultation_id):
+    return f"consultation:participants:{consultation_id}"
+
+
+def participants_consultation(consultation_id):
+    """
+    Identifiants (user) du patient et du médecin d'une consultation, en cache :
+    une reconnexion ne relit pas la consultation.
+    """
+    cle = _cle_participants(consultation_id)
+    participants = cache.get(cle)
+    if participants is None:
+        ligne = Consultation.objects.filter(pk=consultation_id).values_list(
+            'patient__user_id', 'medecin__user_id'
+        ).first()
+        participants = frozenset(ligne) if ligne else frozenset()
+        cache.set(cle, participants, getattr(settings, 'WS_PARTICIPANTS_CACHE_TIMEOUT', 3600))
+    return participants
+
+
+def invalider_participants_consultation(consultation_id):
+    cache.delete(_cle_participants(consultation_id))
+
+
+def _utilisateur_authentifie(scope, user_id_url):
+    """Utilisateur du scope (JWT ou session), s'il correspond à l'identifiant de l'URL"""
+    user = scope.get('user')
+    if user is None or not user.is_authenticated:
+        return None
+    if str(user.id) != str(user_id_url):
+        return None
+    return user
+
+
 class MessageConsumer(AsyncWebsocketConsumer):
     async def connect(self):
-        self.user_id = self.scope['url_route']['kwargs']['user_id']
+        self.user = _utilisateur_authentifie(self.scope, self.scope['url_route']['kwargs']['user_id'])
+        if self.user is None:
+            await self.close()
+            return
+
+        self.user_id = self.user.id
         self.room_group_name = f'user_{self.user_id}'
+        # Conversations dont l'utilisateur est participant, vérifiées une fois par connexion
+        self.conversations_autorisees = set()
         
         # Join room group
         await self.channel_layer.group_add(
@@ -20,16 +65,21 @@ class MessageConsumer(AsyncWebsocketConsumer):
 
     async def disconnect(self, close_code):
         # Leave room group
-        await self.channel_layer.group_discard(
-            self.room_group_name,
-            self.channel_name
-        )
+        if hasattr(self, 'room_group_name'):
+            await self.channel_layer.group_discard(
+                self.room_group_name,
+                self.channel_name
+            )
 
     # Receive message from WebSocket
     async def receive(self, text_data):
         text_data_json = json.loads(text_data)
         message = text_data_json['message']
         conversation_id = text_data_json['conversation_id']
+
+        if not await self.peut_ecrire(conversation_id):
+            await self.send(text_data=json.dumps({'error': 'Conversation non autorisée'}))
+            return
         
         # Save message to database
         saved_message = await self.save_message(message, conversation_id)
@@ -56,29 +106,53 @@ class MessageConsumer(AsyncWebsocketConsumer):
             'timestamp': event['timestamp'],
         }))
 
+    # Read receipts pushed by get_messages (see messagerie.marquer_conversation_lue)
+    async def messages_read(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'messages_read',
+            'conversation_id': event['conversation_id'],
+            'reader_id': event['reader_id'],
+            'read_at': event['read_at'],
+        }))
+
+    # Unread counters pushed after each change (see compteurs.py)
+    async def badge_update(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'badge_update',
+            'messages': event['messages'],
+            'notifications': event['notifications'],
+            'urgences': event['urgences'],
+            'total': event['total'],
+        }))
+
+    async def peut_ecrire(self, conversation_id):
+        if conversation_id in self.conversations_autorisees:
+            return True
+        autorise = await self.check_participant(conversation_id)
+        if autorise:
+            self.conversations_autorisees.add(conversation_id)
+        return autorise
+
     @database_sync_to_async
-    def save_message(self, content, conversation_id):
-        """Save message to database"""
-        user = User.objects.get(id=self.user_id)
-        conversation = Conversation.objects.get(id=conversation_id)
-        
-        message = Message.objects.create(
-            conversation=conversation,
-            sender=user,
+    def check_participant(self, conversation_id):
+        """Check that the user takes part in the conversation"""
+        return Conversation.objects.filter(pk=conversation_id, participants=self.user_id).exists()
+
+    async def save_message(self, content, conversation_id):
+        """Save message to database (group commit, see chat_buffer.py)"""
+        return await tampon(
+            'messages', Message, champ_conversation='conversation', apres_ecriture=compteurs.messages_crees
+        ).ajouter(
+            conversation_id=conversation_id,
+            sender_id=self.user_id,
             content=content
         )
-        
-        # Update conversation timestamp
-        conversation.updated_at = message.timestamp
-        conversation.save()
-        
-        return message
 
 
 class ConsultationConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.consultation_id = self.scope['url_route']['kwargs']['consultation_id']
-        self.user_id = self.scope['url_route']['kwargs']['user_id']
+        self.user = _utilisateur_authentifie(self.scope, self.scope['url_route']['kwargs']['user_id'])
         self.room_group_name = f'consultation_{self.consultation_id}'
         
         # Verify user is authorized to access this consultation
@@ -86,6 +160,9 @@ class ConsultationConsumer(AsyncWebsocketConsumer):
         if not is_authorized:
             await self.close()
             return
+
+        self.user_id = self.user.id
+        self.sender_name = self.user.get_full_name()
         
         # Join room group
         await self.channel_layer.group_add(
@@ -118,7 +195,7 @@ class ConsultationConsumer(AsyncWebsocketConsumer):
                 'message_id': saved_message.id,
                 'content': message_content,
                 'sender_id': self.user_id,
-                'sender_name': saved_message.sender.get_full_name(),
+                'sender_name': self.sender_name,
                 'timestamp': saved_message.timestamp.isoformat(),
             }
         )
@@ -136,26 +213,15 @@ class ConsultationConsumer(AsyncWebsocketConsumer):
 
     @database_sync_to_async
     def check_user_authorization(self):
-        """Check if user is authorized to access this consultation"""
-        try:
-            user = User.objects.get(id=self.user_id)
-            consultation = Consultation.objects.get(id=self.consultation_id)
-            
-            # Check if user is either the patient or doctor for this consultation
-            return (user == consultation.patient.user) or (user == consultation.medecin.user)
-        except (User.DoesNotExist, Consultation.DoesNotExist):
+        """Check if user is either the patient or doctor for this consultation"""
+        if self.user is None:
             return False
+        return self.user.id in participants_consultation(self.consultation_id)
 
-    @database_sync_to_async
-    def save_message(self, content):
-        """Save consultation message to database"""
-        user = User.objects.get(id=self.user_id)
-        consultation = Consultation.objects.get(id=self.consultation_id)
-        
-        message = ConsultationMessage.objects.create(
-            consultation=consultation,
-            sender=user,
+    async def save_message(self, content):
+        """Save consultation message to database (group commit, see chat_buffer.py)"""
+        return await tampon('consultation_messages', ConsultationMessage).ajouter(
+            consultation_id=self.consultation_id,
+            sender_id=self.user_id,
             content=content
         )
-        
-        return message
\ No newline at end of file
@@ -0,0 +1,156 @@
+"""
+Vue de lecture unifiée des centres de santé.
+
+Hopital, Clinique, Pharmacie et Dentiste restent les tables d'écriture (admin,
+saisie) ; chaque écriture est recopiée dans EtablissementSante par les signaux
+post_save / post_delete. La carte (``centres``), la recherche de proximité
+(geo.py) et le flux GeoJSON lisent cette seule table : une requête au lieu de
+quatre.
+
+Le flux GeoJSON (``flux_geojson``) est une source de cache_public : il est
+sérialisé, compressé en gzip et haché (ETag) une fois par intervalle ou après
+une modification, jamais à chaque requête. Un client qui renvoie son ETag
+(If-None-Match) reçoit un 304 sans corps.
+"""
+import gzip
+import hashlib
+import json
+import logging
+
+from django.db import transaction
+
+from . import cache_public, geo
+
+logger = logging.getLogger(__name__)
+
+# Type -> nom du modèle d'écriture
+SOURCES = {
+    'hopital': 'Hopital',
+    'clinique': 'Clinique',
+    'pharmacie': 'Pharmacie',
+    'dentiste': 'Dentiste',
+}
+
+# Sources de cache_public calculées depuis la vue de lecture
+SOURCES_PUBLIQUES = ('centres_de_sante', 'centres_geojson')
+
+# Position affichée pour un centre sans coordonnées (centre de Dakar)
+POSITION_PAR_DEFAUT = (14.6928, -17.4467)
+
+
+def type_de(modele):
+    """Type d'établissement d'un modèle d'écriture (None si le modèle n'en est pas un)"""
+    return next((type_centre for type_centre, nom in SOURCES.items() if nom == modele.__name__), None)
+
+
+def valeurs(instance):
+    """Champs de la vue de lecture pour un centre (modèles historiques compris)"""
+    return {
+        'nom': instance.nom,
+        'adresse': instance.adresse or '',
+        'telephone': instance.telephone or '',
+        'latitude': instance.latitude,
+        'longitude': instance.longitude,
+    }
+
+
+def _apres_modification():
+    geo.invalider()
+    transaction.on_commit(lambda: cache_public.invalider(*SOURCES_PUBLIQUES))
+
+
+def synchroniser(instance):
+    """Recopie un centre dans la vue de lecture (signal post_save)"""
+    from .models import EtablissementSante
+
+    EtablissementSante.objects.update_or_create(
+        type=type_de(type(instance)), source_id=instance.pk, defaults=valeurs(instance)
+    )
+    _apres_modification()
+
+
+def retirer(instance):
+    """Retire un centre supprimé de la vue de lecture (signal post_delete)"""
+    from .models import EtablissementSante
+
+    EtablissementSante.objects.filter(type=type_de(type(instance)), source_id=instance.pk).delete()
+    _apres_modification()
+
+
+def reconstruire():
+    """Recopie toutes les tables d'écriture (import en masse, update() sans signaux)"""
+    from django.apps import apps
+    from .models import EtablissementSante
+
+    with transaction.atomic():
+        EtablissementSante.objects.all().delete()
+        lignes = [
+            EtablissementSante(type=type_centre, source_id=instance.pk, **valeurs(instance))
+            for type_centre, nom in SOURCES.items()
+            for instance in apps.get_model('sante_app', nom).objects.all()
+        ]
+        EtablissementSante.objects.bulk_create(lignes, batch_size=1000)
+    _apres_modification()
+    logger.info(f"🏥 Vue des établissements de santé reconstruite : {len(lignes)} centre(s)")
+    return len(lignes)
+
+
+@cache_public.source('centres_de_sante')
+def centres():
+    """Tous les centres pour la carte (``health_facilities``), en une requête"""
+    from .models import EtablissementSante
+
+    lignes = EtablissementSante.objects.order_by('type', 'source_id').values(
+        'type', 'source_id', 'nom', 'adresse', 'telephone', 'latitude', 'longitude'
+    )
+    return [
+        {
+            'id': f"{ligne['type']}_{ligne['source_id']}",
+            'nom': ligne['nom'],
+            'type': ligne['type'],
+            'adresse': ligne['adresse'],
+            'latitude': float(ligne['latitude'] if ligne['latitude'] is not None else POSITION_PAR_DEFAUT[0]),
+            'longitude': float(ligne['longitude'] if ligne['longitude'] is not None else POSITION_PAR_DEFAUT[1]),
+            'telephone': ligne['telephone'],
+            'horaires': '',
+        }
+        for ligne in lignes
+    ]
+
+
+@cache_public.source('centres_geojson')
+def flux_geojson():
+    """
+    FeatureCollection des centres localisés : {'etag', 'corps', 'gzip'}, le
+    corps JSON compact et sa version compressée.
+    """
+    from .models import EtablissementSante
+
+    lignes = (
+        EtablissementSante.objects.filter(latitude__isnull=False, longitude__isnull=False)
+        .order_by('type', 'source_id')
+        .values('type', 'source_id', 'nom', 'adresse', 'telephone', 'latitude', 'longitude')
+    )
+    collection = {
+        'type': 'FeatureCollection',
+        'features': [
+            {
+                'type': 'Feature',
+                'id': f"{ligne['type']}_{ligne['source_id']}",
+                'geometry': {'type': 'Point', 'coordinates': [float(ligne['longitude']), float(ligne['latitude'])]},
+                'properties': {
+                    'nom': ligne['nom'],
+                    'type': ligne['type'],
+                    'adresse': ligne['adresse'],
+                    'telephone': ligne['telephone'],
+                },
+            }
+            for ligne in lignes
+        ],
+    }
+    corps = json.dumps(collection, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return {
+        'etag': hashlib.sha256(corps).hexdigest()[:32],
+        'corps': corps,
+        'gzip': gzip.compress(corps, mtime=0),
+    }
@@ -0,0 +1,229 @@
+"""
+Recherche géographique des centres de santé (hôpitaux, cliniques, pharmacies,
+dentistes).
+
+Deux moteurs, choisis par GEO_INDEX :
+    - 'memoire' (défaut) : une grille en mémoire (cellules de GEO_GRID_CELL_DEG
+      degrés) construite une fois depuis la base ; une recherche ne lit que
+      les cellules qui couvrent la boîte englobante du rayon, sans requête SQL ;
+    - 'base' : préfiltre par boîte englobante sur les colonnes latitude /
+      longitude indexées, à chaque recherche.
+
+Dans les deux cas, seules les distances (Haversine) des candidats sont
+calculées. Sans rayon, ``proches`` cherche les ``k`` plus proches en doublant
+le rayon jusqu'à en trouver assez.
+
+Les centres sont lus dans la vue de lecture EtablissementSante (voir
+etablissements.py). La version de la grille est lue en base (nombre de lignes,
+plus grand id, dernière date_maj) : chaque processus la compare à celle de sa
+grille au plus toutes les GEO_GRID_CHECK_INTERVAL secondes, et tout de suite
+après une modification commitée dans le processus. Un autre worker voit donc
+un changement au plus tard après cet intervalle, sans cache partagé.
+
+Réglages (settings.py) :
+    GEO_INDEX                'memoire' ou 'base'
+    GEO_GRID_CELL_DEG        taille d'une cellule de la grille, en degrés (0.05, environ 5,5 km)
+    GEO_GRID_CHECK_INTERVAL  secondes entre deux lectures de la version en base (10)
+"""
+from array import array
+from itertools import chain
+import heapq
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+
+logger = logging.getLogger(__name__)
+
+RAYON_TERRE_KM = 6371.0
+KM_PAR_DEGRE = math.pi * RAYON_TERRE_KM / 180
+DEMI_TOUR_KM = math.pi * RAYON_TERRE_KM
+RAYON_KNN_INITIAL = 5.0
+
+TYPES = ('hopital', 'clinique', 'pharmacie', 'dentiste')
+
+
+def _k_plus_proches(chercher, k):
+    """Double le rayon de ``chercher(rayon)`` jusqu'à obtenir ``k`` résultats"""
+    if not k:
+        raise ValueError("Un rayon ou un nombre de résultats (k) est requis")
+    rayon = RAYON_KNN_INITIAL
+    while True:
+        resultats = chercher(rayon)
+        if len(resultats) >= k or rayon >= DEMI_TOUR_KM:
+            return resultats
+        rayon *= 2
+
+
+def boite(lat, lng, rayon_km):
+    """Boîte englobante (lat_min, lat_max, lng_min, lng_max) du cercle de rayon ``rayon_km``"""
+    delta_lat = rayon_km / KM_PAR_DEGRE
+    lat_min, lat_max = max(lat - delta_lat, -90.0), min(lat + delta_lat, 90.0)
+    cos_lat = min(math.cos(math.radians(lat_min)), math.cos(math.radians(lat_max)))
+    if cos_lat <= 0.01:
+        return lat_min, lat_max, -180.0, 180.0
+    delta_lng = rayon_km / (KM_PAR_DEGRE * cos_lat)
+    if delta_lng >= 180 or not -180 <= lng - delta_lng <= lng + delta_lng <= 180:
+        # Proche d'un pôle ou à cheval sur l'antiméridien : toutes les longitudes
+        return lat_min, lat_max, -180.0, 180.0
+    return lat_min, lat_max, lng - delta_lng, lng + delta_lng
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * RAYON_TERRE_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def charger(types=None, zone=None):
+    """
+    Centres localisés de la vue de lecture (EtablissementSante), éventuellement
+    limités à ``types`` et à la boîte ``zone`` : une seule requête
+    """
+    from .models import EtablissementSante
+
+    lignes = EtablissementSante.objects.filter(latitude__isnull=False, longitude__isnull=False)
+    if types:
+        lignes = lignes.filter(type__in=types)
+    if zone:
+        lat_min, lat_max, lng_min, lng_max = zone
+        lignes = lignes.filter(latitude__range=(lat_min, lat_max), longitude__range=(lng_min, lng_max))
+    return [
+        {
+            'id': f"{ligne['type']}_{ligne['source_id']}",
+            'nom': ligne['nom'],
+            'type': ligne['type'],
+            'adresse': ligne['adresse'],
+            'latitude': float(ligne['latitude']),
+            'longitude': float(ligne['longitude']),
+            'telephone': ligne['telephone'],
+            'horaires': '',
+        }
+        for ligne in lignes.values('type', 'source_id', 'nom', 'adresse', 'telephone', 'latitude', 'longitude')
+    ]
+
+
+class Grille:
+    """Centres répartis par cellule de ``taille`` degrés ; coordonnées en tableaux compacts"""
+
+    def __init__(self, centres, taille=None):
+        self.taille = taille or getattr(settings, 'GEO_GRID_CELL_DEG', 0.05)
+        self.centres = centres
+        cellules = {}
+        for i, centre in enumerate(centres):
+            cellules.setdefault(self._cellule(centre['latitude'], centre['longitude']), []).append(i)
+        self.lats = array('d', (c['latitude'] for c in centres))
+        self.lngs = array('d', (c['longitude'] for c in centres))
+        self.types = [c['type'] for c in centres]
+        self.cellules = {cle: array('I', indices) for cle, indices in cellules.items()}
+
+    def __len__(self):
+        return len(self.centres)
+
+    def _cellule(self, lat, lng):
+        return math.floor(lat / self.taille), math.floor(lng / self.taille)
+
+    def _candidats(self, zone):
+        lat_min, lat_max, lng_min, lng_max = zone
+        (ligne_min, colonne_min), (ligne_max, colonne_max) = (
+            self._cellule(lat_min, lng_min), self._cellule(lat_max, lng_max)
+        )
+        nombre = (ligne_max - ligne_min + 1) * (colonne_max - colonne_min + 1)
+        if nombre > len(self.cellules):
+            # Grande zone : parcourir les cellules occupées plutôt que la boîte
+            blocs = [
+                indices for (ligne, colonne), indices in self.cellules.items()
+                if ligne_min <= ligne <= ligne_max and colonne_min <= colonne <= colonne_max
+            ]
+        else:
+            blocs = [
+                self.cellules[(ligne, colonne)]
+                for ligne in range(ligne_min, ligne_max + 1)
+                for colonne in range(colonne_min, colonne_max + 1)
+                if (ligne, colonne) in self.cellules
+            ]
+        return chain.from_iterable(blocs)
+
+    def _dans_le_rayon(self, lat, lng, rayon, k, types):
+        resultats = []
+        for i in self._candidats(boite(lat, lng, rayon)):
+            if types and self.types[i] not in types:
+                continue
+            distance = haversine(lat, lng, self.lats[i], self.lngs[i])
+            if distance <= rayon:
+                resultats.append((distance, i))
+        resultats = heapq.nsmallest(k, resultats) if k else sorted(resultats)
+        return [(self.centres[i], distance) for distance, i in resultats]
+
+    def proches(self, lat, lng, rayon=None, k=None, types=None):
+        """
+        [(centre, distance en km)] par distance croissante : les centres à moins
+        de ``rayon`` km (les ``k`` premiers si ``k``), ou sans rayon les ``k`` plus proches.
+        """
+        if rayon is not None:
+            return self._dans_le_rayon(lat, lng, rayon, k, types)
+        return _k_plus_proches(lambda r: self._dans_le_rayon(lat, lng, r, k, types), k)
+
+
+_grille = None
+_version_grille = None
+_verifiee_le = None
+_verrou = threading.Lock()
+
+
+def version():
+    """Version de la vue de lecture : (nombre de lignes, plus grand id, dernière date_maj)"""
+    from .models import EtablissementSante
+
+    agregats = EtablissementSante.objects.aggregate(lignes=Count('pk'), id_max=Max('pk'), maj=Max('date_maj'))
+    return agregats['lignes'], agregats['id_max'], agregats['maj']
+
+
+def grille():
+    """Grille du processus, reconstruite si la version en base a changé depuis sa construction"""
+    global _grille, _version_grille, _verifiee_le
+    with _verrou:
+        maintenant = time.monotonic()
+        intervalle = getattr(settings, 'GEO_GRID_CHECK_INTERVAL', 10)
+        if _grille is not None and _verifiee_le is not None and maintenant - _verifiee_le < intervalle:
+            return _grille
+        courante = version()
+        _verifiee_le = maintenant
+        if _grille is None or _version_grille != courante:
+            _grille = Grille(charger())
+            _version_grille = courante
+            logger.info(f"🗺️ Grille des centres de santé construite : {len(_grille)} centre(s)")
+        return _grille
+
+
+def reinitialiser():
+    """Oublie la grille du processus (tests)"""
+    global _grille, _version_grille, _verifiee_le
+    with _verrou:
+        _grille = _version_grille = _verifiee_le = None
+
+
+def _reverifier():
+    global _verifiee_le
+    with _verrou:
+        _verifiee_le = None
+
+
+def invalider():
+    """À appeler quand un centre change : la version est relue au prochain appel, après commit"""
+    transaction.on_commit(_reverifier)
+
+
+def proches(lat, lng, rayon=None, k=None, types=None):
+    """Voir ``Grille.proches`` ; moteur choisi par GEO_INDEX"""
+    if getattr(settings, 'GEO_INDEX', 'memoire') == 'memoire':
+        return grille().proches(lat, lng, rayon, k, types)
+
+    def chercher(r):
+        return Grille(charger(types, boite(lat, lng, r))).proches(lat, lng, r, k, types)
+
+    return chercher(rayon) if rayon is not None else _k_plus_proches(chercher, k)
@@ -0,0 +1,444 @@
+"""
+Index inversé en mémoire (SEARCH_BACKEND = 'memoire').
+
+Pour les déploiements sans extension PostgreSQL (ou embarqués) : les
+recherches sont classées en BM25 dans le processus, sans requête SQL. La base
+ne sert qu'à charger les lignes retenues (``pk IN (...)``) et, quand le
+queryset est filtré, à vérifier les filtres sur les seuls documents qui
+contiennent un terme de la requête (``pk IN (candidats)``, par lots) : le
+top-k est choisi parmi ceux qui les respectent, pas sur tout le modèle.
+
+Structure : une collection par modèle indexé (recherche.modeles_indexes()).
+Chaque document occupe un emplacement (slot) ; pour chaque terme, la liste
+des postings est un couple de tableaux compacts (array 'I' des slots, array
+'H' des fréquences). Un document supprimé ou modifié laisse un slot mort,
+ignoré à la lecture ; la collection est compactée quand les slots morts
+dépassent COMPACTAGE_RATIO.
+
+Les termes indexés sont ceux de ``document_recherche`` (déjà normalisés et
+racinisés par recherche.py) : construire l'index revient à lire une colonne.
+Les écritures sont répercutées après commit par les signaux post_save /
+post_delete (recherche.notifier).
+
+Instantané : SEARCH_INDEX_PATH est un fichier binaire relu par mmap au
+démarrage ; les postings restent dans le fichier mappé (copie à la première
+modification d'un terme). Une empreinte par modèle (nombre de lignes, plus
+grand pk, dernière modification quand le modèle en a une, sinon hachage des
+documents) décide si la collection peut être reprise ou doit être reconstruite.
+
+L'index est propre à chaque processus : avec plusieurs workers, chacun ne voit
+que ses propres écritures jusqu'à sa reconstruction. C'est un moteur pour un
+seul processus ; au-delà, garder le moteur de la base.
+
+Réglages (settings.py) :
+    SEARCH_BACKEND               'base' (défaut, voir recherche.py) ou 'memoire'
+    SEARCH_INDEX_PATH            fichier de l'instantané (None : pas d'instantané)
+    SEARCH_MEMORY_MAX_RESULTS    résultats classés au plus par recherche (200)
+"""
+from array import array
+from collections import Counter
+import bisect
+import hashlib
+import heapq
+import json
+import logging
+import math
+import mmap
+import os
+import struct
+import threading
+
+from django.conf import settings
+from django.db.models import Case, FloatField, Max, Value, When, Count
+
+from . import recherche
+
+logger = logging.getLogger(__name__)
+
+K1 = 1.2
+B = 0.75
+COMPACTAGE_RATIO = 0.25
+EXPANSION_PREFIXE_MAX = 50
+TF_MAX = 0xFFFF
+TAILLE_LOT_FILTRE = 500
+
+MAGIC = b'ASVIDX01'
+ALIGNEMENT = 8
+
+# Champ de dernière modification, quand le modèle en a un (empreinte de l'instantané)
+CHAMPS_MODIFICATION = {
+    'Article': 'date_modification',
+    'ChatbotKnowledgeBase': 'updated_at',
+}
+
+
+class Collection:
+    """Documents d'un modèle : slots, longueurs et postings compacts par terme"""
+
+    def __init__(self):
+        self.pks = array('q')
+        self.longueurs = array('I')
+        self.slots = {}
+        self.postings = {}
+        self.total_termes = 0
+        self.morts = 0
+        self._vocabulaire = None
+
+    @property
+    def vivants(self):
+        return len(self.slots)
+
+    def ajouter(self, pk, document):
+        self.retirer(pk)
+        termes = (document or '').split()
+        if not termes:
+            return
+        slot = len(self.pks)
+        self.pks.append(pk)
+        self.longueurs.append(len(termes))
+        self.slots[pk] = slot
+        self.total_termes += len(termes)
+        for terme, tf in Counter(termes).items():
+            slots, tfs = self._postings_modifiables(terme)
+            slots.append(slot)
+            tfs.append(min(tf, TF_MAX))
+
+    def _postings_modifiables(self, terme):
+        postings = self.postings.get(terme)
+        if postings is None:
+            postings = (array('I'), array('H'))
+            self._vocabulaire = None
+        elif not isinstance(postings[0], array):
+            # Postings lus dans l'instantané (memoryview) : copie avant écriture
+            postings = (array('I', postings[0]), array('H', postings[1]))
+        self.postings[terme] = postings
+        return postings
+
+    def retirer(self, pk):
+        slot = self.slots.pop(pk, None)
+        if slot is None:
+            return
+        self.pks[slot] = -1
+        self.total_termes -= self.longueurs[slot]
+        self.morts += 1
+        if self.morts > COMPACTAGE_RATIO * len(self.pks):
+            self.compacter()
+
+    def compacter(self):
+        """Renumérote les slots vivants et retire les postings morts"""
+        if not self.morts:
+            return
+        nouveaux = {}
+        pks, longueurs = array('q'), array('I')
+        for ancien, pk in enumerate(self.pks):
+            if pk >= 0:
+                nouveaux[ancien] = len(pks)
+                pks.append(pk)
+                longueurs.append(self.longueurs[ancien])
+        postings = {}
+        for terme, (slots, tfs) in self.postings.items():
+            vivants = [(nouveaux[s], tf) for s, tf in zip(slots, tfs) if s in nouveaux]
+            if vivants:
+                postings[terme] = (array('I', (s for s, _ in vivants)), array('H', (tf for _, tf in vivants)))
+        self.pks, self.longueurs, self.postings = pks, longueurs, postings
+        self.slots = {pk: slot for slot, pk in enumerate(pks)}
+        self.morts = 0
+        self._vocabulaire = None
+
+    def _developper(self, prefixe):
+        """Termes du vocabulaire qui commencent par ``prefixe``"""
+        if self._vocabulaire is None:
+            self._vocabulaire = sorted(self.postings)
+        debut = bisect.bisect_left(self._vocabulaire, prefixe)
+        termes = []
+        for terme in self._vocabulaire[debut:debut + EXPANSION_PREFIXE_MAX]:
+            if not terme.startswith(prefixe):
+                break
+            termes.append(terme)
+        return termes
+
+    def _groupes(self, mots, prefixe, possibles):
+        """Un groupe de termes par mot ; le dernier développé en préfixe"""
+        groupes = [[mot] for mot in mots]
+        if prefixe:
+            groupes[-1] = (
+                self._developper(mots[-1]) + [terme for terme in possibles if terme in self.postings]
+            ) or [mots[-1]]
+        return groupes
+
+    def candidats(self, mots, prefixe=True, possibles=()):
+        """pk des documents vivants qui contiennent au moins un terme de la requête"""
+        slots = set()
+        for groupe in self._groupes(mots, prefixe, possibles):
+            for terme in groupe:
+                postings = self.postings.get(terme)
+                if postings is not None:
+                    slots.update(postings[0])
+        return {self.pks[slot] for slot in slots if self.pks[slot] >= 0}
+
+    def rechercher(self, mots, k, prefixe=True, autorises=None, possibles=()):
+        """
+        Top-k BM25 : [(pk, score)]. Un document doit contenir tous les mots
+        (le dernier en préfixe, ou l'une de ses racines ``possibles``, voir
+        recherche.saisie) ; sinon, ceux qui en contiennent au moins un.
+        ``autorises`` (ensemble de pk) restreint les candidats avant la sélection.
+        """
+        if not mots or not self.vivants:
+            return []
+        if autorises is not None:
+            permis = {self.slots[pk] for pk in autorises if pk in self.slots}
+            if not permis:
+                return []
+        groupes = self._groupes(mots, prefixe, possibles)
+
+        n = self.vivants
+        longueur_moyenne = self.total_termes / n
+        scores, couverts = {}, Counter()
+        for groupe in groupes:
+            vus = set()
+            for terme in groupe:
+                postings = self.postings.get(terme)
+                if postings is None:
+                    continue
+                vivants = [(s, tf) for s, tf in zip(*postings) if self.pks[s] >= 0]
+                idf = math.log(1 + (n - len(vivants) + 0.5) / (len(vivants) + 0.5))
+                if autorises is not None:
+                    vivants = [(s, tf) for s, tf in vivants if s in permis]
+                for slot, tf in vivants:
+                    norme = K1 * (1 - B + B * self.longueurs[slot] / longueur_moyenne)
+                    scores[slot] = scores.get(slot, 0.0) + idf * tf * (K1 + 1) / (tf + norme)
+                    vus.add(slot)
+            couverts.update(vus)
+
+        candidats = [slot for slot, nombre in couverts.items() if nombre == len(groupes)] or list(scores)
+        meilleurs = heapq.nlargest(k, candidats, key=scores.__getitem__)
+        return [(self.pks[slot], scores[slot]) for slot in meilleurs]
+
+
+def _hachage_documents(modele):
+    """Hachage de tous les documents, par pk croissant"""
+    hachage = hashlib.blake2b(digest_size=16)
+    lignes = modele.objects.order_by('pk').values_list('pk', 'document_recherche')
+    for pk, document in lignes.iterator(chunk_size=2000):
+        hachage.update(f'{pk}\0{document}\n'.encode('utf-8'))
+    return hachage.hexdigest()
+
+
+def _empreinte(modele):
+    """
+    Nombre de lignes, plus grand pk et dernière modification : détecte un
+    instantané périmé. Sans champ de modification (Medecin : un renommage ne
+    change ni le nombre de lignes ni le plus grand pk), les documents sont hachés.
+    """
+    agregats = {'lignes': Count('pk'), 'pk_max': Max('pk')}
+    champ = CHAMPS_MODIFICATION.get(modele.__name__)
+    if champ:
+        agregats['modifie'] = Max(champ)
+    empreinte = [str(valeur) for _, valeur in sorted(modele.objects.aggregate(**agregats).items())]
+    if not champ:
+        empreinte.append(_hachage_documents(modele))
+    return empreinte
+
+
+class IndexMemoire:
+    """Collections de tous les modèles indexés, protégées par un verrou"""
+
+    def __init__(self):
+        self.collections = {}
+        self.empreintes = {}
+        self._verrou = threading.RLock()
+        self._mmap = None
+
+    @staticmethod
+    def _cle(modele):
+        return modele._meta.label
+
+    def construire(self, modele):
+        collection = Collection()
+        lignes = modele.objects.order_by().values_list('pk', 'document_recherche')
+        for pk, document in lignes.iterator(chunk_size=2000):
+            collection.ajouter(pk, document)
+        with self._verrou:
+            self.collections[self._cle(modele)] = collection
+            self.empreintes[self._cle(modele)] = _empreinte(modele)
+        logger.info(f"🔎 Index {self._cle(modele)} construit : {collection.vivants} document(s)")
+
+    def mettre_a_jour(self, modele, pk, document):
+        """Ajoute / remplace le document ``pk`` (retrait si ``document`` est None)"""
+        with self._verrou:
+            collection = self.collections.setdefault(self._cle(modele), Collection())
+            if document is None:
+                collection.retirer(pk)
+            else:
+                collection.ajouter(pk, document)
+
+    def rechercher(self, modele, texte, k=10, autorises=None):
+        """[(pk, score)] des ``k`` meilleurs documents (parmi les pk ``autorises``), sans requête SQL"""
+        mots, possibles = recherche.saisie(texte)
+        with self._verrou:
+            collection = self.collections.get(self._cle(modele))
+            if collection is None:
+                return []
+            return collection.rechercher(mots, k, autorises=autorises, possibles=possibles)
+
+    def candidats(self, modele, texte):
+        """pk des documents qui contiennent au moins un terme de ``texte``, sans requête SQL"""
+        mots, possibles = recherche.saisie(texte)
+        with self._verrou:
+            collection = self.collections.get(self._cle(modele))
+            if collection is None or not mots:
+                return set()
+            return collection.candidats(mots, possibles=possibles)
+
+    # -------------------- Instantané --------------------
+
+    def sauvegarder(self, chemin):
+        """Écrit l'instantané (fichier temporaire puis remplacement atomique)"""
+        entete, blocs, position = {'collections': {}}, [], 0
+
+        def ajouter_bloc(tableau):
+            nonlocal position
+            donnees = tableau.tobytes()
+            donnees += b'\0' * (-len(donnees) % ALIGNEMENT)
+            debut = position
+            blocs.append(donnees)
+            position += len(donnees)
+            return debut
+
+        with self._verrou:
+            for cle, collection in self.collections.items():
+                collection.compacter()
+                entete['collections'][cle] = {
+                    'empreinte': self.empreintes.get(cle),
+                    'total_termes': collection.total_termes,
+                    'documents': len(collection.pks),
+                    'pks': ajouter_bloc(collection.pks),
+                    'longueurs': ajouter_bloc(collection.longueurs),
+                    'termes': {
+                        terme: [ajouter_bloc(array('I', slots)), ajouter_bloc(array('H', tfs)), len(slots)]
+                        for terme, (slots, tfs) in collection.postings.items()
+                    },
+                }
+
+        octets_entete = json.dumps(entete).encode('utf-8')
+        octets_entete += b' ' * (-(len(MAGIC) + 8 + len(octets_entete)) % ALIGNEMENT)
+        temporaire = f'{chemin}.tmp'
+        with open(temporaire, 'wb') as fichier:
+            fichier.write(MAGIC)
+            fichier.write(struct.pack('<Q', len(octets_entete)))
+            fichier.write(octets_entete)
+            for bloc in blocs:
+                fichier.write(bloc)
+        os.replace(temporaire, chemin)
+
+    @classmethod
+    def charger(cls, chemin):
+        """Relit un instantané par mmap ; les postings restent dans le fichier mappé"""
+        index = cls()
+        with open(chemin, 'rb') as fichier:
+            index._mmap = mmap.mmap(fichier.fileno(), 0, access=mmap.ACCESS_READ)
+        vue = memoryview(index._mmap)
+        if bytes(vue[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{chemin} n'est pas un instantané d'index de recherche")
+        (taille_entete,) = struct.unpack('<Q', vue[len(MAGIC):len(MAGIC) + 8])
+        debut_donnees = len(MAGIC) + 8 + taille_entete
+        entete = json.loads(bytes(vue[len(MAGIC) + 8:debut_donnees]))
+        donnees = vue[debut_donnees:]
+
+        def lire(position, nombre, code):
+            taille = array(code).itemsize
+            return donnees[position:position + nombre * taille].cast(code)
+
+        for cle, contenu in entete['collections'].items():
+            collection = Collection()
+            documents = contenu['documents']
+            collection.pks = array('q', lire(contenu['pks'], documents, 'q'))
+            collection.longueurs = array('I', lire(contenu['longueurs'], documents, 'I'))
+            collection.slots = {pk: slot for slot, pk in enumerate(collection.pks)}
+            collection.total_termes = contenu['total_termes']
+            collection.postings = {
+                terme: (lire(slots, nombre, 'I'), lire(tfs, nombre, 'H'))
+                for terme, (slots, tfs, nombre) in contenu['termes'].items()
+            }
+            index.collections[cle] = collection
+            index.empreintes[cle] = contenu['empreinte']
+        return index
+
+
+def charger_ou_construire(chemin=None):
+    """
+    Reprend l'instantané ``chemin`` s'il existe, reconstruit les collections
+    dont l'empreinte a changé (ou toutes) et réécrit l'instantané si besoin.
+    """
+    index = None
+    if chemin and os.path.exists(chemin):
+        try:
+            index = IndexMemoire.charger(chemin)
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Instantané de recherche illisible, reconstruction : {e}")
+    index = index or IndexMemoire()
+
+    reconstruites = 0
+    for modele in recherche.modeles_indexes():
+        cle = IndexMemoire._cle(modele)
+        if cle not in index.collections or index.empreintes.get(cle) != _empreinte(modele):
+            index.construire(modele)
+            reconstruites += 1
+    if chemin and reconstruites:
+        index.sauvegarder(chemin)
+    return index
+
+
+_index = None
+_verrou_index = threading.Lock()
+
+
+def index():
+    """Index du processus, chargé ou construit au premier appel"""
+    global _index
+    with _verrou_index:
+        if _index is None:
+            _index = charger_ou_construire(getattr(settings, 'SEARCH_INDEX_PATH', None))
+        return _index
+
+
+def index_charge():
+    return _index
+
+
+def reinitialiser():
+    """Oublie l'index du processus (tests, reconstruction complète)"""
+    global _index
+    with _verrou_index:
+        _index = None
+
+
+class RechercheMemoire(recherche.RechercheSimple):
+    """Même interface que les moteurs de la base : classement BM25 en mémoire"""
+
+    def filtrer(self, queryset, texte):
+        autorises = None
+        if queryset.query.where:
+            # Filtres du queryset appliqués avant la sélection des meilleurs, sur
+            # les seuls documents qui contiennent un terme de la requête
+            candidats = sorted(index().candidats(queryset.model, texte))
+            autorises = set()
+            for debut in range(0, len(candidats), TAILLE_LOT_FILTRE):
+                autorises.update(
+                    queryset.order_by()
+                    .filter(pk__in=candidats[debut:debut + TAILLE_LOT_FILTRE])
+                    .values_list('pk', flat=True)
+                )
+        resultats = index().rechercher(
+            queryset.model, texte, getattr(settings, 'SEARCH_MEMORY_MAX_RESULTS', 200), autorises
+        )
+        if not resultats:
+            return queryset.none()
+        pertinence = Case(
+            *[When(pk=pk, then=Value(score)) for pk, score in resultats], output_field=FloatField()
+        )
+        return (
+            queryset.filter(pk__in=[pk for pk, _ in resultats])
+            .annotate(pertinence=pertinence)
+            .order_by('-pertinence')
+        )
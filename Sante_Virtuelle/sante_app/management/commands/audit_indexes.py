@@ -0,0 +1,241 @@
+"""
+Audit des index sur les requêtes de référence.
+
+Chaque requête fréquente de l'application (agenda, messagerie, rappels,
+urgences...) est passée à EXPLAIN via ``QuerySet.explain()``. Le rapport
+indique, pour chacune, l'index attendu, les index réellement choisis par le
+planificateur et les parcours complets de table.
+
+Sont signalés :
+    - les index attendus absents de la base (migration non appliquée) ;
+    - les requêtes dont le plan ne passe pas par l'index attendu ;
+    - les index inutilisés : sur PostgreSQL d'après pg_stat_user_indexes
+      (idx_scan = 0 depuis la dernière remise à zéro des statistiques),
+      ailleurs les index déclarés qu'aucune requête de référence n'utilise.
+      Les contraintes d'unicité ne sont pas concernées : leur index sert
+      l'intégrité des données, pas les lectures.
+
+Sur une base presque vide, PostgreSQL préfère souvent un Seq Scan :
+``--forcer-index`` désactive enable_seqscan le temps de l'audit pour vérifier
+que l'index est au moins utilisable.
+
+Les index partiels sur une liste de statuts (``statut IN (...)``) ne sont
+vérifiés que sur PostgreSQL : SQLite ne peut pas prouver qu'une requête à
+paramètres liés respecte leur condition et ne les choisit jamais.
+"""
+from datetime import datetime, time, timedelta
+import re
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from sante_app.availability import STATUTS_ACTIFS
+
+
+def _requetes_reference():
+    """
+    (nom, queryset, index attendus, PostgreSQL seulement) : un des index attendus
+    doit apparaître dans le plan
+    """
+    from sante_app.models import (
+        Article, AuditLog, HistoriquePriseMedicament, Message, Notification,
+        NotificationUrgence, RappelMedicament, RendezVous, Urgence,
+    )
+
+    aujourd_hui = timezone.localdate()
+    debut_jour = timezone.make_aware(datetime.combine(aujourd_hui, time.min))
+    ouvertes = ['en_attente', 'prise_en_charge']
+
+    return [
+        ('Agenda du médecin', RendezVous.objects.filter(
+            medecin_id=1, date=aujourd_hui, statut__in=STATUTS_ACTIFS,
+        ), ('rdv_medecin_date_statut_idx', 'unique_creneau_actif_medecin'), False),
+        ('Rendez-vous à venir du patient', RendezVous.objects.filter(
+            patient_id=1, date__gte=aujourd_hui,
+        ).order_by('date'), ('rdv_patient_date_idx',), False),
+        ('Rendez-vous actifs des prochains jours', RendezVous.objects.filter(
+            statut__in=STATUTS_ACTIFS, date__gte=aujourd_hui, date__lte=aujourd_hui + timedelta(days=1),
+        ), ('rdv_actifs_date_heure_idx',), True),
+        ('Rendez-vous non consolidés (statistiques)', RendezVous.objects.filter(
+            date__gt=aujourd_hui - timedelta(days=1),
+        ).values('statut'), ('rdv_date_statut_idx',), False),
+        ('Messages non lus d\'une conversation', Message.objects.filter(
+            conversation_id=1, is_read=False,
+        ).exclude(sender_id=1), ('message_non_lus_idx',), False),
+        ('Historique paginé des messages', Message.objects.filter(
+            conversation_id=1, id__lt=1000,
+        ).order_by('-id'), ('message_conversation_id_idx',), False),
+        ('Articles publiés', Article.objects.filter(
+            statut='valide',
+        ).order_by('-date_publication'), ('article_statut_date_idx',), False),
+        ('Rappels de médicaments dus', RappelMedicament.objects.filter(
+            actif=True, heure_rappel__gte=time(8, 0), heure_rappel__lt=time(8, 2),
+        ), ('rappel_actifs_heure_idx',), False),
+        ('Prises du jour d\'un rappel', HistoriquePriseMedicament.objects.filter(
+            rappel_id=1, date_prise__gte=debut_jour, date_prise__lt=debut_jour + timedelta(days=1),
+        ), ('historique_rappel_date_idx',), False),
+        ('File des urgences', Urgence.objects.filter(
+            statut='en_attente',
+        ).order_by('-priorite', '-date_creation'), ('urgence_statut_priorite_idx',), False),
+        ('Urgences critiques ouvertes', Urgence.objects.filter(
+            priorite='critique', statut__in=ouvertes,
+        ), ('urgence_ouvertes_idx',), True),
+        ('Journal d\'audit d\'un utilisateur', AuditLog.objects.filter(
+            user_id=1,
+        ).order_by('-timestamp'), ('auditlog_user_timestamp_idx',), False),
+        ('Notifications non lues', Notification.objects.filter(
+            medecin_id=1, lu=False,
+        ), ('notification_non_lues_idx',), False),
+        ('Alertes d\'urgence non lues', NotificationUrgence.objects.filter(
+            medecin_id=1, lue=False,
+        ), ('notif_urgence_non_lues_idx',), False),
+    ]
+
+
+def index_declares():
+    """{nom d'index: table} pour les index et contraintes nommés de sante_app"""
+    declares = {}
+    for modele in apps.get_app_config('sante_app').get_models():
+        table = modele._meta.db_table
+        for index in modele._meta.indexes:
+            declares[index.name] = table
+        for contrainte in modele._meta.constraints:
+            declares[contrainte.name] = table
+    return declares
+
+
+def contraintes_uniques():
+    """
+    Noms des contraintes d'unicité de sante_app : elles garantissent
+    l'intégrité des données, même si aucune lecture ne passe par leur index,
+    et ne sont jamais signalées comme inutilisées.
+    """
+    return {
+        contrainte.name
+        for modele in apps.get_app_config('sante_app').get_models()
+        for contrainte in modele._meta.constraints
+        if isinstance(contrainte, models.UniqueConstraint)
+    }
+
+
+def index_en_base():
+    """Noms des index présents dans la base, toutes tables confondues"""
+    with connection.cursor() as cursor:
+        tables = connection.introspection.table_names(cursor)
+        return {
+            nom
+            for table in tables
+            for nom, details in connection.introspection.get_constraints(cursor, table).items()
+            if details['index'] or details['unique']
+        }
+
+
+def parcours_complets(plan):
+    """Tables lues en entier d'après le texte du plan (SQLite ou PostgreSQL)"""
+    if connection.vendor == 'postgresql':
+        return re.findall(r'Seq Scan on "?(\w+)"?', plan)
+    # SQLite : "SCAN Table" (sans USING INDEX) est un parcours complet
+    return [
+        table for table, suite in re.findall(r'\bSCAN (\w+)(.*)', plan)
+        if 'USING' not in suite
+    ]
+
+
+def index_inutilises_postgres(noms):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexrelname FROM pg_stat_user_indexes WHERE idx_scan = 0 AND indexrelname = ANY(%s)",
+            [list(noms)],
+        )
+        return sorted(ligne[0] for ligne in cursor.fetchall())
+
+
+def auditer(forcer_index=False):
+    """
+    Retourne {'requetes': [...], 'absents': [...], 'inutilises': [...]}.
+    Chaque requête : {'nom', 'attendus', 'utilises', 'parcours_complets', 'ok'},
+    'ok' valant None quand la vérification ne s'applique pas à ce moteur.
+    """
+    declares = index_declares()
+    presents = index_en_base()
+    postgres = connection.vendor == 'postgresql'
+    resultats = []
+    non_verifiables = set()
+
+    with transaction.atomic():
+        if forcer_index and postgres:
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+        for nom, queryset, attendus, postgres_seulement in _requetes_reference():
+            plan = queryset.explain()
+            utilises = sorted(index for index in declares if re.search(rf'\b{index}\b', plan))
+            ok = any(index in utilises for index in attendus)
+            if postgres_seulement and not postgres and not ok:
+                ok = None
+                non_verifiables.update(attendus)
+            resultats.append({
+                'nom': nom,
+                'attendus': list(attendus),
+                'utilises': utilises,
+                'parcours_complets': parcours_complets(plan),
+                'ok': ok,
+            })
+
+    attendus = {index for resultat in resultats for index in resultat['attendus']}
+    absents = sorted(index for index in attendus if index not in presents)
+
+    surveilles = (set(declares) & presents) - contraintes_uniques()
+    if postgres:
+        inutilises = index_inutilises_postgres(surveilles)
+    else:
+        utilises = {index for resultat in resultats for index in resultat['utilises']} | non_verifiables
+        inutilises = sorted(surveilles - utilises)
+
+    return {'requetes': resultats, 'absents': absents, 'inutilises': inutilises}
+
+
+class Command(BaseCommand):
+    help = "Vérifie avec EXPLAIN que les requêtes fréquentes utilisent leurs index"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--forcer-index', action='store_true',
+            help="PostgreSQL : désactive enable_seqscan pendant l'audit (utile sur une base de test)",
+        )
+
+    def handle(self, *args, **options):
+        rapport = auditer(forcer_index=options['forcer_index'])
+
+        for requete in rapport['requetes']:
+            if requete['ok']:
+                self.stdout.write(f"✅ {requete['nom']} : {', '.join(requete['utilises'])}")
+            elif requete['ok'] is None:
+                self.stdout.write(
+                    f"⏭️ {requete['nom']} : {' ou '.join(requete['attendus'])} vérifié sur PostgreSQL uniquement"
+                )
+            else:
+                detail = ', '.join(requete['parcours_complets']) or 'aucun index attendu'
+                self.stdout.write(self.style.WARNING(
+                    f"⚠️ {requete['nom']} : attendu {' ou '.join(requete['attendus'])}, "
+                    f"plan : {detail}"
+                ))
+
+        for index in rapport['absents']:
+            self.stdout.write(self.style.ERROR(f"❌ Index manquant en base : {index} (migrate ?)"))
+
+        if rapport['inutilises']:
+            source = 'pg_stat_user_indexes' if connection.vendor == 'postgresql' else 'requêtes de référence'
+            self.stdout.write(f"💤 Index inutilisés ({source}) : {', '.join(rapport['inutilises'])}")
+
+        en_echec = sum(1 for requete in rapport['requetes'] if requete['ok'] is False)
+        if en_echec or rapport['absents']:
+            self.stdout.write(self.style.WARNING(
+                f"📊 {en_echec} requête(s) sans l'index attendu, {len(rapport['absents'])} index manquant(s)"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"📊 {len(rapport['requetes'])} requêtes de référence couvertes par leurs index"
+            ))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from sante_app.outbox import envoyer_lot, vider_outbox
+
+
+class Command(BaseCommand):
+    help = "Envoie les emails en attente dans l'outbox (worker, plusieurs instances possibles)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Vider l'outbox une fois puis quitter")
+        parser.add_argument('--batch-size', type=int, default=None, help='Nombre de messages par lot')
+        parser.add_argument('--interval', type=float, default=5.0, help='Pause (secondes) quand il n\'y a rien à envoyer')
+
+    def handle(self, *args, **options):
+        taille = options['batch_size']
+
+        if options['once']:
+            resultat = vider_outbox(taille)
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {resultat['envoyes']} email(s) envoyé(s), {resultat['echecs']} échec(s)"
+            ))
+            return
+
+        self.stdout.write("📬 Worker outbox démarré (Ctrl+C pour arrêter)")
+        try:
+            while True:
+                resultat = envoyer_lot(taille)
+                if resultat['envoyes'] or resultat['echecs']:
+                    self.stdout.write(f"📤 {resultat['envoyes']} envoyé(s), {resultat['echecs']} échec(s)")
+                if resultat['lus'] == 0:
+                    time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("🛑 Worker outbox arrêté")
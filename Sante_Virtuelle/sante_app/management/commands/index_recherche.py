@@ -0,0 +1,33 @@
+"""
+Reconstruit l'index de recherche en mémoire et écrit son instantané.
+
+À lancer avant le démarrage (ou après un import en masse) quand
+SEARCH_BACKEND = 'memoire' et SEARCH_INDEX_PATH sont réglés : le serveur
+reprend alors l'instantané par mmap au lieu de relire les tables.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from sante_app import index_memoire, recherche
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche en mémoire et écrit son instantané (SEARCH_INDEX_PATH)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chemin', help="Fichier de l'instantané (défaut : SEARCH_INDEX_PATH)")
+
+    def handle(self, *args, **options):
+        chemin = options['chemin'] or getattr(settings, 'SEARCH_INDEX_PATH', None)
+        if not chemin:
+            raise CommandError("Aucun fichier d'instantané : renseigner SEARCH_INDEX_PATH ou --chemin")
+
+        index = index_memoire.IndexMemoire()
+        for modele in recherche.modeles_indexes():
+            index.construire(modele)
+            collection = index.collections[modele._meta.label]
+            self.stdout.write(
+                f"🔎 {modele.__name__} : {collection.vivants} document(s), {len(collection.postings)} terme(s)"
+            )
+        index.sauvegarder(chemin)
+        self.stdout.write(self.style.SUCCESS(f"✅ Instantané écrit : {chemin}"))
@@ -0,0 +1,20 @@
+"""
+Reconstruit la vue de lecture des centres de santé (EtablissementSante).
+
+Les signaux recopient chaque écriture faite par save() / delete() ; un import
+en masse (bulk_create, update(), SQL direct) ne les déclenche pas. Lancer
+cette commande après un tel import : toutes les tables d'écriture (Hopital,
+Clinique, Pharmacie, Dentiste) sont recopiées, puis la grille de proximité et
+le flux GeoJSON sont invalidés.
+"""
+from django.core.management.base import BaseCommand
+
+from sante_app import etablissements
+
+
+class Command(BaseCommand):
+    help = "Reconstruit la vue des établissements de santé à partir des tables d'écriture"
+
+    def handle(self, *args, **options):
+        nombre = etablissements.reconstruire()
+        self.stdout.write(self.style.SUCCESS(f"✅ Vue des établissements reconstruite : {nombre} centre(s)"))
@@ -0,0 +1,89 @@
+"""
+Requêtes de la messagerie.
+
+``boite_de_reception`` construit la liste des conversations d'un utilisateur
+en un nombre fixe de requêtes, quel que soit le nombre de conversations :
+le dernier message (contenu et date) est une sous-requête, le nombre de
+messages non lus un COUNT conditionnel, et les participants sont préchargés
+en une seule requête. ConversationSerializer lit ces annotations.
+
+``page_messages`` pagine l'historique d'une conversation par identifiant de
+message (curseurs ``before`` / ``after``) et ``marquer_conversation_lue``
+pose les accusés de lecture en un seul UPDATE.
+"""
+from django.db import transaction
+from django.db.models import Count, OuterRef, Prefetch, Q, Subquery
+from django.utils import timezone
+
+from . import compteurs
+from .models import Conversation, Message, User
+from .temps_reel import notifier_utilisateurs
+
+TAILLE_PAGE_MESSAGES = 50
+TAILLE_PAGE_MESSAGES_MAX = 200
+
+
+def boite_de_reception(user):
+    """Conversations de ``user``, annotées pour ConversationSerializer"""
+    derniers_messages = Message.objects.filter(conversation=OuterRef('pk')).order_by('-timestamp', '-id')
+
+    return (
+        Conversation.objects.filter(participants=user)
+        .annotate(
+            last_message_content=Subquery(derniers_messages.values('content')[:1]),
+            last_message_timestamp=Subquery(derniers_messages.values('timestamp')[:1]),
+            unread=Count(
+                'messages',
+                filter=Q(messages__is_read=False) & ~Q(messages__sender=user),
+            ),
+        )
+        .prefetch_related(Prefetch(
+            'participants',
+            queryset=User.objects.only('id', 'username', 'first_name', 'last_name', 'role'),
+        ))
+    )
+
+
+def page_messages(conversation, before=None, after=None, limit=TAILLE_PAGE_MESSAGES):
+    """
+    Une page de messages, du plus récent au plus ancien.
+
+    Sans curseur : les ``limit`` derniers messages. ``before=<id>`` : les
+    messages plus anciens que ``id`` (historique). ``after=<id>`` : les
+    messages arrivés après ``id``, sans trou (les plus anciens d'abord si
+    plus de ``limit`` sont arrivés). Retourne (messages, has_more).
+    """
+    messages = Message.objects.filter(conversation=conversation).select_related('sender')
+    if after is not None:
+        lot = list(messages.filter(id__gt=after).order_by('id')[:limit + 1])
+        has_more = len(lot) > limit
+        return lot[:limit][::-1], has_more
+
+    if before is not None:
+        messages = messages.filter(id__lt=before)
+    lot = list(messages.order_by('-id')[:limit + 1])
+    return lot[:limit], len(lot) > limit
+
+
+def marquer_conversation_lue(conversation, lecteur):
+    """
+    Marque comme lus, en un seul UPDATE, les messages reçus par ``lecteur``
+    dans la conversation, puis prévient les autres participants
+    (événement WebSocket 'messages_read'). Retourne le nombre de messages marqués.
+    """
+    lu_le = timezone.now()
+    with transaction.atomic():
+        marques = Message.objects.filter(conversation=conversation, is_read=False).exclude(
+            sender=lecteur
+        ).update(is_read=True, read_at=lu_le)
+        compteurs.messages_lus(lecteur.pk, marques)
+
+    if marques:
+        autres = conversation.participants.exclude(pk=lecteur.pk).values_list('pk', flat=True)
+        notifier_utilisateurs(autres, {
+            'type': 'messages_read',
+            'conversation_id': conversation.pk,
+            'reader_id': lecteur.pk,
+            'read_at': lu_le.isoformat(),
+        })
+    return marques
@@ -0,0 +1,68 @@
+"""
+Authentification des WebSockets par jeton JWT (SimpleJWT).
+
+Le navigateur ne peut pas envoyer d'en-tête Authorization lors de la poignée
+de main WebSocket : le jeton d'accès est passé dans l'URL
+(``ws/consultation/<id>/<user_id>/?token=<access>``). Le middleware valide le
+jeton et place l'utilisateur dans ``scope['user']`` une seule fois par
+connexion ; les consumers n'ont plus à relire l'utilisateur à chaque message.
+
+L'utilisateur est relu en base à chaque poignée de main (un SELECT par clé
+primaire) : il n'est pas mis en cache, pour qu'un compte désactivé soit
+refusé immédiatement sur tous les workers et que le hash du mot de passe ne
+se retrouve pas dans le cache.
+"""
+from urllib.parse import parse_qs
+
+from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+def _jeton(scope):
+    """Jeton d'accès : paramètre ?token=, sinon en-tête Authorization: Bearer"""
+    params = parse_qs(scope.get('query_string', b'').decode())
+    if params.get('token'):
+        return params['token'][0]
+    for nom, valeur in scope.get('headers', []):
+        if nom == b'authorization':
+            morceaux = valeur.decode().split()
+            if len(morceaux) == 2 and morceaux[0].lower() == 'bearer':
+                return morceaux[1]
+    return None
+
+
+@database_sync_to_async
+def utilisateur_depuis_jeton(jeton):
+    """Utilisateur actif correspondant au jeton, ou AnonymousUser"""
+    from .models import User
+
+    try:
+        user_id = AccessToken(jeton)[api_settings.USER_ID_CLAIM]
+    except (TokenError, KeyError):
+        return AnonymousUser()
+
+    try:
+        user = User.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+    except User.DoesNotExist:
+        return AnonymousUser()
+    return user if user.is_active else AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """Place l'utilisateur du jeton JWT dans scope['user']"""
+
+    async def __call__(self, scope, receive, send):
+        jeton = _jeton(scope)
+        if jeton:
+            scope = dict(scope, user=await utilisateur_depuis_jeton(jeton))
+        return await super().__call__(scope, receive, send)
+
+
+def JWTAuthMiddlewareStack(inner):
+    """Session Django (AuthMiddlewareStack) puis jeton JWT s'il est fourni"""
+    return AuthMiddlewareStack(JWTAuthMiddleware(inner))
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:03
+
+import logging
+
+from django.db import migrations, models
+from django.db.models import Case, Count, IntegerField, Q, Value, When
+from django.db.models.functions import Concat
+
+logger = logging.getLogger(__name__)
+
+STATUTS_ACTIFS = ['PENDING', 'CONFIRMED', 'RESCHEDULED']
+
+
+def annuler_doublons(apps, schema_editor):
+    """
+    Un seul rendez-vous actif par (medecin, date, heure) avant l'ajout de la
+    contrainte : un rendez-vous confirmé ou reprogrammé passe avant un
+    rendez-vous en attente, puis le plus ancien (plus petit numéro). Les
+    autres passent en CANCELLED, avec une note dans leur description qui
+    indique le rendez-vous gardé, pour pouvoir prévenir les patients.
+    """
+    RendezVous = apps.get_model('sante_app', 'RendezVous')
+    actifs = RendezVous.objects.filter(statut__in=STATUTS_ACTIFS)
+    creneaux = (
+        actifs.values('medecin_id', 'date', 'heure')
+        .annotate(nombre=Count('numero'))
+        .filter(nombre__gt=1)
+        .order_by()
+    )
+    priorite = Case(When(statut='PENDING', then=Value(1)), default=Value(0), output_field=IntegerField())
+    annules = []
+    for creneau in creneaux:
+        garde, *doublons = (
+            actifs.filter(medecin_id=creneau['medecin_id'], date=creneau['date'], heure=creneau['heure'])
+            .order_by(priorite, 'numero')
+            .values_list('numero', flat=True)
+        )
+        note = f"[Annulé automatiquement : doublon du rendez-vous n°{garde} sur le même créneau]"
+        RendezVous.objects.filter(numero__in=doublons).update(
+            statut='CANCELLED',
+            description=Case(
+                When(Q(description__isnull=True) | Q(description=''), then=Value(note)),
+                default=Concat('description', Value(f'\n{note}')),
+                output_field=models.TextField(),
+            ),
+        )
+        annules.extend(doublons)
+    if annules:
+        logger.warning(f"⚠️ {len(annules)} rendez-vous en double sur un créneau actif annulé(s) : {sorted(annules)}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sante_app', '0032_auto_20251101_2203'),
+    ]
+
+    operations = [
+        migrations.RunPython(annuler_doublons, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='rendezvous',
+            constraint=models.UniqueConstraint(condition=models.Q(('statut__in', ['PENDING', 'CONFIRMED', 'RESCHEDULED'])), fields=('medecin', 'date', 'heure'), name='unique_creneau_actif_medecin'),
+        ),
+    ]
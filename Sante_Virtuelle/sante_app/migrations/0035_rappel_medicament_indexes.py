@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sante_app', '0034_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historiqueprisemedicament',
+            index=models.Index(fields=['rappel', 'date_prise'], name='historique_rappel_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rappelmedicament',
+            index=models.Index(fields=['actif', 'heure_rappel'], name='rappel_actif_heure_idx'),
+        ),
+    ]
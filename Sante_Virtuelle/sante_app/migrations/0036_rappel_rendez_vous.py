@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sante_app', '0035_rappel_medicament_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RappelRendezVous',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_rappel', models.CharField(choices=[('24h', '24 heures avant'), ('2h', '2 heures avant'), ('15min', '15 minutes avant')], max_length=10)),
+                ('date_envoi', models.DateTimeField(auto_now_add=True)),
+                ('rendez_vous', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rappels_envoyes', to='sante_app.rendezvous')),
+            ],
+            options={
+                'db_table': 'RappelRendezVous',
+                'ordering': ['-date_envoi'],
+                'constraints': [models.UniqueConstraint(fields=('rendez_vous', 'type_rappel'), name='unique_rappel_rdv_type')],
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sante_app', '0036_rappel_rendez_vous'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BailTache',
+            fields=[
+                ('nom', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('proprietaire', models.CharField(max_length=255)),
+                ('expire_le', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'BailTache',
+            },
+        ),
+        migrations.CreateModel(
+            name='ExecutionTache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tache', models.CharField(max_length=100)),
+                ('proprietaire', models.CharField(max_length=255)),
+                ('debut', models.DateTimeField()),
+                ('duree_ms', models.PositiveIntegerField(default=0)),
+                ('statut', models.CharField(choices=[('succes', 'Succès'), ('echec', 'Échec')], max_length=10)),
+                ('lignes_lues', models.PositiveIntegerField(default=0)),
+                ('envois', models.PositiveIntegerField(default=0)),
+                ('erreur', models.TextField(blank=True)),
+            ],
+            options={
+                'db_table': 'ExecutionTache',
+                'ordering': ['-debut'],
+                'indexes': [models.Index(fields=['tache', 'debut'], name='execution_tache_debut_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sante_app', '0038_message_conversation_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompteurNonLus',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='compteur_non_lus', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('messages', models.IntegerField(default=0)),
+                ('notifications', models.IntegerField(default=0)),
+                ('urgences', models.IntegerField(default=0)),
+                ('date_maj', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'CompteurNonLus',
+            },
+        ),
+    ]
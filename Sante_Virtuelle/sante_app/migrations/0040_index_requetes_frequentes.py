@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sante_app', '0039_compteur_non_lus'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='rappelmedicament',
+            name='rappel_actif_heure_idx',
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['statut', 'date_publication'], name='article_statut_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['user', 'timestamp'], name='auditlog_user_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['conversation', 'sender'], name='message_non_lus_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('lu', False)), fields=['medecin'], name='notification_non_lues_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notificationurgence',
+            index=models.Index(condition=models.Q(('lue', False)), fields=['medecin'], name='notif_urgence_non_lues_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rappelmedicament',
+            index=models.Index(condition=models.Q(('actif', True)), fields=['heure_rappel'], name='rappel_actifs_heure_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rendezvous',
+            index=models.Index(fields=['medecin', 'date', 'statut'], name='rdv_medecin_date_statut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rendezvous',
+            index=models.Index(fields=['patient', 'date'], name='rdv_patient_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rendezvous',
+            index=models.Index(condition=models.Q(('statut__in', ['PENDING', 'CONFIRMED', 'RESCHEDULED'])), fields=['date', 'heure'], name='rdv_actifs_date_heure_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='urgence',
+            index=models.Index(fields=['statut', 'priorite', 'date_creation'], name='urgence_statut_priorite_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='urgence',
+            index=models.Index(condition=models.Q(('statut__in', ['en_attente', 'prise_en_charge'])), fields=['priorite', 'date_creation'], name='urgence_ouvertes_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sante_app', '0040_index_requetes_frequentes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatistiqueJournaliere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField(unique=True)),
+                ('total', models.IntegerField(default=0)),
+                ('en_attente', models.IntegerField(default=0)),
+                ('confirmes', models.IntegerField(default=0)),
+                ('reprogrammes', models.IntegerField(default=0)),
+                ('annules', models.IntegerField(default=0)),
+                ('termines', models.IntegerField(default=0)),
+                ('date_calcul', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Statistique journalière',
+                'verbose_name_plural': 'Statistiques journalières',
+                'db_table': 'StatistiqueJournaliere',
+                'ordering': ['-jour'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='rendezvous',
+            index=models.Index(fields=['date', 'statut'], name='rdv_date_statut_idx'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:32
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+# Copie figée de l'analyseur de sante_app/recherche.py à la date de la
+# migration : les évolutions du code ne doivent pas changer son résultat.
+MOTS_VIDES = {
+    'a', 'au', 'aux', 'avec', 'ce', 'ces', 'cette', 'd', 'dans', 'de', 'des', 'du', 'elle', 'elles',
+    'en', 'est', 'et', 'il', 'ils', 'l', 'la', 'le', 'les', 'leur', 'leurs', 'ne', 'on', 'ou', 'par',
+    'pas', 'plus', 'pour', 'qu', 'que', 'qui', 's', 'sa', 'sans', 'se', 'ses', 'son', 'sont', 'sur',
+    'un', 'une',
+}
+
+SUFFIXES = sorted([
+    'issements', 'issement', 'atrices', 'ateurs', 'ations', 'ements', 'logies', 'logues',
+    'atrice', 'ateur', 'ation', 'ement', 'logie', 'logue', 'ments', 'euses', 'iques', 'ismes',
+    'istes', 'ables', 'ances', 'ences', 'ites', 'ment', 'euse', 'ives', 'ique', 'isme', 'iste',
+    'able', 'ance', 'ence', 'ite', 'eux', 'ive', 'ifs', 'ies', 'if', 'ie', 'es', 'er', 'ez',
+    'e', 's', 'x',
+], key=len, reverse=True)
+
+RACINE_MIN = 3
+
+
+def racine(mot):
+    if mot.isdigit():
+        return mot
+    for suffixe in SUFFIXES:
+        if mot.endswith(suffixe) and len(mot) - len(suffixe) >= RACINE_MIN:
+            return mot[:-len(suffixe)]
+    return mot
+
+
+def document(textes):
+    texte = unicodedata.normalize('NFKD', ' '.join(filter(None, textes)))
+    texte = ''.join(c for c in texte if not unicodedata.combining(c)).lower()
+    return ' '.join(racine(mot) for mot in re.findall(r'[a-z0-9]+', texte) if mot not in MOTS_VIDES)
+
+
+# Modèle -> (relations à charger, champs du document ; le titre d'un article compte double)
+CHAMPS = {
+    'Article': ((), lambda a: [a.titre, a.titre, a.resume, a.tags, a.contenu]),
+    'Medecin': (('user',), lambda m: [m.user.first_name, m.user.last_name, m.specialite]),
+}
+
+
+def remplir_documents(apps, schema_editor):
+    for nom, (relations, champs) in CHAMPS.items():
+        modele = apps.get_model('sante_app', nom)
+        lignes = list(modele.objects.select_related(*relations))
+        for ligne in lignes:
+            ligne.document_recherche = document(champs(ligne))
+        modele.objects.bulk_update(lignes, ['document_recherche'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sante_app', '0041_statistique_journaliere'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='document_recherche',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='medecin',
+            name='document_recherche',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(remplir_documents, migrations.RunPython.noop),
+    ]
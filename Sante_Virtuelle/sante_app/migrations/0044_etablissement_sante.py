@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+# Copie figée de sante_app/etablissements.py à la date de la migration
+SOURCES = {
+    'hopital': 'Hopital',
+    'clinique': 'Clinique',
+    'pharmacie': 'Pharmacie',
+    'dentiste': 'Dentiste',
+}
+
+
+def valeurs(instance):
+    return {
+        'nom': instance.nom,
+        'adresse': instance.adresse or '',
+        'telephone': instance.telephone or '',
+        'latitude': instance.latitude,
+        'longitude': instance.longitude,
+    }
+
+
+def remplir_etablissements(apps, schema_editor):
+    EtablissementSante = apps.get_model('sante_app', 'EtablissementSante')
+    lignes = [
+        EtablissementSante(type=type_centre, source_id=instance.pk, **valeurs(instance))
+        for type_centre, nom in SOURCES.items()
+        for instance in apps.get_model('sante_app', nom).objects.all()
+    ]
+    EtablissementSante.objects.bulk_create(lignes, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sante_app', '0043_connaissance_document_recherche'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EtablissementSante',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('hopital', 'Hôpital'), ('clinique', 'Clinique'), ('pharmacie', 'Pharmacie'), ('dentiste', 'Dentiste')], max_length=20)),
+                ('source_id', models.PositiveIntegerField()),
+                ('nom', models.CharField(max_length=200)),
+                ('adresse', models.CharField(blank=True, default='', max_length=255)),
+                ('telephone', models.CharField(blank=True, default='', max_length=20)),
+                ('latitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('longitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('date_maj', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'EtablissementSante',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='etablissementsante',
+            index=models.Index(fields=['latitude', 'longitude'], name='etablissement_lat_lng_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='etablissementsante',
+            constraint=models.UniqueConstraint(fields=('type', 'source_id'), name='etablissement_source_unique'),
+        ),
+        migrations.RunPython(remplir_etablissements, migrations.RunPython.noop),
+    ]
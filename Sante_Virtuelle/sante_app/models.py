@@ -4,6 +4,45 @@ from django.utils.text import slugify
 from django.utils import timezone
 # Importer les fonctions de chiffrement
 from .encryption import encrypt_field, decrypt_field
+from . import availability, recherche
+
+
+class SuiviModificationsMixin:
+    """
+    Mémorise, au chargement depuis la base, la valeur des champs listés dans
+    ``champs_suivis`` afin de détecter les changements (statut, date...) sans
+    relire la ligne avant chaque sauvegarde.
+    """
+    champs_suivis = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._valeurs_initiales = {
+            name: value for name, value in zip(field_names, values) if name in cls.champs_suivis
+        }
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self.memoriser_valeurs()
+
+    @property
+    def valeurs_initiales(self):
+        """Valeurs des champs suivis telles qu'en base (vide pour un nouvel objet)"""
+        return getattr(self, '_valeurs_initiales', {})
+
+    def valeur_initiale(self, champ):
+        return self.valeurs_initiales.get(champ)
+
+    def a_change(self, champ):
+        return champ in self.valeurs_initiales and self.valeurs_initiales[champ] != getattr(self, champ)
+
+    def memoriser_valeurs(self):
+        """À appeler après une sauvegarde : l'état courant devient l'état de référence"""
+        self._valeurs_initiales = {
+            champ: self.__dict__[champ] for champ in self.champs_suivis if champ in self.__dict__
+        }
 
 class User(AbstractUser):
     ROLES = (
@@ -44,6 +83,8 @@ class Medecin(models.Model):
     disponibilite = models.BooleanField(default=True)
 
     specialite = models.CharField(max_length=100)
+    # Nom et spécialité normalisés pour la recherche (voir recherche.py)
+    document_recherche = models.TextField(blank=True, default='', editable=False)
 
     class Meta :
         db_table = 'Medecin'
@@ -51,6 +92,10 @@ class Medecin(models.Model):
     def __str__(self):
         return f"Dr. {self.user.first_name} {self.user.last_name} ({self.specialite})"
 
+    def save(self, *args, **kwargs):
+        kwargs['update_fields'] = recherche.preparer(self, kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
+
 
 # -------------------- Disponibilité Médecin --------------------
 class DisponibiliteMedecin(models.Model):
@@ -301,7 +346,7 @@ class IndisponibiliteMedecin(models.Model):
         super().save(*args, **kwargs)
 
 # -------------------- Consultation --------------------
-class Consultation(models.Model):
+class Consultation(SuiviModificationsMixin, models.Model):
     numero = models.AutoField(primary_key=True)
     date = models.DateField()
     heure = models.TimeField()
@@ -317,6 +362,7 @@ class Consultation(models.Model):
         ('annulee', 'Annulée'),
     ]
     statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='programmee')
+    champs_suivis = ('statut',)
     
     # Ajouter des champs pour les données chiffrées
     notes_chiffrees = models.TextField(blank=True, verbose_name="Notes chiffrées")
@@ -339,42 +385,42 @@ class Consultation(models.Model):
         return decrypt_field(self.diagnostic_chiffre)
 
     def save(self, *args, **kwargs):
-        # Check if status is changing
-        old_statut = None
-        if self.numero:  # If this is an update, not a new object
-            try:
-                old_instance = Consultation.objects.get(numero=self.numero)
-                old_statut = old_instance.statut
-            except Consultation.DoesNotExist:
-                pass
+        # Statut avant modification, connu depuis le chargement (pas de relecture)
+        old_statut = self.valeur_initiale('statut')
         
         super().save(*args, **kwargs)
+        self.memoriser_valeurs()
         
         # If status changed and there's an associated RDV, update it
-        if old_statut and old_statut != self.statut and self.rendez_vous:
+        if old_statut and old_statut != self.statut and self.rendez_vous_id:
             self.update_associated_rdv()
 
     def update_associated_rdv(self):
-        """Update the associated RDV based on consultation status"""
-        try:
-            rendez_vous = self.rendez_vous
-            
-            # Update RDV status based on consultation status
-            if self.statut == 'annulee':
-                rendez_vous.statut = "CANCELLED"
-            elif self.statut == 'terminee':
-                rendez_vous.statut = "TERMINE"
-            elif self.statut == 'en_cours':
-                rendez_vous.statut = "CONFIRMED"  # Or you might want a new "IN_PROGRESS" status
-            elif self.statut == 'programmee':
-                # Only update to CONFIRMED if it's not already cancelled or completed
-                if rendez_vous.statut not in ["CANCELLED", "TERMINE"]:
-                    rendez_vous.statut = "CONFIRMED"
-            
-            rendez_vous.save()
-        except RendezVous.DoesNotExist:
-            # No associated RDV, nothing to update
-            pass
+        """Update the associated RDV based on consultation status (single UPDATE)"""
+        rendez_vous = RendezVous.objects.filter(pk=self.rendez_vous_id)
+        
+        # Update RDV status based on consultation status
+        if self.statut == 'annulee':
+            nouveau_statut = "CANCELLED"
+        elif self.statut == 'terminee':
+            nouveau_statut = "TERMINE"
+        elif self.statut == 'en_cours':
+            nouveau_statut = "CONFIRMED"  # Or you might want a new "IN_PROGRESS" status
+        elif self.statut == 'programmee':
+            # Only update to CONFIRMED if it's not already cancelled or completed
+            nouveau_statut = "CONFIRMED"
+            rendez_vous = rendez_vous.exclude(statut__in=["CANCELLED", "TERMINE"])
+        else:
+            return
+        
+        rendez_vous = rendez_vous.exclude(statut=nouveau_statut)
+        creneaux = list(rendez_vous.values_list('medecin_id', 'date'))
+        updated = rendez_vous.update(statut=nouveau_statut, date_modification=timezone.now())
+        
+        # L'UPDATE ne passe pas par les signaux : le créneau change d'état dans le cache
+        if updated:
+            for medecin_user_id, date_rdv in creneaux:
+                availability.invalider_journee_apres_commit(medecin_user_id, date_rdv)
 
     def __str__(self):
         return f"Consultation {self.numero} - {self.patient}"
@@ -384,7 +430,7 @@ class Consultation(models.Model):
 
 
 # -------------------- Rendez-vous --------------------
-class RendezVous(models.Model):
+class RendezVous(SuiviModificationsMixin, models.Model):
     numero = models.AutoField(primary_key=True)
     patient = models.ForeignKey(User, on_delete=models.CASCADE, related_name="rdv_patient")
     medecin = models.ForeignKey(User, on_delete=models.CASCADE, related_name="rdv_medecin")
@@ -417,58 +463,76 @@ class RendezVous(models.Model):
     original_date = models.DateField(null=True, blank=True)
     original_heure = models.TimeField(null=True, blank=True)
 
+    champs_suivis = ('statut', 'date', 'heure', 'medecin_id')
+
     def save(self, *args, **kwargs):
+        initiales = self.valeurs_initiales
+        
         # If this is the first time saving and it's being rescheduled, store original details
-        if self.statut == "RESCHEDULED" and not self.original_date and self.numero:
-            # Get the original appointment details
-            original = RendezVous.objects.get(numero=self.numero)
-            if not self.original_date:
-                self.original_date = original.date
-                self.original_heure = original.heure
+        if self.statut == "RESCHEDULED" and not self.original_date and 'date' in initiales:
+            self.original_date = initiales['date']
+            self.original_heure = initiales.get('heure')
         
-        # Check if status is changing
-        old_statut = None
-        if self.numero:  # If this is an update, not a new object
-            try:
-                old_instance = RendezVous.objects.get(numero=self.numero)
-                old_statut = old_instance.statut
-            except RendezVous.DoesNotExist:
-                pass
+        # Check if status is changing (value captured at load time, no refetch)
+        old_statut = initiales.get('statut')
         
         super().save(*args, **kwargs)
+        self.memoriser_valeurs()
         
         # If status changed, update associated teleconsultation if it exists
         if old_statut and old_statut != self.statut:
             self.update_associated_teleconsultation()
 
     def update_associated_teleconsultation(self):
-        """Update the associated teleconsultation based on RDV status"""
-        try:
-            # Get the associated consultation through the rendez_vous foreign key
-            consultation = Consultation.objects.get(rendez_vous=self)
-            teleconsultation = Teleconsultation.objects.get(consultation=consultation)
-            
-            # Update teleconsultation status based on RDV status
-            if self.statut == "CANCELLED":
-                consultation.statut = 'annulee'
-                teleconsultation.ended_at = timezone.now()  # End the teleconsultation
-            elif self.statut == "TERMINE":
-                consultation.statut = 'terminee'
-                teleconsultation.ended_at = timezone.now()  # End the teleconsultation
-            elif self.statut == "CONFIRMED":
-                consultation.statut = 'programmee'
-            
-            consultation.save()
-            teleconsultation.save()
-        except (Consultation.DoesNotExist, Teleconsultation.DoesNotExist):
-            # No associated consultation or teleconsultation, nothing to update
-            pass
+        """
+        Update the associated consultation/teleconsultation based on RDV status.
+        Uses single UPDATE statements, so no cascade of saves back to this RDV.
+        """
+        if self.statut == "CANCELLED":
+            consultation_statut, terminer = 'annulee', True
+        elif self.statut == "TERMINE":
+            consultation_statut, terminer = 'terminee', True
+        elif self.statut == "CONFIRMED":
+            consultation_statut, terminer = 'programmee', False
+        else:
+            return
+        
+        # Only consultations that have a teleconsultation are synchronised
+        Consultation.objects.filter(
+            rendez_vous_id=self.pk, teleconsultation__isnull=False
+        ).update(statut=consultation_statut)
+        if terminer:
+            Teleconsultation.objects.filter(
+                consultation__rendez_vous_id=self.pk
+            ).update(ended_at=timezone.now())  # End the teleconsultation
 
     def __str__(self):
         return f"{self.patient.username} - {self.date} {self.heure}"
     
     class Meta :
         db_table = 'RendezVous'
+        constraints = [
+            # Un seul rendez-vous actif par médecin et par créneau : c'est la base
+            # qui arbitre les réservations concurrentes (voir availability.STATUTS_ACTIFS)
+            models.UniqueConstraint(
+                fields=['medecin', 'date', 'heure'],
+                condition=models.Q(statut__in=['PENDING', 'CONFIRMED', 'RESCHEDULED']),
+                name='unique_creneau_actif_medecin',
+            ),
+        ]
+        indexes = [
+            # Agenda du médecin / du patient filtré par jour et par statut
+            models.Index(fields=['medecin', 'date', 'statut'], name='rdv_medecin_date_statut_idx'),
+            models.Index(fields=['patient', 'date'], name='rdv_patient_date_idx'),
+            # Statistiques : jours non consolidés, comptés par statut (index couvrant)
+            models.Index(fields=['date', 'statut'], name='rdv_date_statut_idx'),
+            # Rappels et plannings : seuls les rendez-vous actifs sont parcourus
+            models.Index(
+                fields=['date', 'heure'],
+                condition=models.Q(statut__in=['PENDING', 'CONFIRMED', 'RESCHEDULED']),
+                name='rdv_actifs_date_heure_idx',
+            ),
+        ]
 
 
 # -------------------- Pathologie --------------------
@@ -532,40 +596,36 @@ class Mesure(models.Model):
     constante = models.ForeignKey(Constante, on_delete=models.CASCADE, related_name="mesures")
 
 # -------------------- Teleconsultation --------------------
-class Teleconsultation(models.Model):
+class Teleconsultation(SuiviModificationsMixin, models.Model):
     id = models.AutoField(primary_key=True)
     consultation = models.OneToOneField(Consultation, on_delete=models.CASCADE, related_name="teleconsultation")
     channel_name = models.CharField(max_length=255, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     ended_at = models.DateTimeField(null=True, blank=True)
+
+    champs_suivis = ('ended_at',)
     
     def save(self, *args, **kwargs):
-        # Check if this is an update (not a new object) and if ended_at is being set
-        old_ended_at = None
-        if self.id:  # If this is an update, not a new object
-            try:
-                old_instance = Teleconsultation.objects.get(id=self.id)
-                old_ended_at = old_instance.ended_at
-            except Teleconsultation.DoesNotExist:
-                pass
+        # Value of ended_at before this save, captured at load time
+        old_ended_at = self.valeur_initiale('ended_at')
         
         super().save(*args, **kwargs)
+        self.memoriser_valeurs()
         
         # If ended_at was just set, update associated consultation and RDV
         if self.ended_at and (not old_ended_at or old_ended_at != self.ended_at):
             self.update_associated_entities()
 
     def update_associated_entities(self):
-        """Update the associated consultation and RDV when teleconsultation ends"""
+        """Update the associated consultation and RDV when teleconsultation ends (single UPDATEs)"""
         try:
-            # Update consultation status
-            self.consultation.statut = 'terminee'
-            self.consultation.save()
-            
-            # Update RDV status if it exists
-            if self.consultation.rendez_vous:
-                self.consultation.rendez_vous.statut = "TERMINE"
-                self.consultation.rendez_vous.save()
+            Consultation.objects.filter(pk=self.consultation_id).update(statut='terminee')
+            rendez_vous = RendezVous.objects.filter(consultation__pk=self.consultation_id)
+            creneaux = list(rendez_vous.values_list('medecin_id', 'date'))
+            rendez_vous.update(statut="TERMINE", date_modification=timezone.now())
+            # UPDATE sans signaux : le créneau est libéré dans le cache après COMMIT
+            for medecin_user_id, date_rdv in creneaux:
+                availability.invalider_journee_apres_commit(medecin_user_id, date_rdv)
         except Exception as e:
             # Log the error but don't fail the save operation
             print(f"Error updating associated entities: {e}")
@@ -620,9 +680,15 @@ class Article(models.Model):
     date_publication = models.DateTimeField(auto_now_add=True)
     date_modification = models.DateTimeField(auto_now=True)
     vues = models.IntegerField(default=0)
+    # Texte normalisé pour la recherche plein texte (voir recherche.py)
+    document_recherche = models.TextField(blank=True, default='', editable=False)
 
     class Meta:
         ordering = ['-date_publication']
+        indexes = [
+            # Liste publique : articles validés, du plus récent au plus ancien
+            models.Index(fields=['statut', 'date_publication'], name='article_statut_date_idx'),
+        ]
         verbose_name = "Article de Santé"
         verbose_name_plural = "Articles de Santé"
         db_table = 'Article'
@@ -639,11 +705,14 @@ class Article(models.Model):
             while Article.objects.filter(slug=self.slug).exists():
                 self.slug = f"{original_slug}-{counter}"
                 counter += 1
+        kwargs['update_fields'] = recherche.preparer(self, kwargs.get('update_fields'))
         super().save(*args, **kwargs)
 
-    def incrementer_vues(self):
-        self.vues += 1
-        self.save(update_fields=['vues'])
+    def incrementer_vues(self, request=None):
+        """Compte une vue, reportée en base plus tard (voir compteur_vues.py)"""
+        from . import compteur_vues
+
+        return compteur_vues.enregistrer(self.pk, request)
 
 # -------------------- Structures & Services --------------------
 class StructureDeSante(models.Model):
@@ -734,6 +803,45 @@ class Pharmacie(models.Model):
         return self.nom
 
 
+class EtablissementSante(models.Model):
+    """
+    Vue de lecture unifiée des hôpitaux, cliniques, pharmacies et dentistes,
+    recopiée à chaque écriture par les signaux (voir etablissements.py)
+    """
+    TYPE_CHOICES = [
+        ('hopital', 'Hôpital'),
+        ('clinique', 'Clinique'),
+        ('pharmacie', 'Pharmacie'),
+        ('dentiste', 'Dentiste'),
+    ]
+
+    type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    source_id = models.PositiveIntegerField()
+    nom = models.CharField(max_length=200)
+    adresse = models.CharField(max_length=255, blank=True, default='')
+    telephone = models.CharField(max_length=20, blank=True, default='')
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, blank=True, null=True)
+    date_maj = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'EtablissementSante'
+        constraints = [
+            models.UniqueConstraint(fields=['type', 'source_id'], name='etablissement_source_unique'),
+        ]
+        indexes = [
+            # Préfiltre par boîte englobante des recherches de proximité (voir geo.py)
+            models.Index(fields=['latitude', 'longitude'], name='etablissement_lat_lng_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.nom} ({self.get_type_display()})"
+
+    @property
+    def identifiant(self):
+        return f"{self.type}_{self.source_id}"
+
+
 class ContactFooter(models.Model):
     nom = models.CharField(max_length=150)
     email = models.EmailField()
@@ -776,6 +884,12 @@ class RappelMedicament(models.Model):
         verbose_name = "Rappel médicament"
         verbose_name_plural = "Rappels médicaments"
         ordering = ['heure_rappel']
+        indexes = [
+            # Recherche des rappels dus par plage horaire (scheduler, chaque minute).
+            # Index partiel : filter(actif=True) est compilé en WHERE "actif", qu'un
+            # index composite (actif, heure_rappel) ne sert pas sur SQLite
+            models.Index(fields=['heure_rappel'], condition=models.Q(actif=True), name='rappel_actifs_heure_idx'),
+        ]
         
     def __str__(self):
         return f"{self.medicament} - {self.patient.user.username}"
@@ -792,6 +906,9 @@ class HistoriquePriseMedicament(models.Model):
         verbose_name = "Historique prise médicament"
         verbose_name_plural = "Historiques prises médicaments"
         ordering = ['-date_prise']
+        indexes = [
+            models.Index(fields=['rappel', 'date_prise'], name='historique_rappel_date_idx'),
+        ]
         
     def __str__(self):
         return f"{self.rappel.medicament} - {self.date_prise.strftime('%d/%m/%Y %H:%M')}"
@@ -823,6 +940,9 @@ class AuditLog(models.Model):
         verbose_name = "Log d'Audit"
         verbose_name_plural = "Logs d'Audit"
         db_table = 'AuditLog'
+        indexes = [
+            models.Index(fields=['user', 'timestamp'], name='auditlog_user_timestamp_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user} - {self.action} - {self.model_name} - {self.timestamp}"
@@ -905,6 +1025,15 @@ class Urgence(models.Model):
         verbose_name = "Urgence"
         verbose_name_plural = "Urgences"
         db_table = 'Urgence'
+        indexes = [
+            # File des urgences par statut, dans l'ordre de la Meta (priorité puis date)
+            models.Index(fields=['statut', 'priorite', 'date_creation'], name='urgence_statut_priorite_idx'),
+            models.Index(
+                fields=['priorite', 'date_creation'],
+                condition=models.Q(statut__in=['en_attente', 'prise_en_charge']),
+                name='urgence_ouvertes_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"Urgence {self.type_urgence} - {self.patient.user.username} ({self.priorite})"
@@ -967,6 +1096,9 @@ class NotificationUrgence(models.Model):
         verbose_name = "Notification Urgence"
         verbose_name_plural = "Notifications Urgences"
         db_table = 'NotificationUrgence'
+        indexes = [
+            models.Index(fields=['medecin'], condition=models.Q(lue=False), name='notif_urgence_non_lues_idx'),
+        ]
 
     def __str__(self):
         return f"Notification pour Dr. {self.medecin.user.username} - {self.urgence.type_urgence}"
@@ -1046,17 +1178,20 @@ class Message(models.Model):
     class Meta:
         ordering = ['timestamp']
         db_table = 'Message'
+        indexes = [
+            # Historique paginé par identifiant (curseurs before / after)
+            models.Index(fields=['conversation', 'id'], name='message_conversation_id_idx'),
+            # Compteurs et lecture groupée : uniquement les messages non lus
+            models.Index(
+                fields=['conversation', 'sender'],
+                condition=models.Q(is_read=False),
+                name='message_non_lus_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"Message from {self.sender.username} in {self.conversation.subject}"
 
-    def mark_as_read(self):
-        """Mark message as read"""
-        if not self.is_read:
-            self.is_read = True
-            self.read_at = timezone.now()
-            self.save()
-
 
 # -------------------- Chatbot Knowledge Base --------------------
 class ChatbotKnowledgeBase(models.Model):
@@ -1077,6 +1212,8 @@ class ChatbotKnowledgeBase(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Date de création")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Date de mise à jour")
     is_active = models.BooleanField(default=True, verbose_name="Actif")
+    # Mot-clé, catégorie et réponse normalisés pour la recherche (voir recherche.py)
+    document_recherche = models.TextField(blank=True, default='', editable=False)
     
     class Meta:
         verbose_name = "Entrée de base de connaissances"
@@ -1087,6 +1224,10 @@ class ChatbotKnowledgeBase(models.Model):
     def __str__(self):
         return f"{self.keyword} - {self.get_category_display()}"
 
+    def save(self, *args, **kwargs):
+        kwargs['update_fields'] = recherche.preparer(self, kwargs.get('update_fields'))
+        super().save(*args, **kwargs)
+
 
 # -------------------- Notifications --------------------
 class Notification(models.Model):
@@ -1107,6 +1248,9 @@ class Notification(models.Model):
     class Meta:
         db_table = 'Notification'
         ordering = ['-date_creation']
+        indexes = [
+            models.Index(fields=['medecin'], condition=models.Q(lu=False), name='notification_non_lues_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_type_display()} - {self.article_titre}"
@@ -1130,3 +1274,171 @@ class MedicalDocument(models.Model):
     
     def __str__(self):
         return f"{self.document_type} - {self.patient.get_full_name()} to Dr. {self.medecin.get_full_name()}"
+
+
+# -------------------- Outbox des emails --------------------
+class NotificationOutbox(models.Model):
+    """
+    Emails en attente d'envoi. Les notifications sont écrites ici dans la même
+    transaction que l'action qui les déclenche, puis envoyées par le worker
+    (voir outbox.py), avec reprise et backoff en cas d'échec SMTP.
+
+    Pendant l'envoi (statut ``en_cours``), ``prochaine_tentative`` est la fin du
+    bail du worker qui a réservé le message.
+    """
+    STATUT_CHOICES = [
+        ('en_attente', 'En attente'),
+        ('en_cours', "En cours d'envoi"),
+        ('envoye', 'Envoyé'),
+        ('echec', 'Échec définitif'),
+    ]
+
+    sujet = models.CharField(max_length=255)
+    message = models.TextField()
+    expediteur = models.CharField(max_length=254, blank=True)
+    destinataires = models.JSONField(default=list)
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='en_attente')
+    tentatives = models.PositiveIntegerField(default=0)
+    prochaine_tentative = models.DateTimeField(default=timezone.now)
+    derniere_erreur = models.TextField(blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_envoi = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'NotificationOutbox'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['statut', 'prochaine_tentative'], name='outbox_statut_tentative_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.sujet} -> {', '.join(self.destinataires)} ({self.statut})"
+
+
+# -------------------- Rappels de rendez-vous envoyés --------------------
+class RappelRendezVous(models.Model):
+    """
+    Registre des rappels de rendez-vous déjà envoyés : une ligne par
+    (rendez-vous, type de rappel). La contrainte d'unicité garantit qu'un
+    patient ne reçoit jamais deux fois le même rappel, même si le scheduler
+    repasse ou tourne sur plusieurs instances.
+    """
+    TYPE_CHOICES = [
+        ('24h', '24 heures avant'),
+        ('2h', '2 heures avant'),
+        ('15min', '15 minutes avant'),
+    ]
+
+    rendez_vous = models.ForeignKey(RendezVous, on_delete=models.CASCADE, related_name='rappels_envoyes')
+    type_rappel = models.CharField(max_length=10, choices=TYPE_CHOICES)
+    date_envoi = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'RappelRendezVous'
+        ordering = ['-date_envoi']
+        constraints = [
+            models.UniqueConstraint(fields=['rendez_vous', 'type_rappel'], name='unique_rappel_rdv_type'),
+        ]
+
+    def __str__(self):
+        return f"Rappel {self.type_rappel} - RDV {self.rendez_vous_id}"
+
+
+# -------------------- Coordination du scheduler --------------------
+class BailTache(models.Model):
+    """
+    Bail d'exécution d'une tâche planifiée (voir verrous.py). Chaque worker
+    gunicorn a son propre scheduler ; seul celui qui prend le bail exécute la
+    tâche pour la période en cours.
+    """
+    nom = models.CharField(max_length=100, primary_key=True)
+    proprietaire = models.CharField(max_length=255)
+    expire_le = models.DateTimeField()
+
+    class Meta:
+        db_table = 'BailTache'
+
+    def __str__(self):
+        return f"{self.nom} -> {self.proprietaire} (jusqu'à {self.expire_le:%H:%M:%S})"
+
+
+class ExecutionTache(models.Model):
+    """Historique et métriques des exécutions des tâches planifiées"""
+    STATUT_CHOICES = [
+        ('succes', 'Succès'),
+        ('echec', 'Échec'),
+    ]
+
+    tache = models.CharField(max_length=100)
+    proprietaire = models.CharField(max_length=255)
+    debut = models.DateTimeField()
+    duree_ms = models.PositiveIntegerField(default=0)
+    statut = models.CharField(max_length=10, choices=STATUT_CHOICES)
+    lignes_lues = models.PositiveIntegerField(default=0)
+    envois = models.PositiveIntegerField(default=0)
+    erreur = models.TextField(blank=True)
+
+    class Meta:
+        db_table = 'ExecutionTache'
+        ordering = ['-debut']
+        indexes = [
+            models.Index(fields=['tache', 'debut'], name='execution_tache_debut_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tache} {self.debut:%d/%m/%Y %H:%M:%S} ({self.statut}, {self.duree_ms} ms)"
+
+
+# -------------------- Compteurs de non-lus --------------------
+class CompteurNonLus(models.Model):
+    """
+    Nombre d'éléments non lus par utilisateur, tenu à jour dans la même
+    transaction que les écritures (voir compteurs.py). Le badge du frontend
+    lit une seule ligne au lieu de recompter les messages et notifications.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='compteur_non_lus')
+    messages = models.IntegerField(default=0)
+    notifications = models.IntegerField(default=0)
+    urgences = models.IntegerField(default=0)
+    date_maj = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'CompteurNonLus'
+
+    def __str__(self):
+        return f"{self.user.username} : {self.messages} message(s), {self.notifications} notification(s), {self.urgences} urgence(s)"
+
+    def en_dict(self):
+        return {
+            'messages': self.messages,
+            'notifications': self.notifications,
+            'urgences': self.urgences,
+            'total': self.messages + self.notifications + self.urgences,
+        }
+
+
+# -------------------- Statistiques --------------------
+class StatistiqueJournaliere(models.Model):
+    """
+    Cumul journalier des rendez-vous (par date de rendez-vous et par statut),
+    recalculé chaque nuit (voir statistiques.consolider_journees). Les tableaux
+    de bord additionnent ces lignes et ne comptent en direct que les jours
+    non consolidés.
+    """
+    jour = models.DateField(unique=True)
+    total = models.IntegerField(default=0)
+    en_attente = models.IntegerField(default=0)
+    confirmes = models.IntegerField(default=0)
+    reprogrammes = models.IntegerField(default=0)
+    annules = models.IntegerField(default=0)
+    termines = models.IntegerField(default=0)
+    date_calcul = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'StatistiqueJournaliere'
+        ordering = ['-jour']
+        verbose_name = "Statistique journalière"
+        verbose_name_plural = "Statistiques journalières"
+
+    def __str__(self):
+        return f"{self.jour} : {self.total} rendez-vous"
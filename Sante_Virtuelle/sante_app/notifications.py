@@ -1,10 +1,15 @@
-from django.core.mail import send_mail
+import logging
+
+from .outbox import mettre_en_file, mettre_en_file_lot
 from django.template.loader import render_to_string
 from django.conf import settings
+from django.utils import timezone
 from datetime import datetime, timedelta
 
+logger = logging.getLogger(__name__)
+
 class NotificationService:
-    """Service de notifications par email (gratuit)"""
+    """Service de notifications par email (gratuit), envoyées via l'outbox (outbox.py)"""
 
     @staticmethod
     def send_appointment_request_notification(rendez_vous):
@@ -61,7 +66,7 @@ L'équipe AssitoSanté
         """
 
         try:
-            send_mail(
+            mettre_en_file(
                 subject,
                 message,
                 settings.DEFAULT_FROM_EMAIL,
@@ -122,7 +127,7 @@ L'équipe AssitoSanté
         """
 
         try:
-            send_mail(
+            mettre_en_file(
                 subject,
                 message,
                 settings.DEFAULT_FROM_EMAIL,
@@ -178,7 +183,7 @@ L'équipe AssitoSanté
         """
 
         try:
-            send_mail(
+            mettre_en_file(
                 subject,
                 message,
                 settings.DEFAULT_FROM_EMAIL,
@@ -276,7 +281,7 @@ L'équipe AssitoSanté
         """
 
         try:
-            send_mail(
+            mettre_en_file(
                 subject,
                 message,
                 settings.DEFAULT_FROM_EMAIL,
@@ -307,7 +312,7 @@ L'équipe AssitoSanté
         """
 
         try:
-            send_mail(
+            mettre_en_file(
                 subject,
                 message,
                 settings.DEFAULT_FROM_EMAIL,
@@ -319,8 +324,38 @@ L'équipe AssitoSanté
             print(f"❌ Erreur lors de l'envoi de l'email : {e}")
 
     @staticmethod
-    def send_medication_reminder(patient, medicament, dosage, horaire):
-        """Envoyer rappel de prise de médicament"""
+    def appointment_reminder_message(rendez_vous):
+        """Sujet et message d'un rappel de rendez-vous"""
+        patient = rendez_vous.patient
+        medecin = rendez_vous.medecin
+        aujourd_hui = timezone.localdate()
+        if rendez_vous.date == aujourd_hui:
+            quand = f"Aujourd'hui à {rendez_vous.heure.strftime('%H:%M')}"
+        elif rendez_vous.date == aujourd_hui + timedelta(days=1):
+            quand = f"Demain à {rendez_vous.heure.strftime('%H:%M')}"
+        else:
+            quand = f"Le {rendez_vous.date.strftime('%d/%m/%Y')} à {rendez_vous.heure.strftime('%H:%M')}"
+
+        subject = f"📅 Rappel de rendez-vous - {quand}"
+        message = f"""
+Bonjour {patient.first_name},
+
+Ceci est un rappel pour votre rendez-vous médical :
+
+📅 Date : {rendez_vous.date.strftime('%d/%m/%Y')}
+⏰ Heure : {rendez_vous.heure.strftime('%H:%M')}
+👨‍⚕️ Médecin : Dr. {medecin.first_name} {medecin.last_name}
+
+Merci d'arriver 10 minutes avant l'heure prévue.
+
+Cordialement,
+L'équipe AssitoSanté
+        """
+        return subject, message
+
+    @staticmethod
+    def medication_reminder_message(patient, medicament, dosage, horaire):
+        """Sujet et message d'un rappel de prise de médicament"""
         subject = f"💊 Rappel de prise de médicament - {medicament}"
         message = f"""
 Bonjour {patient.first_name},
@@ -336,9 +371,17 @@ Merci de bien vouloir prendre votre médicament comme prescrit.
 Cordialement,
 L'équipe AssitoSanté
         """
+        return subject, message
+
+    @staticmethod
+    def send_medication_reminder(patient, medicament, dosage, horaire):
+        """Envoyer rappel de prise de médicament"""
+        subject, message = NotificationService.medication_reminder_message(
+            patient, medicament, dosage, horaire
+        )
 
         try:
-            send_mail(
+            mettre_en_file(
                 subject,
                 message,
                 settings.DEFAULT_FROM_EMAIL,
@@ -372,7 +415,7 @@ L'équipe AssitoSanté
         """
 
         try:
-            send_mail(
+            mettre_en_file(
                 subject,
                 message,
                 settings.DEFAULT_FROM_EMAIL,
@@ -404,15 +447,15 @@ EN CAS D'URGENCE VITALE, COMPOSEZ LE 15 (SAMU) IMMÉDIATEMENT.
         """
 
         try:
-            send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [urgence.patient.user.email])
+            mettre_en_file(subject, message, settings.DEFAULT_FROM_EMAIL, [urgence.patient.user.email])
             return True
         except Exception as e:
             print(f"Erreur envoi email : {e}")
             return False
 
     @staticmethod
-    def send_urgence_notification_medecin(urgence, medecin):
-        """Notifier un médecin d'une urgence"""
+    def _urgence_medecin_message(urgence, medecin):
+        """Sujet et message de notification d'une urgence pour un médecin"""
         subject = f"🚨 URGENCE {urgence.get_priorite_display().upper()} - AssitoSanté"
         message = f"""
 Dr. {medecin.user.first_name},
@@ -433,14 +476,34 @@ Connectez-vous pour prendre en charge cette urgence.
 
 AssitoSanté
         """
+        return subject, message
+
+    @staticmethod
+    def send_urgence_notification_medecin(urgence, medecin):
+        """Notifier un médecin d'une urgence"""
+        subject, message = NotificationService._urgence_medecin_message(urgence, medecin)
 
         try:
-            send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [medecin.user.email])
+            mettre_en_file(subject, message, settings.DEFAULT_FROM_EMAIL, [medecin.user.email])
             return True
         except Exception as e:
             print(f"Erreur envoi email médecin : {e}")
             return False
 
+    @staticmethod
+    def send_urgence_notification_medecins(urgence, medecins):
+        """Notifier plusieurs médecins d'une urgence en un seul lot (un INSERT dans l'outbox)"""
+        messages = []
+        for medecin in medecins:
+            subject, message = NotificationService._urgence_medecin_message(urgence, medecin)
+            messages.append((subject, message, settings.DEFAULT_FROM_EMAIL, [medecin.user.email]))
+
+        try:
+            return len(mettre_en_file_lot(messages))
+        except Exception as e:
+            logger.error(f"❌ Erreur envoi emails médecins : {e}")
+            return 0
+
     @staticmethod
     def send_urgence_prise_en_charge(urgence):
         """Notifier le patient de la prise en charge"""
@@ -459,7 +522,7 @@ Le médecin va vous contacter sous peu au {urgence.telephone_contact}.
         """
 
         try:
-            send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [urgence.patient.user.email])
+            mettre_en_file(subject, message, settings.DEFAULT_FROM_EMAIL, [urgence.patient.user.email])
             return True
         except Exception as e:
             print(f"Erreur envoi email : {e}")
@@ -540,7 +603,7 @@ L'équipe AssitoSanté
         """
 
         try:
-            send_mail(
+            mettre_en_file(
                 subject,
                 message,
                 settings.DEFAULT_FROM_EMAIL,
@@ -571,7 +634,7 @@ L'équipe AssitoSanté
         """
 
         try:
-            send_mail(
+            mettre_en_file(
                 subject,
                 message,
                 settings.DEFAULT_FROM_EMAIL,
@@ -602,7 +665,7 @@ L'équipe AssitoSanté
         """
 
         try:
-            send_mail(
+            mettre_en_file(
                 subject,
                 message,
                 settings.DEFAULT_FROM_EMAIL,
@@ -633,7 +696,7 @@ L'équipe AssitoSanté
         """
 
         try:
-            send_mail(
+            mettre_en_file(
                 subject,
                 message,
                 settings.DEFAULT_FROM_EMAIL,
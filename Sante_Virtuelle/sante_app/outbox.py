@@ -0,0 +1,248 @@
+"""
+Outbox des emails.
+
+``mettre_en_file`` remplace ``send_mail`` dans NotificationService : le message
+est enregistré dans NotificationOutbox, dans la transaction en cours, et la
+requête HTTP ne dépend plus de la latence du serveur SMTP.
+
+``envoyer_lot`` est le worker, en trois temps :
+
+1. réservation, dans une transaction courte : un lot de messages dus est
+   verrouillé (``SELECT ... FOR UPDATE SKIP LOCKED`` sur PostgreSQL, ce qui
+   permet de lancer plusieurs workers en parallèle) et passe au statut
+   ``en_cours`` avec un bail : ``prochaine_tentative`` devient la fin du bail
+   (NOTIFICATION_OUTBOX_LEASE) ;
+2. envoi, hors de toute transaction : la session SMTP et la limite de débit
+   ne retiennent aucun verrou en base ;
+3. chaque résultat est enregistré par sa propre écriture : message envoyé,
+   nouvelle tentative avec un backoff exponentiel, ou échec définitif.
+
+Si le processus s'arrête pendant l'envoi, ou si une écriture échoue, les
+messages non enregistrés restent ``en_cours`` jusqu'à la fin du bail, puis
+sont repris par un autre passage : aucun email n'est perdu (livraison au
+moins une fois), et un email enregistré comme envoyé n'est jamais renvoyé.
+
+Le worker tourne dans la tâche APScheduler ``notification_outbox_drain`` ou via
+``manage.py envoyer_notifications``, et non dans Celery : Celery figure dans
+requirements.txt mais aucun broker (Redis, RabbitMQ) ni worker Celery n'est
+déployé. La table sert de file d'attente, sans autre infrastructure.
+
+Réglages (settings.py) :
+    NOTIFICATION_OUTBOX_BATCH_SIZE    taille d'un lot (50)
+    NOTIFICATION_OUTBOX_MAX_ATTEMPTS  nombre d'essais avant échec définitif (5)
+    NOTIFICATION_OUTBOX_BACKOFF       délai de base entre deux essais, en secondes (60)
+    NOTIFICATION_OUTBOX_LEASE         durée du bail d'un lot réservé, en secondes (600)
+    NOTIFICATION_RATE_LIMIT           emails par seconde au maximum, 0 = illimité (0)
+    NOTIFICATION_MESSAGES_PER_CONNECTION  emails envoyés avant de rouvrir la connexion SMTP (100)
+"""
+from datetime import timedelta
+import logging
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_MAX = 6 * 60 * 60
+
+
+def _reglage(nom, defaut):
+    return getattr(settings, nom, defaut)
+
+
+def mettre_en_file_lot(messages):
+    """
+    Équivalent de send_mass_mail : ``messages`` est une suite de tuples
+    (subject, message, from_email, recipient_list), écrits en un seul INSERT.
+    """
+    from .models import NotificationOutbox
+
+    entrees = []
+    for subject, message, from_email, recipient_list in messages:
+        destinataires = [email for email in recipient_list if email]
+        if destinataires:
+            entrees.append(NotificationOutbox(
+                sujet=subject[:255],
+                message=message,
+                expediteur=from_email or '',
+                destinataires=destinataires,
+            ))
+    return NotificationOutbox.objects.bulk_create(entrees)
+
+
+def mettre_en_file(subject, message, from_email, recipient_list, fail_silently=False):
+    """Même signature que django.core.mail.send_mail, mais écrit dans l'outbox"""
+    from .models import NotificationOutbox
+
+    destinataires = [email for email in recipient_list if email]
+    if not destinataires:
+        return None
+    return NotificationOutbox.objects.create(
+        sujet=subject[:255],
+        message=message,
+        expediteur=from_email or '',
+        destinataires=destinataires,
+    )
+
+
+def _delai_backoff(tentatives):
+    base = _reglage('NOTIFICATION_OUTBOX_BACKOFF', 60)
+    return timedelta(seconds=min(base * (2 ** (tentatives - 1)), BACKOFF_MAX))
+
+
+class LivraisonGroupee:
+    """
+    Envoi d'un lot sur une connexion SMTP réutilisée (get_connection), comme
+    send_mass_mail, avec une limite de débit et un nombre maximal de messages
+    par connexion (au-delà, la connexion est rouverte).
+    """
+
+    def __init__(self, debit=None, messages_par_connexion=None):
+        self.debit = debit if debit is not None else _reglage('NOTIFICATION_RATE_LIMIT', 0)
+        self.messages_par_connexion = (
+            messages_par_connexion or _reglage('NOTIFICATION_MESSAGES_PER_CONNECTION', 100)
+        )
+        self.connection = None
+        self.envoyes_connexion = 0
+        self.connexions = 0
+        self._dernier_envoi = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+        return False
+
+    def fermer(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+        self.connection = None
+        self.envoyes_connexion = 0
+
+    def _ouvrir(self):
+        if self.connection is None or self.envoyes_connexion >= self.messages_par_connexion:
+            self.fermer()
+            self.connection = get_connection(fail_silently=False)
+            self.connection.open()
+            self.connexions += 1
+        return self.connection
+
+    def _limiter_debit(self):
+        if not self.debit:
+            return
+        intervalle = 1.0 / self.debit
+        if self._dernier_envoi is not None:
+            attente = intervalle - (time.monotonic() - self._dernier_envoi)
+            if attente > 0:
+                time.sleep(attente)
+        self._dernier_envoi = time.monotonic()
+
+    def envoyer(self, entree):
+        self._limiter_debit()
+        try:
+            _envoyer(entree, self._ouvrir())
+        except Exception:
+            # La connexion peut être dans un état incertain : la rouvrir au prochain message
+            self.fermer()
+            raise
+        self.envoyes_connexion += 1
+
+
+def _envoyer(entree, connection):
+    EmailMessage(
+        entree.sujet,
+        entree.message,
+        entree.expediteur or settings.DEFAULT_FROM_EMAIL,
+        entree.destinataires,
+        connection=connection,
+    ).send()
+
+
+def _reserver(taille):
+    """Réserve un lot de messages dus (ou dont le bail a expiré) dans une transaction courte"""
+    from .models import NotificationOutbox
+
+    with transaction.atomic():
+        maintenant = timezone.now()
+        lot = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(statut__in=['en_attente', 'en_cours'], prochaine_tentative__lte=maintenant)
+            .order_by('prochaine_tentative', 'id')[:taille]
+        )
+        if lot:
+            bail = maintenant + timedelta(seconds=_reglage('NOTIFICATION_OUTBOX_LEASE', 600))
+            NotificationOutbox.objects.filter(pk__in=[entree.pk for entree in lot]).update(
+                statut='en_cours', prochaine_tentative=bail
+            )
+    return lot
+
+
+def _enregistrer_echec(entree, erreur, max_tentatives):
+    from .models import NotificationOutbox
+
+    entree.tentatives += 1
+    if entree.tentatives >= max_tentatives:
+        statut, prochaine_tentative = 'echec', timezone.now()
+        logger.error(f"❌ Email {entree.pk} abandonné après {entree.tentatives} tentatives : {erreur}")
+    else:
+        statut, prochaine_tentative = 'en_attente', timezone.now() + _delai_backoff(entree.tentatives)
+        logger.warning(f"⚠️ Email {entree.pk} en échec (tentative {entree.tentatives}) : {erreur}")
+    NotificationOutbox.objects.filter(pk=entree.pk, statut='en_cours').update(
+        statut=statut,
+        tentatives=entree.tentatives,
+        prochaine_tentative=prochaine_tentative,
+        derniere_erreur=str(erreur),
+    )
+
+
+def envoyer_lot(taille=None):
+    """
+    Envoie un lot de messages dus sur une seule connexion SMTP (rouverte tous les
+    NOTIFICATION_MESSAGES_PER_CONNECTION messages).
+    Retourne un dict {'envoyes', 'echecs', 'lus', 'connexions'}.
+    """
+    from .models import NotificationOutbox
+
+    taille = taille or _reglage('NOTIFICATION_OUTBOX_BATCH_SIZE', 50)
+    max_tentatives = _reglage('NOTIFICATION_OUTBOX_MAX_ATTEMPTS', 5)
+    resultat = {'envoyes': 0, 'echecs': 0, 'lus': 0, 'connexions': 0}
+
+    lot = _reserver(taille)
+    resultat['lus'] = len(lot)
+
+    with LivraisonGroupee() as livraison:
+        for entree in lot:
+            try:
+                livraison.envoyer(entree)
+            except Exception as e:
+                _enregistrer_echec(entree, e, max_tentatives)
+                resultat['echecs'] += 1
+            else:
+                NotificationOutbox.objects.filter(pk=entree.pk, statut='en_cours').update(
+                    statut='envoye', date_envoi=timezone.now(), derniere_erreur=''
+                )
+                resultat['envoyes'] += 1
+    resultat['connexions'] = livraison.connexions
+
+    return resultat
+
+
+def vider_outbox(taille=None, max_lots=None):
+    """Envoie des lots jusqu'à ce qu'il n'y ait plus de message dû"""
+    total = {'envoyes': 0, 'echecs': 0, 'lus': 0, 'connexions': 0}
+    lots = 0
+    while max_lots is None or lots < max_lots:
+        resultat = envoyer_lot(taille)
+        lots += 1
+        for cle in total:
+            total[cle] += resultat[cle]
+        if resultat['lus'] == 0 or resultat['envoyes'] == 0:
+            break
+    return total
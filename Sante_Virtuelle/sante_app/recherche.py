@@ -0,0 +1,325 @@
+"""
+Recherche plein texte (articles, médecins, base de connaissances du chatbot).
+
+Chaque ligne indexée porte un ``document_recherche`` tenu à jour à chaque
+sauvegarde : ses termes sont normalisés (minuscules, accents retirés) et
+réduits à leur racine par un raciniseur français léger (``racine``). La
+requête passe par la même chaîne : tous les moteurs comparent les mêmes
+termes, quelle que soit la base.
+
+Moteurs, choisis d'après la base (``backend()``) :
+    - PostgreSQL : index GIN sur to_tsvector('simple', document_recherche),
+      classement ts_rank ; si rien ne correspond, repli sur la similarité par
+      trigrammes (pg_trgm, index GIN gin_trgm_ops) qui tolère les fautes de frappe ;
+    - SQLite : table FTS5 à contenu externe, synchronisée par triggers,
+      classement bm25 ; repli sur un OU des termes ;
+    - autres bases : icontains sur document_recherche, sans classement.
+
+Avec SEARCH_BACKEND = 'memoire', le classement se fait dans le processus, sur
+un index inversé tenu à jour par les signaux (voir index_memoire.py).
+
+Le dernier terme est cherché en préfixe (saisie en cours). Un mot incomplet
+peut s'arrêter au milieu du suffixe que le raciniseur aurait retiré
+('cardiolog' pour 'cardiologie', de racine 'cardio') : ce terme correspond aussi
+aux racines obtenues en le tronquant avant un début de suffixe (``saisie``).
+Les index et tables
+de recherche sont créés par ``installer`` après chaque migrate (signal
+post_migrate), ce qui couvre aussi les bases de test créées sans migrations.
+"""
+import logging
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import connection as connexion_defaut, transaction
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+MOTS_VIDES = {
+    'a', 'au', 'aux', 'avec', 'ce', 'ces', 'cette', 'd', 'dans', 'de', 'des', 'du', 'elle', 'elles',
+    'en', 'est', 'et', 'il', 'ils', 'l', 'la', 'le', 'les', 'leur', 'leurs', 'ne', 'on', 'ou', 'par',
+    'pas', 'plus', 'pour', 'qu', 'que', 'qui', 's', 'sa', 'sans', 'se', 'ses', 'son', 'sont', 'sur',
+    'un', 'une',
+}
+
+# Suffixes retirés (le plus long d'abord), sur des mots déjà sans accents
+SUFFIXES = sorted([
+    'issements', 'issement', 'atrices', 'ateurs', 'ations', 'ements', 'logies', 'logues',
+    'atrice', 'ateur', 'ation', 'ement', 'logie', 'logue', 'ments', 'euses', 'iques', 'ismes',
+    'istes', 'ables', 'ances', 'ences', 'ites', 'ment', 'euse', 'ives', 'ique', 'isme', 'iste',
+    'able', 'ance', 'ence', 'ite', 'eux', 'ive', 'ifs', 'ies', 'if', 'ie', 'es', 'er', 'ez',
+    'e', 's', 'x',
+], key=len, reverse=True)
+
+RACINE_MIN = 3
+
+# Débuts de suffixes : un mot en cours de saisie peut s'arrêter au milieu d'un suffixe
+DEBUTS_SUFFIXES = {suffixe[:n] for suffixe in SUFFIXES for n in range(1, len(suffixe) + 1)}
+
+
+def normaliser(texte):
+    """Mots en minuscules, sans accents ni ponctuation"""
+    texte = unicodedata.normalize('NFKD', texte or '')
+    texte = ''.join(c for c in texte if not unicodedata.combining(c)).lower()
+    return re.findall(r'[a-z0-9]+', texte)
+
+
+def racine(mot):
+    """Raciniseur léger : retire le suffixe le plus long en gardant RACINE_MIN lettres"""
+    if mot.isdigit():
+        return mot
+    for suffixe in SUFFIXES:
+        if mot.endswith(suffixe) and len(mot) - len(suffixe) >= RACINE_MIN:
+            return mot[:-len(suffixe)]
+    return mot
+
+
+def termes(texte):
+    """Termes indexables d'un texte : normalisés, sans mots vides, réduits à leur racine"""
+    return [racine(mot) for mot in normaliser(texte) if mot not in MOTS_VIDES]
+
+
+def saisie(texte):
+    """
+    Termes d'une requête, et racines possibles de son dernier mot s'il est
+    incomplet : le mot tronqué avant un début de suffixe ('cardiolog' ->
+    'cardio'). Les racines plus longues que celle du dernier terme sont déjà
+    couvertes par sa recherche en préfixe.
+    """
+    mots = [mot for mot in normaliser(texte) if mot not in MOTS_VIDES]
+    if not mots:
+        return [], []
+    racines = [racine(mot) for mot in mots]
+    dernier = mots[-1]
+    possibles = [
+        dernier[:n] for n in range(RACINE_MIN, len(racines[-1])) if dernier[n:] in DEBUTS_SUFFIXES
+    ]
+    return racines, possibles
+
+
+# Modèle -> champs dont le texte compose le document (le titre d'un article compte double)
+def _champs_article(article):
+    return [article.titre, article.titre, article.resume, article.tags, article.contenu]
+
+
+def _champs_medecin(medecin):
+    return [medecin.user.first_name, medecin.user.last_name, medecin.specialite]
+
+
+def _champs_connaissance(entree):
+    return [entree.keyword, entree.keyword, entree.category, entree.response]
+
+
+CHAMPS = {
+    'Article': (_champs_article, {'titre', 'resume', 'tags', 'contenu'}),
+    'Medecin': (_champs_medecin, {'specialite', 'user'}),
+    'ChatbotKnowledgeBase': (_champs_connaissance, {'keyword', 'category', 'response'}),
+}
+
+
+def document(instance):
+    """Document de recherche d'une instance d'un modèle de CHAMPS (modèles historiques compris)"""
+    champs, _ = CHAMPS[instance.__class__.__name__]
+    return ' '.join(termes(' '.join(filter(None, champs(instance)))))
+
+
+def preparer(instance, update_fields=None):
+    """
+    À appeler dans save() : met à jour ``document_recherche`` et, pour une
+    sauvegarde partielle qui touche un champ indexé, l'ajoute à update_fields.
+    """
+    _, sources = CHAMPS[instance.__class__.__name__]
+    if update_fields is not None:
+        update_fields = set(update_fields)
+        if not update_fields & sources:
+            return update_fields
+        update_fields.add('document_recherche')
+    instance.document_recherche = document(instance)
+    return update_fields
+
+
+class RechercheSimple:
+    """Toute base : chaque terme doit apparaître dans document_recherche (sans classement)"""
+
+    def filtrer(self, queryset, texte):
+        mots, possibles = saisie(texte)
+        if not mots:
+            return queryset.none()
+        condition = Q()
+        for mot in mots[:-1]:
+            condition &= Q(document_recherche__icontains=mot)
+        dernier = Q(document_recherche__icontains=mots[-1])
+        for possible in possibles:
+            dernier |= Q(document_recherche__icontains=possible)
+        condition &= dernier
+        return queryset.filter(condition).annotate(pertinence=Value(0.0, output_field=FloatField()))
+
+    def installer(self, connexion, modeles):
+        pass
+
+
+class RecherchePostgres(RechercheSimple):
+    CONFIG = 'simple'  # les termes sont déjà réduits à leur racine par ``racine``
+
+    def filtrer(self, queryset, texte):
+        from django.contrib.postgres.search import (
+            SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity,
+        )
+
+        mots, possibles = saisie(texte)
+        if not mots:
+            return queryset.none()
+
+        vecteur = SearchVector('document_recherche', config=self.CONFIG)
+        dernier = '(' + ' | '.join([f'{mots[-1]}:*'] + possibles) + ')'
+        requete = SearchQuery(' & '.join(mots[:-1] + [dernier]), search_type='raw', config=self.CONFIG)
+        resultats = (
+            queryset.alias(vecteur=vecteur).filter(vecteur=requete)
+            .annotate(pertinence=SearchRank(vecteur, requete))
+            .order_by('-pertinence')
+        )
+        if resultats.exists():
+            return resultats
+
+        # Repli tolérant aux fautes : l'opérateur <% utilise l'index gin_trgm_ops
+        cherche = ' '.join(mots)
+        colonne = f'"{queryset.model._meta.db_table}"."document_recherche"'
+        return (
+            queryset.alias(proche=RawSQL(f'%s <%% {colonne}', (cherche,), output_field=BooleanField()))
+            .filter(proche=True)
+            .annotate(pertinence=TrigramWordSimilarity(cherche, 'document_recherche'))
+            .order_by('-pertinence')
+        )
+
+    def installer(self, connexion, modeles):
+        with connexion.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for modele in modeles:
+                table = modele._meta.db_table
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS "{table.lower()}_recherche_fts" ON "{table}" '
+                    f"USING GIN (to_tsvector('{self.CONFIG}'::regconfig, COALESCE(\"document_recherche\", '')))"
+                )
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS "{table.lower()}_recherche_trgm" ON "{table}" '
+                    f'USING GIN ("document_recherche" gin_trgm_ops)'
+                )
+
+
+class RechercheSQLite(RechercheSimple):
+
+    @staticmethod
+    def table_fts(modele):
+        return f'recherche_{modele._meta.db_table.lower()}'
+
+    def _joindre(self, queryset, requete):
+        modele = queryset.model
+        fts = self.table_fts(modele)
+        return queryset.extra(
+            tables=[fts],
+            where=[f'"{fts}" MATCH %s', f'"{fts}".rowid = "{modele._meta.db_table}"."{modele._meta.pk.column}"'],
+            params=[requete],
+            select={'pertinence': f'-bm25("{fts}")'},
+            order_by=['-pertinence'],
+        )
+
+    def filtrer(self, queryset, texte):
+        mots, possibles = saisie(texte)
+        if not mots:
+            return queryset.none()
+        dernier = [f'"{mots[-1]}"*'] + [f'"{possible}"' for possible in possibles]
+        resultats = self._joindre(
+            queryset, ' AND '.join([f'"{mot}"' for mot in mots[:-1]] + [f"({' OR '.join(dernier)})"])
+        )
+        if len(mots) > 1 and not resultats.exists():
+            resultats = self._joindre(queryset, ' OR '.join([f'"{mot}"*' for mot in mots[:-1]] + dernier))
+        return resultats
+
+    def installer(self, connexion, modeles):
+        with connexion.cursor() as cursor:
+            for modele in modeles:
+                table, pk = modele._meta.db_table, modele._meta.pk.column
+                fts = self.table_fts(modele)
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [fts])
+                if cursor.fetchone():
+                    continue
+                cursor.execute(
+                    f'CREATE VIRTUAL TABLE "{fts}" USING fts5(document_recherche, '
+                    f"content='{table}', content_rowid='{pk}', tokenize='unicode61 remove_diacritics 2')"
+                )
+                cursor.execute(
+                    f'CREATE TRIGGER "{fts}_ai" AFTER INSERT ON "{table}" BEGIN '
+                    f'INSERT INTO "{fts}"(rowid, document_recherche) VALUES (new."{pk}", new.document_recherche); END'
+                )
+                cursor.execute(
+                    f'CREATE TRIGGER "{fts}_ad" AFTER DELETE ON "{table}" BEGIN '
+                    f'INSERT INTO "{fts}"("{fts}", rowid, document_recherche) '
+                    f"VALUES ('delete', old.\"{pk}\", old.document_recherche); END"
+                )
+                cursor.execute(
+                    f'CREATE TRIGGER "{fts}_au" AFTER UPDATE OF document_recherche ON "{table}" BEGIN '
+                    f'INSERT INTO "{fts}"("{fts}", rowid, document_recherche) '
+                    f"VALUES ('delete', old.\"{pk}\", old.document_recherche); "
+                    f'INSERT INTO "{fts}"(rowid, document_recherche) VALUES (new."{pk}", new.document_recherche); END'
+                )
+                cursor.execute(f'INSERT INTO "{fts}"("{fts}") VALUES (\'rebuild\')')
+
+
+MOTEURS = {
+    'postgresql': RecherchePostgres,
+    'sqlite': RechercheSQLite,
+}
+
+
+def memoire_active():
+    return getattr(settings, 'SEARCH_BACKEND', 'base') == 'memoire'
+
+
+def backend(connexion=None):
+    if memoire_active():
+        from .index_memoire import RechercheMemoire
+
+        return RechercheMemoire()
+    connexion = connexion or connexion_defaut
+    return MOTEURS.get(connexion.vendor, RechercheSimple)()
+
+
+def rechercher(queryset, texte):
+    """``queryset`` restreint à ``texte``, annoté par ``pertinence`` et trié par pertinence décroissante"""
+    return backend().filtrer(queryset, texte)
+
+
+def modeles_indexes():
+    from .models import Article, ChatbotKnowledgeBase, Medecin
+
+    return [Article, Medecin, ChatbotKnowledgeBase]
+
+
+def notifier(modele, pk, document=None):
+    """
+    Répercute une écriture (``document`` None : suppression) sur l'index en
+    mémoire, après commit, s'il est chargé dans ce processus.
+    """
+    if not memoire_active():
+        return
+    from . import index_memoire
+
+    def appliquer():
+        index = index_memoire.index_charge()
+        if index is not None:
+            index.mettre_a_jour(modele, pk, document)
+
+    transaction.on_commit(appliquer)
+
+
+def installer(using='default', **kwargs):
+    """Receveur post_migrate : crée les index / tables de recherche de la base ``using``"""
+    from django.db import connections
+
+    connexion = connections[using]
+    try:
+        MOTEURS.get(connexion.vendor, RechercheSimple)().installer(connexion, modeles_indexes())
+    except Exception as e:
+        logger.error(f"❌ Installation de la recherche plein texte impossible : {e}")
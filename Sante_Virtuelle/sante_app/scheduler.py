@@ -1,186 +1,319 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from django.conf import settings
-from django.core.mail import send_mail
+from django.db import IntegrityError, transaction
+from django.db.models import Case, CharField, Exists, OuterRef, Q, Value, When
 from django.utils import timezone
 from datetime import datetime, time, timedelta
-from .models import RappelMedicament, HistoriquePriseMedicament, RendezVous
+from .models import RappelMedicament, HistoriquePriseMedicament, RendezVous, RappelRendezVous
 from .notifications import NotificationService
+from . import cache_public, compteur_vues
+from .outbox import mettre_en_file_lot, vider_outbox
+from .statistiques import consolider_journees
+from .verrous import executer_tache, purger_historique, rendre_bail
 import logging
 
 logger = logging.getLogger(__name__)
 
+# A reminder is sent if the current minute is within this delay of heure_rappel
+REMINDER_WINDOW = timedelta(minutes=1)
+
+JOB_IDS = (
+    "medication_reminder_check", "appointment_reminder_check", "notification_outbox_drain",
+    "statistics_daily_rollup", "public_cache_refresh", "article_views_flush",
+    "task_history_purge",
+)
+
+# Appointment reminder kind -> minutes before the appointment
+DEFAULT_LEAD_TIMES = {'24h': 24 * 60, '2h': 2 * 60, '15min': 15}
+
+
+def _after(moment):
+    """Appointments strictly after ``moment`` (date and heure are separate columns)"""
+    return Q(date__gt=moment.date()) | Q(date=moment.date(), heure__gt=moment.time())
+
+
+def _until(moment):
+    """Appointments at or before ``moment``"""
+    return Q(date__lt=moment.date()) | Q(date=moment.date(), heure__lte=moment.time())
+
 class MedicationReminderScheduler:
     def __init__(self):
         self.scheduler = BackgroundScheduler()
         
     def start(self):
         """Start the scheduler"""
-        # Schedule the medication reminder check to run every minute
-        self.scheduler.add_job(
+        # Check medication reminders every minute
+        self._add_job(
             self.check_medication_reminders,
-            CronTrigger(minute="*"),  # Run every minute
-            id="medication_reminder_check",
+            CronTrigger(minute="*"),
+            interval=60,
+            job_id="medication_reminder_check",
             name="Check medication reminders",
-            replace_existing=True,
         )
         
-        # Schedule the appointment reminder check to run every hour
-        self.scheduler.add_job(
+        # Check appointment reminders (24h / 2h / 15min before, see settings)
+        appointment_interval = getattr(settings, 'APPOINTMENT_REMINDER_INTERVAL', 5) * 60
+        self._add_job(
             self.check_appointment_reminders,
-            CronTrigger(minute=0),  # Run every hour
-            id="appointment_reminder_check",
+            IntervalTrigger(seconds=appointment_interval),
+            interval=appointment_interval,
+            job_id="appointment_reminder_check",
             name="Check appointment reminders",
-            replace_existing=True,
+        )
+        
+        # Drain the email outbox (see outbox.py)
+        outbox_interval = getattr(settings, 'NOTIFICATION_OUTBOX_INTERVAL', 15)
+        self._add_job(
+            self.send_pending_notifications,
+            IntervalTrigger(seconds=outbox_interval),
+            interval=outbox_interval,
+            job_id="notification_outbox_drain",
+            name="Send queued notification emails",
+        )
+        
+        # Keep the anonymous endpoints' cache warm (see cache_public.py)
+        public_interval = getattr(settings, 'PUBLIC_CACHE_REFRESH', 60)
+        self._add_job(
+            self.refresh_public_caches,
+            IntervalTrigger(seconds=public_interval),
+            interval=public_interval,
+            job_id="public_cache_refresh",
+            name="Refresh public endpoint caches",
+        )
+        
+        # Write the buffered article view counts (see compteur_vues.py)
+        if getattr(settings, 'ARTICLE_VIEWS_BUFFERED', False):
+            views_interval = getattr(settings, 'ARTICLE_VIEWS_FLUSH_INTERVAL', 60)
+            self._add_job(
+                self.flush_article_views,
+                IntervalTrigger(seconds=views_interval),
+                interval=views_interval,
+                job_id="article_views_flush",
+                name="Flush buffered article views",
+            )
+        
+        # Nightly rollup of the dashboards' appointment statistics (see statistiques.py)
+        if getattr(settings, 'STATISTICS_DAILY_ROLLUP', False):
+            self._add_job(
+                self.consolidate_statistics,
+                CronTrigger(hour=0, minute=15),
+                interval=24 * 60 * 60,
+                job_id="statistics_daily_rollup",
+                name="Roll up daily statistics",
+            )
+        
+        # Nightly cleanup of the job run history (see verrous.py)
+        self._add_job(
+            self.purge_task_history,
+            CronTrigger(hour=3, minute=30),
+            interval=24 * 60 * 60,
+            job_id="task_history_purge",
+            name="Purge old job run history",
         )
         
         self.scheduler.start()
         logger.info("Scheduler started with medication and appointment reminders")
         
+    def _add_job(self, func, trigger, interval, job_id, name):
+        """
+        Register a job wrapped by executer_tache (see verrous.py): with several
+        workers, only the one holding the job's lease runs it, and every run is
+        recorded in ExecutionTache.
+        """
+        self.scheduler.add_job(
+            executer_tache,
+            trigger,
+            args=[job_id, func, interval],
+            id=job_id,
+            name=name,
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+        
     def stop(self):
         """Stop the scheduler"""
         self.scheduler.shutdown()
+        for job_id in JOB_IDS:
+            try:
+                rendre_bail(job_id)
+            except Exception as e:
+                logger.error(f"Error releasing lease {job_id}: {e}")
         logger.info("Scheduler stopped")
         
+    def send_pending_notifications(self):
+        """Send the emails waiting in the outbox"""
+        resultat = vider_outbox(max_lots=10)
+        if resultat['envoyes'] or resultat['echecs']:
+            logger.info(f"Outbox: {resultat['envoyes']} sent, {resultat['echecs']} failed")
+        return {'lues': resultat['lus'], 'envois': resultat['envoyes']}
+        
+    def refresh_public_caches(self):
+        """Recompute the cached public endpoints before they go stale"""
+        return {'lues': cache_public.rafraichir_tout(), 'envois': 0}
+        
+    def flush_article_views(self):
+        """Add the view counts buffered in the cache to Article.vues"""
+        resultat = compteur_vues.vider()
+        return {'lues': resultat['articles'], 'envois': resultat['vues']}
+        
+    def consolidate_statistics(self):
+        """Write the previous days into StatistiqueJournaliere"""
+        journees = consolider_journees()
+        logger.info(f"Statistics rollup: {journees} day(s) written")
+        return {'lues': journees, 'envois': 0}
+        
+    def purge_task_history(self):
+        """Delete the ExecutionTache rows older than SCHEDULER_HISTORY_DAYS"""
+        return {'lues': purger_historique(), 'envois': 0}
+        
     def check_medication_reminders(self):
         """Check for medication reminders that need to be sent"""
-        try:
-            # Get current time
-            now = timezone.now()
-            current_time = now.time()
-            
-            # Get all active medication reminders for today
-            reminders = RappelMedicament.objects.filter(
-                actif=True,
-                date_debut__lte=now.date()
-            ).exclude(
-                date_fin__lt=now.date()
-            )
+        stats = self.dispatch_medication_reminders(timezone.now())
+        if stats['envois']:
+            logger.info(f"Medication reminders: {stats['envois']} sent")
+        return stats
             
-            for reminder in reminders:
-                # Check if it's time to send the reminder
-                if self._should_send_reminder(reminder, current_time):
-                    self._send_medication_reminder(reminder)
-                    
-        except Exception as e:
-            logger.error(f"Error checking medication reminders: {e}")
+    def due_medication_reminders(self, now):
+        """
+        Reminders due around ``now`` that have not been sent today.
+
+        The time window (one minute either side, as before) is a range on the
+        partial index on active reminders, and "already sent today" is a NOT EXISTS
+        on the (rappel, date_prise) index: the cost depends on the number of
+        due reminders, not on the total number of reminders.
+        """
+        local_now = timezone.localtime(now)
+        today = local_now.date()
+        current_minute = local_now.replace(second=0, microsecond=0)
+        window_start = (current_minute - REMINDER_WINDOW).time()
+        window_end = (current_minute + REMINDER_WINDOW + timedelta(minutes=1)).time()
+
+        if window_start < window_end:
+            window = Q(heure_rappel__gte=window_start, heure_rappel__lt=window_end)
+        else:
+            # The window crosses midnight
+            window = Q(heure_rappel__gte=window_start) | Q(heure_rappel__lt=window_end)
+
+        day_start = timezone.make_aware(datetime.combine(today, time.min))
+        already_sent = HistoriquePriseMedicament.objects.filter(
+            rappel=OuterRef('pk'),
+            date_prise__gte=day_start,
+            date_prise__lt=day_start + timedelta(days=1),
+        )
+
+        return (
+            RappelMedicament.objects.filter(window, actif=True, date_debut__lte=today)
+            .exclude(date_fin__lt=today)
+            .filter(~Exists(already_sent))
+            .select_related('patient__user')
+        )
+        
+    def dispatch_medication_reminders(self, now=None):
+        """Record and queue every due medication reminder in bulk"""
+        now = now or timezone.now()
+        reminders = list(self.due_medication_reminders(now))
+        if not reminders:
+            return {'lues': 0, 'envois': 0}
+
+        messages = []
+        for reminder in reminders:
+            user = reminder.patient.user
+            if user.email:
+                subject, message = NotificationService.medication_reminder_message(
+                    user, reminder.medicament, reminder.dosage, reminder.heure_rappel
+                )
+                messages.append((subject, message, settings.DEFAULT_FROM_EMAIL, [user.email]))
+
+        with transaction.atomic():
+            HistoriquePriseMedicament.objects.bulk_create([
+                HistoriquePriseMedicament(rappel=reminder, prise_effectuee=False, notes="Rappel envoyé")
+                for reminder in reminders
+            ])
+            mettre_en_file_lot(messages)
+
+        return {'lues': len(reminders), 'envois': len(messages)}
             
     def check_appointment_reminders(self):
         """Check for appointment reminders that need to be sent"""
-        try:
-            # Get current time
-            now = timezone.now()
+        stats = self.dispatch_appointment_reminders()
+        if stats['envois']:
+            logger.info(f"Appointment reminders: {stats['envois']} sent")
+        return stats
             
-            # Get appointments for tomorrow
-            tomorrow = now.date() + timedelta(days=1)
-            appointments = RendezVous.objects.filter(
-                date=tomorrow,
-                statut="CONFIRMED"
+    def due_appointment_reminders(self, now):
+        """
+        Confirmed appointments owed a reminder, annotated with ``type_rappel``.
+
+        Each reminder kind covers the window between its lead time and the next
+        shorter one (e.g. '2h' = starting in 15 min to 2 h), so an appointment
+        booked at the last minute only gets the most relevant reminder.
+        Appointments already in the RappelRendezVous ledger for that kind are
+        excluded by a NOT EXISTS, all in a single query.
+        """
+        local_now = timezone.localtime(now).replace(tzinfo=None)
+        lead_times = sorted(
+            getattr(settings, 'APPOINTMENT_REMINDER_LEAD_TIMES', DEFAULT_LEAD_TIMES).items(),
+            key=lambda item: item[1],
+        )
+
+        whens = []
+        window_start = local_now
+        for kind, minutes in lead_times:
+            window_end = local_now + timedelta(minutes=minutes)
+            whens.append(When(_after(window_start) & _until(window_end), then=Value(kind)))
+            window_start = window_end
+        if not whens:
+            return RendezVous.objects.none()
+
+        already_sent = RappelRendezVous.objects.filter(
+            rendez_vous=OuterRef('pk'), type_rappel=OuterRef('type_rappel')
+        )
+        return (
+            RendezVous.objects.filter(
+                statut="CONFIRMED",
+                date__gte=local_now.date(),
+                date__lte=window_start.date(),
             )
-            
-            for appointment in appointments:
-                # Send reminder to patient
-                self._send_appointment_reminder(appointment)
-                    
-        except Exception as e:
-            logger.error(f"Error checking appointment reminders: {e}")
-            
-    def _should_send_reminder(self, reminder, current_time):
-        """Check if it's time to send a reminder"""
-        # For simplicity, we'll check if the current time is within a 1-minute window
-        # of the reminder time
-        reminder_time = reminder.heure_rappel
-        
-        # Calculate time difference in minutes
-        current_minutes = current_time.hour * 60 + current_time.minute
-        reminder_minutes = reminder_time.hour * 60 + reminder_time.minute
-        
-        # Handle case where time difference crosses midnight
-        time_diff = abs(current_minutes - reminder_minutes)
-        
-        # If the difference is more than 12 hours, it means we've crossed midnight
-        # In that case, we need to calculate the shortest distance
-        if time_diff > 720:  # 12 hours in minutes
-            time_diff = 1440 - time_diff  # 24 hours - time_diff
-        
-        # Send reminder if within 1 minute of scheduled time
-        return time_diff <= 1
+            .annotate(type_rappel=Case(*whens, default=Value(None), output_field=CharField()))
+            .filter(type_rappel__isnull=False)
+            .filter(~Exists(already_sent))
+            .select_related('patient', 'medecin')
+        )
         
-    def _send_medication_reminder(self, reminder):
-        """Send medication reminder notification"""
-        try:
-            # Check if we've already sent a reminder today
-            today = timezone.now().date()
-            existing_reminder = HistoriquePriseMedicament.objects.filter(
-                rappel=reminder,
-                date_prise__date=today
-            ).first()
-            
-            # If we haven't sent a reminder today, send one
-            if not existing_reminder:
-                # Create a record in the history
-                history_entry = HistoriquePriseMedicament.objects.create(
-                    rappel=reminder,
-                    prise_effectuee=False,
-                    notes="Rappel envoyé"
-                )
-                
-                # Send email notification using NotificationService
-                patient = reminder.patient
-                if patient.user.email:
-                    NotificationService.send_medication_reminder(
-                        patient,
-                        reminder.medicament,
-                        reminder.dosage,
-                        reminder.heure_rappel
-                    )
-                        
-        except Exception as e:
-            logger.error(f"Error sending medication reminder: {e}")
-            
-    def _send_appointment_reminder(self, appointment):
-        """Send appointment reminder notification"""
+    def dispatch_appointment_reminders(self, now=None):
+        """
+        Record due appointment reminders in the ledger and queue their emails.
+
+        The ledger rows and the outbox rows are written in the same
+        transaction: if another instance recorded the same reminder first, the
+        unique constraint rolls the whole pass back and nothing is sent twice.
+        """
+        now = now or timezone.now()
+        appointments = list(self.due_appointment_reminders(now))
+        if not appointments:
+            return {'lues': 0, 'envois': 0}
+
+        messages = []
+        for appointment in appointments:
+            if appointment.patient.email:
+                subject, message = NotificationService.appointment_reminder_message(appointment)
+                messages.append((subject, message, settings.DEFAULT_FROM_EMAIL, [appointment.patient.email]))
+
         try:
-            # Check if we've already sent a reminder for this appointment
-            # In a real implementation, you might want to store this in a separate model
-            # For now, we'll just send the reminder
-            
-            # Send email notification using NotificationService
-            patient = appointment.patient
-            medecin = appointment.medecin
-            
-            if patient.email:
-                # Create subject and message for appointment reminder
-                subject = f"📅 Rappel de rendez-vous - Demain à {appointment.heure.strftime('%H:%M')}"
-                message = f"""
-Bonjour {patient.first_name},
-
-Ceci est un rappel pour votre rendez-vous médical demain :
-
-📅 Date : {appointment.date.strftime('%d/%m/%Y')}
-⏰ Heure : {appointment.heure.strftime('%H:%M')}
-👨‍⚕️ Médecin : Dr. {medecin.first_name} {medecin.last_name}
-
-Merci d'arriver 10 minutes avant l'heure prévue.
-
-Cordialement,
-L'équipe AssitoSanté
-                """
-                
-                try:
-                    send_mail(
-                        subject,
-                        message,
-                        settings.DEFAULT_FROM_EMAIL,
-                        [patient.email],
-                        fail_silently=False,
-                    )
-                    logger.info(f"✅ Appointment reminder sent to {patient.email}")
-                except Exception as e:
-                    logger.error(f"❌ Error sending appointment reminder: {e}")
-                        
-        except Exception as e:
-            logger.error(f"Error processing appointment reminder: {e}")
+            with transaction.atomic():
+                RappelRendezVous.objects.bulk_create([
+                    RappelRendezVous(rendez_vous=appointment, type_rappel=appointment.type_rappel)
+                    for appointment in appointments
+                ])
+                mettre_en_file_lot(messages)
+        except IntegrityError:
+            logger.warning("Appointment reminders already recorded by another run, skipping this pass")
+            return {'lues': len(appointments), 'envois': 0}
+
+        return {'lues': len(appointments), 'envois': len(messages)}
 
 # Global scheduler instance
 scheduler = MedicationReminderScheduler()
\ No newline at end of file
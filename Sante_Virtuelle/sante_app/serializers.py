@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from .models import (
     Patient, Medecin, RendezVous, Consultation, Medicament,
     Pathologie, Traitement, Constante, Mesure, Article,
@@ -8,70 +9,12 @@ from .models import (
     Urgence, NotificationUrgence, MedicalDocument, Rating, Conversation, Message, ChatbotKnowledgeBase, ConsultationMessage, Teleconsultation, DisponibiliteMedecin, IndisponibiliteMedecin, Notification  # Added Notification
 )
 from datetime import datetime, timedelta
+from .conflicts import check_appointment_conflict
+import logging
 
-User = get_user_model()
+logger = logging.getLogger(__name__)
 
-# Utility function for robust conflict detection
-def check_appointment_conflict(medecin_user, date_rdv, heure_rdv, duration_minutes, exclude_rdv_id=None):
-    """
-    Check if there's a conflict with existing appointments
-    Returns tuple: (has_conflict, conflicting_appointment)
-    """
-    from .models import RendezVous, Medecin, DisponibiliteMedecin
-    
-    # Calculate time range for the new appointment
-    new_start = datetime.combine(date_rdv, heure_rdv)
-    new_end = new_start + timedelta(minutes=duration_minutes)
-    
-    # Get existing appointments for this doctor on this date
-    existing_appointments = RendezVous.objects.filter(
-        medecin=medecin_user,
-        date=date_rdv,
-        statut__in=['CONFIRMED', 'PENDING']
-    )
-    
-    # Exclude the current appointment if we're updating
-    if exclude_rdv_id:
-        existing_appointments = existing_appointments.exclude(id=exclude_rdv_id)
-    
-    # Check each existing appointment for time overlap
-    for appointment in existing_appointments:
-        # Get the doctor's availability for this appointment's day to get the correct duration
-        appt_jour_semaine = appointment.date.strftime('%A').lower()
-        jour_mapping = {
-            'monday': 'lundi',
-            'tuesday': 'mardi',
-            'wednesday': 'mercredi',
-            'thursday': 'jeudi',
-            'friday': 'vendredi',
-            'saturday': 'samedi',
-            'sunday': 'dimanche'
-        }
-        appt_jour_fr = jour_mapping.get(appt_jour_semaine, '')
-        
-        try:
-            # Get the doctor's availability for this day to determine appointment duration
-            medecin = Medecin.objects.get(user=medecin_user)
-            appt_disponibilite = DisponibiliteMedecin.objects.get(
-                medecin=medecin, 
-                jour=appt_jour_fr, 
-                actif=True
-            )
-            appt_duree = timedelta(minutes=appt_disponibilite.duree_consultation)
-        except (Medecin.DoesNotExist, DisponibiliteMedecin.DoesNotExist):
-            # Fallback to default 30 minutes if no availability found
-            appt_duree = timedelta(minutes=30)
-        
-        # Calculate appointment time range
-        appt_start = datetime.combine(appointment.date, appointment.heure)
-        appt_end = appt_start + appt_duree
-        
-        # Check for time overlap using strict overlap detection
-        # Two intervals [a,b) and [c,d) overlap if a < d and c < b
-        if new_start < appt_end and appt_start < new_end:
-            return True, appointment
-    
-    return False, None
+User = get_user_model()
 
 # -------------------- User --------------------
 class UserSerializer(serializers.ModelSerializer):
@@ -192,6 +135,9 @@ class RendezVousSerializer(serializers.ModelSerializer):
         ]
         # Remove 'date' and 'heure' from read_only_fields to allow them to be set during creation
         read_only_fields = ['patient', 'date_creation', 'date_modification', 'original_date', 'original_heure']
+        # L'unicité du créneau est vérifiée dans create() (conflits + contrainte en base) :
+        # pas de UniqueTogetherValidator automatique, qui rendrait 'medecin' obligatoire
+        validators = []
     
     def to_representation(self, instance):
         data = super().to_representation(instance)
@@ -272,27 +218,10 @@ class RendezVousSerializer(serializers.ModelSerializer):
         
         print(f"🔍 Vérification des conflits pour: {date_rdv} à {heure_str}")
         
-        # 4. Vérifier les conflits
-        from sante_app.models import RendezVous
-        rdvs_existants = RendezVous.objects.filter(
-            medecin=medecin.user,  # medecin.user est l'objet User
-            date=date_rdv,
-            statut__in=['PENDING', 'CONFIRMED']
-        )
-        
-        print(f"📊 Rendez-vous existants ce jour: {rdvs_existants.count()}")
-        
-        conflit_trouve = False
-        for rdv in rdvs_existants:
-            rdv_heure_str = rdv.heure.strftime('%H:%M')
-            print(f"  - RDV #{rdv.numero}: {rdv_heure_str} (Statut: {rdv.statut})")
-            
-            if rdv_heure_str == heure_str:
-                print(f"❌ CONFLIT avec RDV #{rdv.numero}")
-                conflit_trouve = True
-                break
-        
-        if conflit_trouve:
+        # 4. Vérifier les conflits (chevauchement avec un RDV actif du médecin)
+        has_conflict, conflit = check_appointment_conflict(medecin.user_id, date_rdv, heure_rdv)
+        if has_conflict:
+            logger.info(f"❌ Conflit avec le RDV #{conflit.numero} ({date_rdv} {heure_str})")
             raise serializers.ValidationError({
                 'heure': 'Ce créneau est déjà réservé'
             })
@@ -329,8 +258,15 @@ class RendezVousSerializer(serializers.ModelSerializer):
         validated_data['medecin'] = medecin.user
         validated_data['patient'] = patient.user
         
-        # 7. Créer le rendez-vous
-        rdv = super().create(validated_data)
+        # 7. Créer le rendez-vous : en cas de réservations simultanées du même
+        # créneau, la contrainte unique_creneau_actif_medecin tranche en base
+        try:
+            with transaction.atomic():
+                rdv = super().create(validated_data)
+        except IntegrityError:
+            raise serializers.ValidationError({
+                'heure': 'Ce créneau est déjà réservé'
+            })
         
         print(f"✅ RDV créé - ID: {rdv.numero}, Médecin: {rdv.medecin.get_full_name()}, Date: {rdv.date}, Heure: {rdv.heure}")
         print("=" * 80)
@@ -679,7 +615,10 @@ class RatingSerializer(serializers.ModelSerializer):
 
 # -------------------- Messaging Serializers --------------------
 class ConversationSerializer(serializers.ModelSerializer):
-    """Sérialiseur pour les conversations"""
+    """
+    Sérialiseur pour les conversations. Avec un queryset de
+    messagerie.boite_de_reception, il n'émet aucune requête par conversation.
+    """
     participant_names = serializers.SerializerMethodField()
     last_message = serializers.SerializerMethodField()
     last_message_time = serializers.SerializerMethodField()
@@ -694,26 +633,41 @@ class ConversationSerializer(serializers.ModelSerializer):
                   'participant_names', 'last_message', 'last_message_time', 
                   'unread_count', 'recipient_name', 'patient_name', 'is_urgent']
         
+    def _last_message(self, obj):
+        if not hasattr(obj, '_last_message_cache'):
+            obj._last_message_cache = obj.messages.order_by('-timestamp', '-id').first()
+        return obj._last_message_cache
+
+    def _other_participant(self, obj):
+        # participants.all() utilise le préchargement de boite_de_reception
+        user = self.context['request'].user
+        return next((p for p in obj.participants.all() if p.id != user.id), None)
+
     def get_participant_names(self, obj):
         return ", ".join([p.username for p in obj.participants.all()])
         
     def get_last_message(self, obj):
-        last_message = obj.messages.last()
+        if hasattr(obj, 'last_message_content'):
+            return obj.last_message_content or ""
+        last_message = self._last_message(obj)
         return last_message.content if last_message else ""
         
     def get_last_message_time(self, obj):
-        last_message = obj.messages.last()
+        if hasattr(obj, 'last_message_timestamp'):
+            return obj.last_message_timestamp
+        last_message = self._last_message(obj)
         return last_message.timestamp if last_message else None
         
     def get_unread_count(self, obj):
+        if hasattr(obj, 'unread'):
+            return obj.unread
         user = self.context['request'].user
         return obj.messages.filter(is_read=False).exclude(sender=user).count()
         
     def get_recipient_name(self, obj):
-        user = self.context['request'].user
-        other_participant = obj.get_other_participant(user)
+        other_participant = self._other_participant(obj)
         if other_participant:
-            if hasattr(other_participant, 'medecin_profile'):
+            if other_participant.role == 'medecin':
                 return f"Dr. {other_participant.first_name} {other_participant.last_name}"
             else:
                 return f"{other_participant.first_name} {other_participant.last_name}"
@@ -722,9 +676,9 @@ class ConversationSerializer(serializers.ModelSerializer):
     def get_patient_name(self, obj):
         # For doctor's view, show patient name
         user = self.context['request'].user
-        if hasattr(user, 'medecin_profile'):
-            other_participant = obj.get_other_participant(user)
-            if other_participant and not hasattr(other_participant, 'medecin_profile'):
+        if user.role == 'medecin':
+            other_participant = self._other_participant(obj)
+            if other_participant and other_participant.role != 'medecin':
                 return f"{other_participant.first_name} {other_participant.last_name}"
         return ""
 
@@ -741,14 +695,14 @@ class MessageSerializer(serializers.ModelSerializer):
         read_only_fields = ['sender', 'timestamp']
         
     def get_sender_name(self, obj):
-        if hasattr(obj.sender, 'medecin_profile'):
+        if obj.sender.role == 'medecin':
             return f"Dr. {obj.sender.first_name} {obj.sender.last_name}"
         return f"{obj.sender.first_name} {obj.sender.last_name}"
         
     def get_is_own(self, obj):
         request = self.context.get('request')
         if request and hasattr(request, 'user'):
-            return obj.sender == request.user
+            return obj.sender_id == request.user.id
         return False
         
     def create(self, validated_data):
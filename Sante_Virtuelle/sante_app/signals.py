@@ -1,8 +1,13 @@
 # sante_app/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import Patient, Medecin, RendezVous, Consultation
+from .models import (
+    Patient, Medecin, RendezVous, Consultation, DisponibiliteMedecin, IndisponibiliteMedecin,
+    Message, Notification, NotificationUrgence, Article, ChatbotKnowledgeBase,
+    Hopital, Clinique, Pharmacie, Dentiste,
+)
+from . import availability, compteurs, etablissements, recherche
 import logging
 
 logger = logging.getLogger(__name__)
@@ -67,4 +72,137 @@ def create_consultation_on_appointment_confirmation(sender, instance, created, *
         else:
             logger.info(f"Consultation {existing_consultation.numero} already exists for appointment {instance.numero}")
     else:
-        logger.info(f"Skipping consultation creation for appointment {instance.numero}. Created: {created}, Status: {instance.statut}")
\ No newline at end of file
+        logger.info(f"Skipping consultation creation for appointment {instance.numero}. Created: {created}, Status: {instance.statut}")
+
+
+# --------------------
+# Disponibilités : invalidation du cache des créneaux après COMMIT
+# --------------------
+def _creneau_actif(valeurs):
+    """(medecin_user_id, date, heure) si ces valeurs de RDV occupent un créneau, sinon None"""
+    if valeurs.get('statut') not in availability.STATUTS_ACTIFS:
+        return None
+    if not valeurs.get('medecin_id') or not valeurs.get('date') or not valeurs.get('heure'):
+        return None
+    return (valeurs['medecin_id'], valeurs['date'], valeurs['heure'])
+
+
+@receiver(post_save, sender=RendezVous)
+def update_slot_cache_on_appointment_save(sender, instance, **kwargs):
+    # Les valeurs initiales sont encore celles d'avant la sauvegarde (voir SuiviModificationsMixin)
+    ancien = _creneau_actif(instance.valeurs_initiales)
+    nouveau = _creneau_actif(instance.__dict__)
+    if ancien != nouveau:
+        for creneau in filter(None, (ancien, nouveau)):
+            medecin_user_id, date_rdv, _ = creneau
+            availability.invalider_journee_apres_commit(medecin_user_id, date_rdv)
+
+
+@receiver(post_delete, sender=RendezVous)
+def update_slot_cache_on_appointment_delete(sender, instance, **kwargs):
+    ancien = _creneau_actif(instance.valeurs_initiales)
+    if ancien:
+        medecin_user_id, date_rdv, _ = ancien
+        availability.invalider_journee_apres_commit(medecin_user_id, date_rdv)
+
+
+@receiver(post_save, sender=DisponibiliteMedecin)
+@receiver(post_delete, sender=DisponibiliteMedecin)
+@receiver(post_save, sender=IndisponibiliteMedecin)
+@receiver(post_delete, sender=IndisponibiliteMedecin)
+def invalidate_slot_cache_on_schedule_change(sender, instance, **kwargs):
+    medecin_user_id = Medecin.objects.filter(pk=instance.medecin_id).values_list('user_id', flat=True).first()
+    if medecin_user_id:
+        availability.invalider_medecin_apres_commit(medecin_user_id)
+
+
+# Cache des participants de la poignée de main WebSocket (voir consumers.py)
+@receiver(post_save, sender=Consultation)
+@receiver(post_delete, sender=Consultation)
+def invalider_participants_consultation(sender, instance, **kwargs):
+    from .consumers import invalider_participants_consultation as invalider
+    invalider(instance.pk)
+
+
+# Compteurs de non-lus (voir compteurs.py) : créations et suppressions unitaires.
+# pre_delete : les participants d'une conversation supprimée en cascade sont encore lisibles.
+@receiver(post_save, sender=Message)
+def compter_message_cree(sender, instance, created, **kwargs):
+    if created:
+        compteurs.messages_crees([instance])
+
+
+@receiver(pre_delete, sender=Message)
+def decompter_message_supprime(sender, instance, **kwargs):
+    compteurs.messages_crees([instance], signe=-1)
+
+
+@receiver(post_save, sender=Notification)
+def compter_notification_creee(sender, instance, created, **kwargs):
+    if created and not instance.lu:
+        compteurs.notifications_creees(instance.medecin.user_id)
+
+
+@receiver(pre_delete, sender=Notification)
+def decompter_notification_supprimee(sender, instance, **kwargs):
+    if not instance.lu:
+        compteurs.notifications_lues(instance.medecin.user_id, 1)
+
+
+@receiver(post_save, sender=NotificationUrgence)
+def compter_urgence_notifiee(sender, instance, created, **kwargs):
+    if created and not instance.lue:
+        compteurs.urgences_notifiees([instance.medecin.user_id])
+
+
+@receiver(pre_delete, sender=NotificationUrgence)
+def decompter_urgence_supprimee(sender, instance, **kwargs):
+    if not instance.lue:
+        compteurs.urgences_lues(instance.medecin.user_id, 1)
+
+
+# Recherche plein texte (voir recherche.py) : le document d'un médecin contient son nom
+@receiver(post_save, sender=User)
+def actualiser_recherche_medecin(sender, instance, created, update_fields=None, **kwargs):
+    if created or instance.role != 'medecin':
+        return
+    if update_fields is not None and not {'first_name', 'last_name'} & set(update_fields):
+        return
+    medecin = Medecin.objects.filter(user=instance).first()
+    if medecin is not None:
+        medecin.user = instance
+        document = recherche.document(medecin)
+        Medecin.objects.filter(pk=medecin.pk).update(document_recherche=document)
+        recherche.notifier(Medecin, medecin.pk, document)
+
+
+# Index de recherche en mémoire (SEARCH_BACKEND = 'memoire', voir index_memoire.py)
+@receiver(post_save, sender=Article)
+@receiver(post_save, sender=Medecin)
+@receiver(post_save, sender=ChatbotKnowledgeBase)
+def indexer_document(sender, instance, **kwargs):
+    recherche.notifier(sender, instance.pk, instance.document_recherche)
+
+
+@receiver(post_delete, sender=Article)
+@receiver(post_delete, sender=Medecin)
+@receiver(post_delete, sender=ChatbotKnowledgeBase)
+def desindexer_document(sender, instance, **kwargs):
+    recherche.notifier(sender, instance.pk)
+
+
+# Vue de lecture des centres de santé (voir etablissements.py)
+@receiver(post_save, sender=Hopital)
+@receiver(post_save, sender=Clinique)
+@receiver(post_save, sender=Pharmacie)
+@receiver(post_save, sender=Dentiste)
+def synchroniser_etablissement(sender, instance, **kwargs):
+    etablissements.synchroniser(instance)
+
+
+@receiver(post_delete, sender=Hopital)
+@receiver(post_delete, sender=Clinique)
+@receiver(post_delete, sender=Pharmacie)
+@receiver(post_delete, sender=Dentiste)
+def retirer_etablissement(sender, instance, **kwargs):
+    etablissements.retirer(instance)
@@ -0,0 +1,285 @@
+"""
+Statistiques des tableaux de bord.
+
+Chaque tableau est calculé par agrégation conditionnelle
+(``Count('pk', filter=Q(...))``) : une requête par table au lieu d'un
+``count()`` par chiffre affiché. Le résultat est mis en cache
+(``instantane``) pour STATISTICS_CACHE_TIMEOUT secondes.
+
+Avec STATISTICS_DAILY_ROLLUP, les rendez-vous des jours passés sont lus dans
+StatistiqueJournaliere (une ligne par jour, consolidée chaque nuit par le
+scheduler) et seuls les jours non consolidés sont comptés en direct : le coût
+ne dépend plus de la taille de l'historique. Les derniers jours consolidés
+(STATISTICS_ROLLUP_RECALCUL_JOURS) sont recalculés à chaque passage pour
+suivre les changements de statut tardifs.
+
+Réglages (settings.py) :
+    STATISTICS_CACHE_TIMEOUT           durée de vie d'un instantané, en secondes (60)
+    STATISTICS_DAILY_ROLLUP            utiliser le cumul journalier (False)
+    STATISTICS_ROLLUP_RECALCUL_JOURS   jours consolidés recalculés à chaque passage (7)
+"""
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+from . import cache_public
+
+# Statut de rendez-vous -> colonne de StatistiqueJournaliere
+COLONNES_STATUT = {
+    'PENDING': 'en_attente',
+    'CONFIRMED': 'confirmes',
+    'RESCHEDULED': 'reprogrammes',
+    'CANCELLED': 'annules',
+    'TERMINE': 'termines',
+}
+
+
+def _reglage(nom, defaut):
+    return getattr(settings, nom, defaut)
+
+
+def instantane(nom, calcul, timeout=None):
+    """Résultat de ``calcul()`` mis en cache sous ``statistiques:<nom>``"""
+    cle = f'statistiques:{nom}'
+    valeur = cache.get(cle)
+    if valeur is None:
+        valeur = calcul()
+        cache.set(cle, valeur, timeout or _reglage('STATISTICS_CACHE_TIMEOUT', 60))
+    return valeur
+
+
+def _bornes(aujourd_hui=None):
+    aujourd_hui = aujourd_hui or date.today()
+    return aujourd_hui, aujourd_hui - timedelta(days=7), aujourd_hui - timedelta(days=30)
+
+
+def compter_tables(**querysets):
+    """Plusieurs COUNT(*) en une seule requête (une sous-requête scalaire par queryset)"""
+    colonnes, params = [], []
+    for nom, queryset in querysets.items():
+        sql, sql_params = queryset.order_by().values('pk').query.sql_with_params()
+        colonnes.append(f'(SELECT COUNT(*) FROM ({sql}) {nom})')
+        params.extend(sql_params)
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT ' + ', '.join(colonnes), params)
+        return dict(zip(querysets, cursor.fetchone()))
+
+
+def agregats_rendez_vous(aujourd_hui=None):
+    """
+    Rendez-vous : total, aujourd_hui, semaine, mois (par date de rendez-vous,
+    comme les anciens compteurs) et une colonne par statut (COLONNES_STATUT).
+    Une requête, deux avec le cumul journalier.
+    """
+    from .models import RendezVous, StatistiqueJournaliere
+
+    aujourd_hui, semaine, mois = _bornes(aujourd_hui)
+    colonnes = ('total', 'aujourd_hui', 'semaine', 'mois', *COLONNES_STATUT.values())
+    resultat = dict.fromkeys(colonnes, 0)
+    direct = RendezVous.objects.all()
+
+    if _reglage('STATISTICS_DAILY_ROLLUP', False):
+        # Les alias ne peuvent pas reprendre le nom des colonnes agrégées
+        cumul = StatistiqueJournaliere.objects.filter(jour__lt=aujourd_hui).aggregate(
+            dernier=Max('jour'),
+            cumul_total=Sum('total'),
+            cumul_semaine=Sum('total', filter=Q(jour__gte=semaine)),
+            cumul_mois=Sum('total', filter=Q(jour__gte=mois)),
+            **{f'cumul_{colonne}': Sum(colonne) for colonne in COLONNES_STATUT.values()},
+        )
+        dernier = cumul.pop('dernier')
+        if dernier is not None:
+            for alias, valeur in cumul.items():
+                resultat[alias.removeprefix('cumul_')] += valeur or 0
+            direct = direct.filter(date__gt=dernier)
+
+    en_direct = direct.aggregate(
+        total=Count('pk'),
+        aujourd_hui=Count('pk', filter=Q(date=aujourd_hui)),
+        semaine=Count('pk', filter=Q(date__gte=semaine)),
+        mois=Count('pk', filter=Q(date__gte=mois)),
+        **{colonne: Count('pk', filter=Q(statut=statut)) for statut, colonne in COLONNES_STATUT.items()},
+    )
+    for colonne, valeur in en_direct.items():
+        resultat[colonne] += valeur
+    return resultat
+
+
+def _par_statut(rendez_vous):
+    """Même forme que values('statut').annotate(count=...) : statuts présents seulement"""
+    return [
+        {'statut': statut, 'count': rendez_vous[colonne]}
+        for statut, colonne in COLONNES_STATUT.items()
+        if rendez_vous[colonne]
+    ]
+
+
+def _debut_journee(jour):
+    return timezone.make_aware(datetime.combine(jour, time.min))
+
+
+def agregats_utilisateurs(aujourd_hui=None):
+    from .models import User
+
+    _, semaine, mois = _bornes(aujourd_hui)
+    semaine, mois = _debut_journee(semaine), _debut_journee(mois)
+    return User.objects.aggregate(
+        total=Count('pk'),
+        patients=Count('patient_profile'),
+        medecins=Count('medecin'),
+        nouveaux_semaine=Count('pk', filter=Q(date_joined__gte=semaine)),
+        nouveaux_mois=Count('pk', filter=Q(date_joined__gte=mois)),
+    )
+
+
+def tableau_admin(aujourd_hui=None):
+    """Dashboard admin général (admin_statistics)"""
+    from .models import Consultation, Medicament, Pathologie
+
+    utilisateurs = agregats_utilisateurs(aujourd_hui)
+    rendez_vous = agregats_rendez_vous(aujourd_hui)
+    tables = compter_tables(
+        consultations=Consultation.objects.all(),
+        pathologies=Pathologie.objects.all(),
+        medicaments=Medicament.objects.all(),
+    )
+    return {
+        'total_users': utilisateurs['total'],
+        'total_patients': utilisateurs['patients'],
+        'total_medecins': utilisateurs['medecins'],
+        'total_rendez_vous': rendez_vous['total'],
+        'rendez_vous_today': rendez_vous['aujourd_hui'],
+        'rendez_vous_week': rendez_vous['semaine'],
+        'rendez_vous_month': rendez_vous['mois'],
+        'rendez_vous_by_status': _par_statut(rendez_vous),
+        'new_users_week': utilisateurs['nouveaux_semaine'],
+        'new_users_month': utilisateurs['nouveaux_mois'],
+        'total_consultations': tables['consultations'],
+        'total_pathologies': tables['pathologies'],
+        'total_medicaments': tables['medicaments'],
+    }
+
+
+@cache_public.source('statistiques_publiques')
+def tableau_public():
+    """Chiffres de la page d'accueil (public_statistics), servis par cache_public"""
+    from .models import Clinique, Dentiste, Hopital, Pharmacie
+
+    utilisateurs = agregats_utilisateurs()
+    rendez_vous = agregats_rendez_vous()
+    tables = compter_tables(
+        cliniques=Clinique.objects.all(),
+        pharmacies=Pharmacie.objects.all(),
+        hopitaux=Hopital.objects.all(),
+        dentistes=Dentiste.objects.all(),
+    )
+    return {
+        'total_users': utilisateurs['total'],
+        'total_patients': utilisateurs['patients'],
+        'total_doctors': utilisateurs['medecins'],
+        'total_clinics': tables['cliniques'],
+        'total_pharmacies': tables['pharmacies'],
+        'total_hospitals': tables['hopitaux'],
+        'total_dentists': tables['dentistes'],
+        'total_appointments': rendez_vous['total'],
+        'appointments_today': rendez_vous['aujourd_hui'],
+        'appointments_week': rendez_vous['semaine'],
+        'appointments_month': rendez_vous['mois'],
+        'new_users_week': utilisateurs['nouveaux_semaine'],
+        'new_users_month': utilisateurs['nouveaux_mois'],
+    }
+
+
+def tableau_rendez_vous(aujourd_hui=None):
+    """Dashboard des rendez-vous (admin_appointments_statistics)"""
+    rendez_vous = agregats_rendez_vous(aujourd_hui)
+    return {
+        'total_appointments': rendez_vous['total'],
+        'today_appointments': rendez_vous['aujourd_hui'],
+        'week_appointments': rendez_vous['semaine'],
+        'month_appointments': rendez_vous['mois'],
+        'appointments_by_status': _par_statut(rendez_vous),
+        'confirmed_appointments': rendez_vous['confirmes'],
+        'cancelled_appointments': rendez_vous['annules'],
+        'rescheduled_appointments': rendez_vous['reprogrammes'],
+        'pending_appointments': rendez_vous['en_attente'],
+        'completed_appointments': rendez_vous['termines'],
+    }
+
+
+def tableau_articles():
+    """Dashboard des articles (articles_statistics) : deux requêtes"""
+    from .models import Article
+
+    stats = Article.objects.aggregate(
+        total=Count('pk'),
+        brouillons=Count('pk', filter=Q(statut='brouillon')),
+        en_attente=Count('pk', filter=Q(statut='en_attente')),
+        valides=Count('pk', filter=Q(statut='valide')),
+        refuses=Count('pk', filter=Q(statut='refuse')),
+        desactives=Count('pk', filter=Q(statut='desactive')),
+        total_vues=Sum('vues', filter=Q(statut='valide')),
+    )
+    stats['total_vues'] = stats['total_vues'] or 0
+    stats['par_categorie'] = list(
+        Article.objects.filter(statut='valide')
+        .values('categorie').annotate(count=Count('id')).order_by('categorie')
+    )
+    return stats
+
+
+def tableau_urgences():
+    """Statistiques du dashboard des urgences (urgences_admin_dashboard) : deux requêtes"""
+    from .models import Urgence
+
+    stats = Urgence.objects.aggregate(
+        total=Count('pk'),
+        en_attente=Count('pk', filter=Q(statut='en_attente')),
+        prise_en_charge=Count('pk', filter=Q(statut='prise_en_charge')),
+        resolues=Count('pk', filter=Q(statut='resolue')),
+        critiques=Count('pk', filter=Q(priorite='critique', statut__in=['en_attente', 'prise_en_charge'])),
+    )
+    stats['par_priorite'] = list(
+        Urgence.objects.values('priorite').annotate(count=Count('id')).order_by('priorite')
+    )
+    stats['temps_moyen_prise_en_charge'] = 'À calculer'  # TODO
+    return stats
+
+
+def consolider_journees(jusqu_au=None):
+    """
+    Écrit StatistiqueJournaliere jusqu'à ``jusqu_au`` (la veille par défaut) :
+    tout l'historique au premier passage, puis les derniers jours consolidés
+    (STATISTICS_ROLLUP_RECALCUL_JOURS) et les jours manquants. Une requête
+    GROUP BY date, puis remplacement des lignes dans une transaction.
+    Retourne le nombre de journées écrites.
+    """
+    from .models import RendezVous, StatistiqueJournaliere
+
+    fin = jusqu_au or date.today() - timedelta(days=1)
+    dernier = StatistiqueJournaliere.objects.aggregate(dernier=Max('jour'))['dernier']
+    debut = None
+    if dernier is not None:
+        debut = min(dernier, fin) - timedelta(days=_reglage('STATISTICS_ROLLUP_RECALCUL_JOURS', 7))
+
+    lignes = RendezVous.objects.filter(date__lte=fin)
+    anciennes = StatistiqueJournaliere.objects.filter(jour__lte=fin)
+    if debut is not None:
+        lignes = lignes.filter(date__gt=debut)
+        anciennes = anciennes.filter(jour__gt=debut)
+
+    journees = [
+        StatistiqueJournaliere(jour=ligne.pop('date'), **ligne)
+        for ligne in lignes.order_by().values('date').annotate(
+            total=Count('pk'),
+            **{colonne: Count('pk', filter=Q(statut=statut)) for statut, colonne in COLONNES_STATUT.items()},
+        )
+    ]
+    with transaction.atomic():
+        anciennes.delete()
+        StatistiqueJournaliere.objects.bulk_create(journees, batch_size=500)
+    return len(journees)
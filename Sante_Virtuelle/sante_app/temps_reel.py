@@ -0,0 +1,31 @@
+"""
+Envoi d'événements WebSocket depuis le code synchrone (vues, signaux).
+
+Les consumers rejoignent le groupe ``user_<id>`` de leur utilisateur (voir
+consumers.MessageConsumer) ; ``notifier_utilisateurs`` y publie un événement
+dont ``type`` désigne la méthode du consumer qui le relaie au navigateur.
+Une couche de canaux indisponible ne doit pas faire échouer la requête HTTP :
+l'erreur est journalisée et ignorée.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+logger = logging.getLogger(__name__)
+
+
+def groupe_utilisateur(user_id):
+    return f'user_{user_id}'
+
+
+def notifier_utilisateurs(user_ids, evenement):
+    """Publie ``evenement`` (dict avec une clé 'type') dans le groupe de chaque utilisateur"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    for user_id in user_ids:
+        try:
+            async_to_sync(channel_layer.group_send)(groupe_utilisateur(user_id), evenement)
+        except Exception as e:
+            logger.warning(f"⚠️ Événement {evenement.get('type')} non transmis à l'utilisateur {user_id} : {e}")
@@ -0,0 +1,73 @@
+import pytest
+from datetime import timedelta
+from django.utils import timezone
+from sante_app.models import User, RendezVous, RappelRendezVous, NotificationOutbox
+from sante_app.scheduler import MedicationReminderScheduler
+
+
+@pytest.fixture
+def maintenant():
+    return timezone.now().replace(second=0, microsecond=0)
+
+
+@pytest.fixture
+def creer_rdv(db, maintenant):
+    medecin = User.objects.create_user(username='dr_rappel_rdv', password='Test123!', role='medecin')
+    patient = User.objects.create_user(
+        username='patient_rappel_rdv', password='Test123!', role='patient',
+        email='patient.rdv@example.com', first_name='Moussa'
+    )
+
+    def creer(delai, statut='CONFIRMED'):
+        moment = timezone.localtime(maintenant + delai)
+        return RendezVous.objects.create(
+            patient=patient, medecin=medecin,
+            date=moment.date(), heure=moment.time(), statut=statut
+        )
+    return creer
+
+
+class TestRealAppointmentReminders:
+    """Rappels de rendez-vous dédupliqués par le registre des envois"""
+
+    def test_each_appointment_gets_the_matching_reminder_kind(self, creer_rdv, maintenant):
+        veille = creer_rdv(timedelta(hours=20))
+        proche = creer_rdv(timedelta(hours=1))
+        imminent = creer_rdv(timedelta(minutes=10))
+        creer_rdv(timedelta(hours=30))
+        creer_rdv(timedelta(hours=3), statut='PENDING')
+
+        envoyes = MedicationReminderScheduler().dispatch_appointment_reminders(maintenant)['envois']
+
+        assert envoyes == 3
+        assert dict(RappelRendezVous.objects.values_list('rendez_vous', 'type_rappel')) == {
+            veille.pk: '24h', proche.pk: '2h', imminent.pk: '15min',
+        }
+        assert NotificationOutbox.objects.count() == 3
+
+    def test_repeated_passes_do_not_resend(self, creer_rdv, maintenant):
+        creer_rdv(timedelta(hours=20))
+        planificateur = MedicationReminderScheduler()
+
+        assert planificateur.dispatch_appointment_reminders(maintenant)['envois'] == 1
+        for minutes in range(5, 60, 5):
+            assert planificateur.dispatch_appointment_reminders(maintenant + timedelta(minutes=minutes))['envois'] == 0
+        assert NotificationOutbox.objects.count() == 1
+
+    def test_next_kind_is_sent_when_its_window_opens(self, creer_rdv, maintenant):
+        rdv = creer_rdv(timedelta(hours=3))
+        planificateur = MedicationReminderScheduler()
+
+        planificateur.dispatch_appointment_reminders(maintenant)
+        planificateur.dispatch_appointment_reminders(maintenant + timedelta(hours=1, minutes=30))
+
+        assert sorted(rdv.rappels_envoyes.values_list('type_rappel', flat=True)) == ['24h', '2h']
+
+    def test_due_reminders_are_selected_in_one_query(self, creer_rdv, maintenant, django_assert_num_queries):
+        for heures in range(1, 20):
+            creer_rdv(timedelta(hours=heures))
+
+        with django_assert_num_queries(1):
+            dus = list(MedicationReminderScheduler().due_appointment_reminders(maintenant))
+            assert {rdv.patient.email for rdv in dus} == {'patient.rdv@example.com'}
+        assert len(dus) == 19
@@ -0,0 +1,165 @@
+import pytest
+from unittest import mock
+from django.core.cache import cache, caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+from sante_app import compteur_vues
+from sante_app.models import User, Article
+from sante_app.scheduler import MedicationReminderScheduler
+from sante_app.views import article_detail_public
+
+
+@pytest.fixture(autouse=True)
+def vider_cache(settings):
+    settings.ARTICLE_VIEWS_BUFFERED = True
+    cache.clear()
+    caches['lecteurs'].clear()
+    yield
+    cache.clear()
+    caches['lecteurs'].clear()
+
+
+@pytest.fixture
+def article(db):
+    user = User.objects.create_user(username='dr_vues', password='Test123!', role='medecin')
+    return Article.objects.create(titre='Paludisme', contenu='Prévention', auteur=user.medecin, statut='valide')
+
+
+def lire(article, ip):
+    return article_detail_public(APIRequestFactory().get('/', REMOTE_ADDR=ip), slug=article.slug)
+
+
+class TestRealArticleViews:
+    """Compteur de vues tamponné dans le cache, reporté par UPDATE vues = vues + n"""
+
+    def test_views_do_not_write_until_flush(self, article):
+        with CaptureQueriesContext(connection) as requetes:
+            for i in range(20):
+                assert lire(article, f'10.0.0.{i}').status_code == 200
+
+        assert not [q for q in requetes.captured_queries if q['sql'].startswith('UPDATE')]
+        assert compteur_vues.en_attente(article.pk) == 20
+
+        assert MedicationReminderScheduler().flush_article_views() == {'lues': 1, 'envois': 20}
+        article.refresh_from_db()
+        assert article.vues == 20
+        assert compteur_vues.en_attente(article.pk) == 0
+        assert compteur_vues.vider() == {'articles': 0, 'vues': 0}
+
+    def test_same_reader_counted_once_per_window(self, article, settings):
+        for _ in range(5):
+            lire(article, '10.0.0.1')
+        assert compteur_vues.en_attente(article.pk) == 1
+
+        # Derrière un proxy, la première adresse de X-Forwarded-For identifie le lecteur
+        derriere_proxy = APIRequestFactory().get('/', HTTP_X_FORWARDED_FOR='196.1.1.1, 10.0.0.1')
+        assert compteur_vues.lecteur(derriere_proxy) == 'ip:196.1.1.1'
+
+        settings.ARTICLE_VIEWS_DEDUP_WINDOW = 0
+        for _ in range(3):
+            lire(article, '10.0.0.1')
+        assert compteur_vues.en_attente(article.pk) == 4
+
+    def test_views_counted_during_flush_are_kept(self, article):
+        for i in range(5):
+            compteur_vues.enregistrer(article.pk)
+        reporter = compteur_vues._reporter
+
+        def reporter_pendant_une_vue(increments):
+            compteur_vues.enregistrer(article.pk)
+            reporter(increments)
+
+        with mock.patch('sante_app.compteur_vues._reporter', side_effect=reporter_pendant_une_vue):
+            assert compteur_vues.vider() == {'articles': 1, 'vues': 5}
+
+        article.refresh_from_db()
+        assert article.vues == 5
+        assert compteur_vues.en_attente(article.pk) == 1
+
+    def test_unbuffered_mode_updates_atomically(self, article, settings):
+        settings.ARTICLE_VIEWS_BUFFERED = False
+        perime = Article.objects.get(pk=article.pk)
+
+        article.incrementer_vues()
+        perime.incrementer_vues()
+
+        article.refresh_from_db()
+        assert article.vues == 2
+        assert compteur_vues.en_attente(article.pk) == 0
+
+    def test_flush_reads_only_articles_with_pending_views(self, article):
+        autres = [
+            Article.objects.create(titre=f'Article {i}', contenu='...', auteur=article.auteur, statut='valide')
+            for i in range(3)
+        ]
+        for _ in range(3):
+            compteur_vues.enregistrer(article.pk)
+        compteur_vues.enregistrer(autres[0].pk)
+
+        # Ni lecture de tous les articles, ni lecture de leurs compteurs : un UPDATE
+        with CaptureQueriesContext(connection) as requetes:
+            assert compteur_vues.vider() == {'articles': 2, 'vues': 4}
+        assert [q['sql'].split()[0] for q in requetes.captured_queries] == ['UPDATE']
+
+        # Journal vidé ; une nouvelle vue réinscrit l'article
+        assert compteur_vues.vider() == {'articles': 0, 'vues': 0}
+        compteur_vues.enregistrer(article.pk)
+        assert compteur_vues.vider() == {'articles': 1, 'vues': 1}
+        article.refresh_from_db()
+        assert article.vues == 4
+
+    def test_unwritten_journal_entry_is_skipped_on_next_flush(self, article):
+        # Numéro réservé par un processus arrêté avant d'écrire son entrée
+        compteur_vues._incrementer(compteur_vues.CLE_JOURNAL)
+        compteur_vues.enregistrer(article.pk)
+
+        assert compteur_vues.vider() == {'articles': 0, 'vues': 0}
+        assert compteur_vues.vider() == {'articles': 1, 'vues': 1}
+
+    def test_crash_before_journal_entry_does_not_block_the_article(self, article):
+        set_reel = cache.set
+
+        def arret_du_processus(cle, *args, **kwargs):
+            if cle.startswith('vues:journal:'):
+                raise SystemExit('worker arrêté')
+            return set_reel(cle, *args, **kwargs)
+
+        # Compteur incrémenté, numéro réservé, arrêt avant l'entrée du journal
+        with mock.patch.object(cache, 'set', side_effect=arret_du_processus):
+            with pytest.raises(SystemExit):
+                compteur_vues.enregistrer(article.pk)
+        assert compteur_vues.en_attente(article.pk) == 1
+
+        # Le trou est attendu un passage, puis abandonné
+        assert compteur_vues.vider() == {'articles': 0, 'vues': 0}
+        assert compteur_vues.vider() == {'articles': 0, 'vues': 0}
+
+        # Aucun marqueur posé : la vue suivante réinscrit l'article
+        compteur_vues.enregistrer(article.pk)
+        assert compteur_vues.vider() == {'articles': 1, 'vues': 2}
+        article.refresh_from_db()
+        assert article.vues == 2
+
+    def test_dedup_markers_live_in_their_own_cache(self, article):
+        lire(article, '10.0.0.1')
+
+        # Le cache principal vidé, le lecteur reste dédoublonné
+        cache.clear()
+        lire(article, '10.0.0.1')
+        assert compteur_vues.en_attente(article.pk) == 0
+
+        caches['lecteurs'].clear()
+        lire(article, '10.0.0.1')
+        assert compteur_vues.en_attente(article.pk) == 1
+
+    def test_buffering_requires_a_shared_cache(self, settings):
+        with pytest.raises(ImproperlyConfigured):
+            compteur_vues.verifier_configuration()
+
+        with mock.patch.dict(settings.CACHES['default'], BACKEND='django.core.cache.backends.redis.RedisCache'):
+            compteur_vues.verifier_configuration()
+
+        settings.ARTICLE_VIEWS_BUFFERED = False
+        compteur_vues.verifier_configuration()
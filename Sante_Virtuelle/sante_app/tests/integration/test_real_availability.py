@@ -0,0 +1,221 @@
+import pytest
+from unittest import mock
+from datetime import date, time, timedelta
+from django.core.cache import cache
+from sante_app.models import User, RendezVous, DisponibiliteMedecin, IndisponibiliteMedecin
+from sante_app import availability
+from sante_app.availability import jour_semaine
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def medecin(db):
+    user = User.objects.create_user(
+        username='dr_dispo', password='Test123!', role='medecin',
+        first_name='Awa', last_name='Diallo'
+    )
+    return user.medecin
+
+
+@pytest.fixture
+def patient_user(db):
+    return User.objects.create_user(username='patient_dispo', password='Test123!', role='patient')
+
+
+@pytest.fixture
+def patient_client(api_client, patient_user):
+    api_client.force_authenticate(user=patient_user)
+    return api_client
+
+
+@pytest.fixture
+def jour_travail(medecin):
+    """Un jour ouvré dans une semaine, avec pause déjeuner"""
+    jour = date.today() + timedelta(days=7)
+    DisponibiliteMedecin.objects.create(
+        medecin=medecin, jour=jour_semaine(jour),
+        heure_debut=time(9, 0), heure_fin=time(13, 0), duree_consultation=60,
+        pause_dejeuner_debut=time(12, 0), pause_dejeuner_fin=time(13, 0)
+    )
+    return jour
+
+
+def get_slots(client, medecin, jour):
+    response = client.get('/api/rendezvous/creneaux_disponibles/', {
+        'medecin_id': medecin.id, 'date': jour.isoformat()
+    })
+    assert response.status_code == 200
+    return {slot['heure']: slot for slot in response.data['slots']}
+
+
+class TestRealAvailability:
+    """Tests du moteur de disponibilité et de creneaux_disponibles"""
+
+    def test_day_grid_with_lunch_break(self, patient_client, medecin, jour_travail):
+        slots = get_slots(patient_client, medecin, jour_travail)
+
+        assert list(slots) == ['09:00', '10:00', '11:00', '12:00']
+        assert slots['09:00']['disponible'] is True
+        assert slots['12:00']['motif_indisponibilite'] == 'Pause déjeuner'
+
+    def test_cached_grid_is_served_without_queries(
+        self, patient_client, medecin, jour_travail, django_assert_max_num_queries
+    ):
+        get_slots(patient_client, medecin, jour_travail)
+
+        # Seule la lecture du médecin reste en base
+        with django_assert_max_num_queries(1):
+            get_slots(patient_client, medecin, jour_travail)
+
+    def test_booking_and_cancellation_invalidate_cached_grid(
+        self, patient_client, medecin, patient_user, jour_travail, django_capture_on_commit_callbacks
+    ):
+        get_slots(patient_client, medecin, jour_travail)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            rdv = RendezVous.objects.create(
+                patient=patient_user, medecin=medecin.user,
+                date=jour_travail, heure=time(10, 0), statut='PENDING'
+            )
+        slots = get_slots(patient_client, medecin, jour_travail)
+        assert slots['10:00']['motif_indisponibilite'] == 'Déjà réservé'
+
+        with django_capture_on_commit_callbacks(execute=True):
+            rdv.statut = 'CANCELLED'
+            rdv.save()
+        slots = get_slots(patient_client, medecin, jour_travail)
+        assert slots['10:00']['disponible'] is True
+
+    def test_rolled_back_booking_leaves_cache_untouched(
+        self, patient_client, medecin, patient_user, jour_travail, django_capture_on_commit_callbacks
+    ):
+        get_slots(patient_client, medecin, jour_travail)
+
+        # Pas de COMMIT : les invalidations en attente ne sont jamais exécutées
+        with django_capture_on_commit_callbacks(execute=False) as en_attente:
+            RendezVous.objects.create(
+                patient=patient_user, medecin=medecin.user,
+                date=jour_travail, heure=time(11, 0), statut='PENDING'
+            )
+        assert len(en_attente) == 1
+
+        journee, _ = availability._lire(medecin.user_id, jour_travail)
+        assert journee is not None
+        assert journee.reservations[journee.index(time(11, 0))] == 0
+
+    def test_grid_built_before_a_booking_is_not_cached_after_invalidation(
+        self, medecin, patient_user, jour_travail, django_capture_on_commit_callbacks
+    ):
+        construire = availability.construire_journee
+
+        def reservation_pendant_la_lecture(date_obj, disponibilite, indisponibilites, heures, version):
+            # La lecture a déjà vu la base ; la réservation est validée avant son cache.set
+            heures = list(heures)
+            with django_capture_on_commit_callbacks(execute=True):
+                RendezVous.objects.create(
+                    patient=patient_user, medecin=medecin.user,
+                    date=jour_travail, heure=time(9, 0), statut='PENDING'
+                )
+            return construire(date_obj, disponibilite, indisponibilites, heures, version)
+
+        with mock.patch.object(availability, 'construire_journee', reservation_pendant_la_lecture):
+            perimee = availability.charger_journee(medecin, jour_travail)
+        assert perimee.reservations[perimee.index(time(9, 0))] == 0
+
+        journee, _ = availability._lire(medecin.user_id, jour_travail)
+        assert journee is None
+        journee = availability.charger_journee(medecin, jour_travail)
+        assert journee.reservations[journee.index(time(9, 0))] == 1
+
+    def test_evicted_version_does_not_revive_old_grids(self, medecin, jour_travail):
+        availability.charger_journee(medecin, jour_travail)
+        availability.invalider_medecin(medecin.user_id)
+        ancienne = availability.charger_journee(medecin, jour_travail)
+
+        cache.delete(availability._cle_version(medecin.user_id))
+
+        journee, version = availability._lire(medecin.user_id, jour_travail)
+        assert journee is None
+        assert version != ancienne.version
+
+    def test_unavailability_invalidates_cached_grid(
+        self, patient_client, medecin, jour_travail, django_capture_on_commit_callbacks
+    ):
+        get_slots(patient_client, medecin, jour_travail)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            IndisponibiliteMedecin.objects.create(
+                medecin=medecin, date_debut=jour_travail, date_fin=jour_travail,
+                toute_la_journee=False, heure_debut=time(9, 0), heure_fin=time(10, 0)
+            )
+        slots = get_slots(patient_client, medecin, jour_travail)
+        assert slots['09:00']['motif_indisponibilite'] == 'Médecin indisponible'
+        assert slots['10:00']['disponible'] is True
+
+    def test_day_off(self, patient_client, medecin, jour_travail):
+        response = patient_client.get('/api/rendezvous/creneaux_disponibles/', {
+            'medecin_id': medecin.id, 'date': (jour_travail + timedelta(days=1)).isoformat()
+        })
+
+        assert response.status_code == 200
+        assert response.data['slots'] == []
+        assert 'message' in response.data
+
+    def test_multi_doctor_search_uses_fixed_queries(
+        self, patient_client, medecin, patient_user, jour_travail, django_assert_max_num_queries
+    ):
+        medecin.specialite = 'Cardiologie'
+        medecin.save()
+        for i in range(3):
+            autre = User.objects.create_user(username=f'dr_multi_{i}', password='Test123!', role='medecin').medecin
+            autre.specialite = 'Cardiologie'
+            autre.save()
+            DisponibiliteMedecin.objects.create(
+                medecin=autre, jour=jour_semaine(jour_travail),
+                heure_debut=time(14, 0), heure_fin=time(16, 0), duree_consultation=60
+            )
+        RendezVous.objects.create(
+            patient=patient_user, medecin=medecin.user,
+            date=jour_travail, heure=time(9, 0), statut='CONFIRMED'
+        )
+
+        # Médecins, disponibilités, indisponibilités, rendez-vous
+        with django_assert_max_num_queries(4):
+            response = patient_client.get('/api/rendezvous/creneaux_disponibles_multi/', {
+                'specialite': 'cardiologie',
+                'date_debut': jour_travail.isoformat(),
+                'date_fin': (jour_travail + timedelta(days=6)).isoformat(),
+            })
+
+        assert response.status_code == 200
+        assert len(response.data['medecins']) == 4
+        premier = response.data['medecins'][0]
+        assert premier['medecin_id'] == medecin.id
+        assert premier['jours'] == [{'date': jour_travail.isoformat(), 'slots': ['10:00', '11:00']}]
+
+    def test_next_slots_bounded_search(
+        self, api_client, medecin, patient_user, jour_travail, django_assert_max_num_queries
+    ):
+        RendezVous.objects.create(
+            patient=patient_user, medecin=medecin.user,
+            date=jour_travail, heure=time(9, 0), statut='PENDING'
+        )
+
+        # Médecin, planning, indisponibilités, rendez-vous
+        with django_assert_max_num_queries(4):
+            response = api_client.get(
+                f'/api/medecins/{medecin.user_id}/prochains-creneaux/', {'limit': 2, 'horizon': 14}
+            )
+
+        assert response.status_code == 200
+        assert [(c['date'], c['heure']) for c in response.json()] == [
+            (jour_travail.isoformat(), '10:00:00'),
+            (jour_travail.isoformat(), '11:00:00'),
+        ]
+        assert response.json()[0]['duree'] == 60
@@ -0,0 +1,49 @@
+import importlib.util
+import os
+import pytest
+from unittest import mock
+from django.conf import settings
+
+
+def charger_settings(**environ):
+    """Exécute settings.py avec les variables d'environnement données"""
+    chemin = os.path.join(settings.BASE_DIR, 'Sante_Virtuelle', 'settings.py')
+    spec = importlib.util.spec_from_file_location('settings_couche_canaux', chemin)
+    module = importlib.util.module_from_spec(spec)
+    with mock.patch.dict(os.environ, environ):
+        spec.loader.exec_module(module)
+    return module
+
+
+class TestRealChannelLayer:
+    """Choix de la couche de canaux (WebSocket) selon CHANNEL_REDIS_URL"""
+
+    ENVIRON = {
+        'CHANNEL_REDIS_URL': 'redis://redis-1:6379/0, redis://redis-2:6379/0',
+        'CHANNEL_LAYER_PREFIX': 'sante',
+        'CHANNEL_LAYER_CAPACITY': '300',
+        'CHANNEL_LAYER_EXPIRY': '30',
+    }
+
+    def test_redis_url_selects_sharded_redis_layer(self):
+        couche = charger_settings(**self.ENVIRON).CHANNEL_LAYERS['default']
+
+        assert couche['BACKEND'] == 'channels_redis.core.RedisChannelLayer'
+        config = couche['CONFIG']
+        assert config['hosts'] == ['redis://redis-1:6379/0', 'redis://redis-2:6379/0']
+        assert (config['prefix'], config['capacity'], config['expiry']) == ('sante', 300, 30)
+
+    def test_without_redis_url_layer_stays_in_memory(self):
+        environ = {cle: '' for cle in self.ENVIRON}
+        couche = charger_settings(**environ).CHANNEL_LAYERS['default']
+
+        assert couche == {'BACKEND': 'channels.layers.InMemoryChannelLayer'}
+
+    def test_redis_layer_accepts_the_configuration(self):
+        core = pytest.importorskip('channels_redis.core')
+        config = charger_settings(**self.ENVIRON).CHANNEL_LAYERS['default']['CONFIG']
+
+        # Aucune connexion n'est ouverte à la construction
+        couche = core.RedisChannelLayer(**config)
+        assert (couche.prefix, couche.capacity, couche.expiry) == ('sante', 300, 30)
+        assert couche.ring_size == 2
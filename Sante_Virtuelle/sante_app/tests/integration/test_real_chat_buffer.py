@@ -0,0 +1,101 @@
+import asyncio
+import pytest
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+from sante_app.chat_buffer import TamponMessages
+from sante_app.models import User, Conversation, Message
+
+
+@pytest.fixture
+def conversations(db):
+    patient = User.objects.create_user(username='patient_chat', password='Test123!', role='patient')
+    medecin = User.objects.create_user(username='dr_chat', password='Test123!', role='medecin')
+    resultat = []
+    for sujet in ('Suivi', 'Résultats'):
+        conversation = Conversation.objects.create(subject=sujet)
+        conversation.participants.add(patient, medecin)
+        resultat.append(conversation)
+    return patient, resultat
+
+
+def envoyer(tampon, messages):
+    @async_to_sync
+    async def tout_envoyer():
+        return await asyncio.gather(*(tampon.ajouter(**champs) for champs in messages))
+    return tout_envoyer()
+
+
+class TestRealChatBuffer:
+    """Écriture groupée des messages de chat"""
+
+    def test_burst_is_written_in_one_insert_and_one_update(self, conversations):
+        patient, (suivi, resultats) = conversations
+        tampon = TamponMessages(Message, champ_conversation='conversation', delai=5)
+        messages = [
+            {'conversation_id': conv.pk, 'sender_id': patient.pk, 'content': f'Message {i}'}
+            for i in range(20) for conv in (suivi, resultats)
+        ]
+
+        with CaptureQueriesContext(connection) as requetes:
+            enregistres = envoyer(tampon, messages)
+
+        instructions = [q['sql'].split()[0] for q in requetes.captured_queries]
+        assert [i for i in instructions if i not in ('SAVEPOINT', 'RELEASE')] == ['INSERT', 'UPDATE']
+        # Chaque appelant reçoit son message enregistré, dans l'ordre d'envoi
+        assert [m.content for m in enregistres] == [m['content'] for m in messages]
+        assert all(m.pk for m in enregistres)
+        for conversation in (suivi, resultats):
+            conversation.refresh_from_db()
+            dernier = Message.objects.filter(conversation=conversation).latest('timestamp')
+            assert conversation.updated_at == dernier.timestamp
+
+    def test_full_buffer_is_flushed_without_waiting(self, conversations):
+        patient, (suivi, _) = conversations
+        tampon = TamponMessages(Message, champ_conversation='conversation', delai=60_000, taille_max=5)
+
+        with mock.patch.object(Message.objects, 'bulk_create', wraps=Message.objects.bulk_create) as ecrire:
+            envoyer(tampon, [
+                {'conversation_id': suivi.pk, 'sender_id': patient.pk, 'content': str(i)} for i in range(10)
+            ])
+
+        assert ecrire.call_count == 2
+        assert Message.objects.count() == 10
+
+    def test_failed_batch_is_reported_to_every_sender(self, conversations):
+        patient, (suivi, _) = conversations
+        tampon = TamponMessages(Message, champ_conversation='conversation', delai=1)
+
+        with mock.patch.object(Message.objects, 'bulk_create', side_effect=RuntimeError('base indisponible')):
+            @async_to_sync
+            async def tout_envoyer():
+                return await asyncio.gather(
+                    *(tampon.ajouter(conversation_id=suivi.pk, sender_id=patient.pk, content='x') for _ in range(3)),
+                    return_exceptions=True,
+                )
+            resultats = tout_envoyer()
+
+        assert all(isinstance(r, RuntimeError) for r in resultats)
+        assert not Message.objects.exists()
+
+    def test_bad_message_does_not_reject_the_others(self, conversations):
+        patient, (suivi, resultats) = conversations
+        tampon = TamponMessages(Message, champ_conversation='conversation', delai=1)
+
+        @async_to_sync
+        async def tout_envoyer():
+            return await asyncio.gather(
+                tampon.ajouter(conversation_id=suivi.pk, sender_id=patient.pk, content='Bonjour'),
+                # Contenu NULL : refusé par la base, fait échouer le lot
+                tampon.ajouter(conversation_id=suivi.pk, sender_id=patient.pk, content=None),
+                tampon.ajouter(conversation_id=resultats.pk, sender_id=patient.pk, content='Merci'),
+                return_exceptions=True,
+            )
+        bonjour, rejete, merci = tout_envoyer()
+
+        assert isinstance(rejete, IntegrityError)
+        assert bonjour.pk and merci.pk
+        assert sorted(Message.objects.values_list('content', flat=True)) == ['Bonjour', 'Merci']
+        suivi.refresh_from_db()
+        assert suivi.updated_at == Message.objects.get(content='Bonjour').timestamp
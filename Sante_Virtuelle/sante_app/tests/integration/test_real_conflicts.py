@@ -0,0 +1,125 @@
+import pytest
+from datetime import date, time, timedelta
+from unittest import mock
+from django.db import IntegrityError, transaction
+from sante_app.models import User, RendezVous, DisponibiliteMedecin
+from sante_app.availability import jour_semaine
+from sante_app.conflicts import PlanningJournee, trouver_conflit
+
+
+@pytest.fixture
+def medecin(db):
+    return User.objects.create_user(username='dr_conflit', password='Test123!', role='medecin').medecin
+
+
+@pytest.fixture
+def patient_user(db):
+    return User.objects.create_user(username='patient_conflit', password='Test123!', role='patient')
+
+
+@pytest.fixture
+def jour_rdv(medecin):
+    jour = date.today() + timedelta(days=3)
+    DisponibiliteMedecin.objects.create(
+        medecin=medecin, jour=jour_semaine(jour),
+        heure_debut=time(8, 0), heure_fin=time(18, 0), duree_consultation=45
+    )
+    return jour
+
+
+class TestRealConflicts:
+    """Tests du détecteur de conflits de rendez-vous"""
+
+    def test_overlap_uses_day_duration(self, medecin, patient_user, jour_rdv):
+        rdv = RendezVous.objects.create(
+            patient=patient_user, medecin=medecin.user,
+            date=jour_rdv, heure=time(10, 0), statut='CONFIRMED'
+        )
+
+        assert trouver_conflit(medecin.user_id, jour_rdv, time(10, 30)) == rdv
+        assert trouver_conflit(medecin.user_id, jour_rdv, '09:30') == rdv
+        assert trouver_conflit(medecin.user_id, jour_rdv, time(10, 45)) is None
+        assert trouver_conflit(medecin.user_id, jour_rdv, time(9, 15)) is None
+        assert trouver_conflit(medecin.user_id, jour_rdv, time(10, 0), exclude_rdv_id=rdv.pk) is None
+
+    def test_cancelled_appointments_are_ignored(self, medecin, patient_user, jour_rdv):
+        RendezVous.objects.create(
+            patient=patient_user, medecin=medecin.user,
+            date=jour_rdv, heure=time(10, 0), statut='CANCELLED'
+        )
+
+        assert trouver_conflit(medecin.user_id, jour_rdv, time(10, 0)) is None
+
+    def test_day_is_loaded_in_two_queries(
+        self, medecin, patient_user, jour_rdv, django_assert_num_queries
+    ):
+        for heure in (time(8, 0), time(9, 30), time(14, 0)):
+            RendezVous.objects.create(
+                patient=patient_user, medecin=medecin.user,
+                date=jour_rdv, heure=heure, statut='PENDING'
+            )
+
+        with django_assert_num_queries(2):
+            planning = PlanningJournee.charger(medecin.user_id, jour_rdv)
+            assert planning.conflit(time(8, 30)) is not None
+            assert planning.conflit(time(13, 15)) is None
+
+    def test_doctor_reschedule_rejects_overlapping_slot(
+        self, api_client, medecin, patient_user, jour_rdv
+    ):
+        RendezVous.objects.create(
+            patient=patient_user, medecin=medecin.user,
+            date=jour_rdv, heure=time(10, 0), statut='CONFIRMED'
+        )
+        rdv = RendezVous.objects.create(
+            patient=patient_user, medecin=medecin.user,
+            date=jour_rdv, heure=time(15, 0), statut='CONFIRMED'
+        )
+        api_client.force_authenticate(user=medecin.user)
+
+        response = api_client.post(
+            f'/api/appointments/{rdv.pk}/doctor-reschedule/',
+            {'date': jour_rdv.isoformat(), 'heure': '10:15'},
+            format='json'
+        )
+
+        assert response.status_code == 400
+        rdv.refresh_from_db()
+        assert rdv.heure == time(15, 0)
+
+    def test_slot_constraint_allows_only_one_active_booking(self, medecin, patient_user, jour_rdv):
+        RendezVous.objects.create(
+            patient=patient_user, medecin=medecin.user,
+            date=jour_rdv, heure=time(11, 0), statut='CANCELLED'
+        )
+        RendezVous.objects.create(
+            patient=patient_user, medecin=medecin.user,
+            date=jour_rdv, heure=time(11, 0), statut='PENDING'
+        )
+
+        with pytest.raises(IntegrityError), transaction.atomic():
+            RendezVous.objects.create(
+                patient=patient_user, medecin=medecin.user,
+                date=jour_rdv, heure=time(11, 0), statut='CONFIRMED'
+            )
+
+    def test_concurrent_booking_loses_deterministically(
+        self, api_client, medecin, patient_user, jour_rdv
+    ):
+        RendezVous.objects.create(
+            patient=patient_user, medecin=medecin.user,
+            date=jour_rdv, heure=time(11, 0), statut='PENDING'
+        )
+        api_client.force_authenticate(user=patient_user)
+
+        # Simule une requête concurrente qui a passé la vérification applicative
+        with mock.patch('sante_app.serializers.check_appointment_conflict', return_value=(False, None)):
+            response = api_client.post('/api/rendezvous/', {
+                'medecin_id': medecin.user_id,
+                'date': jour_rdv.isoformat(),
+                'heure': '11:00',
+            }, format='json')
+
+        assert response.status_code == 400
+        assert 'heure' in response.data
+        assert RendezVous.objects.filter(medecin=medecin.user, date=jour_rdv, heure=time(11, 0)).count() == 1
@@ -0,0 +1,120 @@
+import gzip
+import json
+import pytest
+from io import StringIO
+from django.core.management import call_command
+from django.core.cache import cache
+from sante_app import etablissements, geo
+from sante_app.models import Hopital, Clinique, Pharmacie, EtablissementSante
+
+
+@pytest.fixture(autouse=True)
+def vider_cache():
+    cache.clear()
+    geo.reinitialiser()
+    yield
+    cache.clear()
+    geo.reinitialiser()
+
+
+@pytest.fixture
+def centres(db):
+    return [
+        Hopital.objects.create(nom='Hôpital Principal', adresse='Dakar', latitude=14.6600, longitude=-17.4380),
+        Clinique.objects.create(nom='Clinique du Cap', adresse='Dakar', latitude=14.6650, longitude=-17.4400),
+        Pharmacie.objects.create(nom='Pharmacie sans adresse GPS', adresse='Rufisque'),
+    ]
+
+
+def lire_flux(response):
+    return json.loads(response.content)
+
+
+class TestRealFacilitiesFeed:
+    """Vue de lecture unifiée des centres et flux GeoJSON versionné par ETag"""
+
+    def test_read_model_follows_source_tables(self, centres, django_capture_on_commit_callbacks):
+        hopital, clinique, _ = centres
+        assert set(EtablissementSante.objects.values_list('type', 'source_id')) == {
+            ('hopital', hopital.pk), ('clinique', clinique.pk), ('pharmacie', centres[2].pk)
+        }
+
+        with django_capture_on_commit_callbacks(execute=True):
+            hopital.nom = 'HPD'
+            hopital.save()
+            clinique.delete()
+
+        assert list(EtablissementSante.objects.values_list('nom', flat=True).order_by('nom')) == [
+            'HPD', 'Pharmacie sans adresse GPS'
+        ]
+
+        Hopital.objects.filter(pk=hopital.pk).update(nom='Hôpital Principal de Dakar')
+        assert etablissements.reconstruire() == 2
+        assert EtablissementSante.objects.get(type='hopital').nom == 'Hôpital Principal de Dakar'
+
+    def test_map_list_is_one_query(self, api_client, centres, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            response = api_client.get('/api/health-facilities/')
+
+        assert response.status_code == 200
+        assert {c['id'] for c in response.data} == {
+            f'hopital_{centres[0].pk}', f'clinique_{centres[1].pk}', f'pharmacie_{centres[2].pk}'
+        }
+
+    def test_geojson_feed_revalidates_with_etag(self, client, centres, django_assert_num_queries):
+        response = client.get('/api/health-facilities/geojson/')
+
+        assert response.status_code == 200
+        assert response['Content-Type'] == 'application/geo+json'
+        assert 'no-cache' in response['Cache-Control']
+        flux = lire_flux(response)
+        assert flux['type'] == 'FeatureCollection'
+        # Seuls les centres localisés ; coordonnées GeoJSON en [longitude, latitude]
+        assert [f['properties']['nom'] for f in flux['features']] == ['Clinique du Cap', 'Hôpital Principal']
+        assert flux['features'][1]['geometry'] == {'type': 'Point', 'coordinates': [-17.438, 14.66]}
+
+        with django_assert_num_queries(0):
+            revalidation = client.get('/api/health-facilities/geojson/', HTTP_IF_NONE_MATCH=response['ETag'])
+        assert revalidation.status_code == 304
+        assert revalidation.content == b''
+
+    def test_geojson_feed_is_served_gzipped(self, client, centres):
+        brut = client.get('/api/health-facilities/geojson/')
+        compresse = client.get('/api/health-facilities/geojson/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        assert compresse['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in compresse['Vary']
+        assert json.loads(gzip.decompress(compresse.content)) == lire_flux(brut)
+        assert compresse['ETag'] != brut['ETag']
+
+    @pytest.mark.parametrize('accept_encoding, compresse', [
+        ('gzip;q=0, deflate', False),
+        ('deflate, GZIP ; q=0.5', True),
+        ('*', True),
+        ('*, gzip;q=0', False),
+        ('gzipped', False),
+    ])
+    def test_gzip_follows_quality_values(self, client, centres, accept_encoding, compresse):
+        response = client.get('/api/health-facilities/geojson/', HTTP_ACCEPT_ENCODING=accept_encoding)
+
+        assert (response.get('Content-Encoding') == 'gzip') is compresse
+
+    def test_rebuild_command(self, centres):
+        Hopital.objects.filter(pk=centres[0].pk).update(nom='Hôpital Principal de Dakar')
+        out = StringIO()
+
+        call_command('reconstruire_etablissements', stdout=out)
+
+        assert EtablissementSante.objects.get(type='hopital').nom == 'Hôpital Principal de Dakar'
+        assert '3 centre(s)' in out.getvalue()
+
+    def test_etag_changes_when_a_facility_changes(self, client, centres, django_capture_on_commit_callbacks):
+        etag = client.get('/api/health-facilities/geojson/')['ETag']
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Pharmacie.objects.create(nom='Pharmacie Sandaga', adresse='Dakar', latitude=14.6720, longitude=-17.4370)
+
+        response = client.get('/api/health-facilities/geojson/', HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response['ETag'] != etag
+        assert 'Pharmacie Sandaga' in [f['properties']['nom'] for f in lire_flux(response)['features']]
@@ -0,0 +1,121 @@
+import random
+import pytest
+from sante_app import geo
+from sante_app.models import Hopital, Pharmacie, Dentiste
+
+
+@pytest.fixture(autouse=True)
+def grille_neuve():
+    geo.reinitialiser()
+    yield
+    geo.reinitialiser()
+
+
+@pytest.fixture
+def centres(db):
+    return {
+        'plateau': Hopital.objects.create(nom='Hôpital du Plateau', adresse='Dakar', latitude=14.6700, longitude=-17.4300),
+        'medina': Pharmacie.objects.create(nom='Pharmacie Médina', adresse='Dakar', latitude=14.6850, longitude=-17.4450),
+        'pikine': Dentiste.objects.create(nom='Cabinet Pikine', adresse='Pikine', latitude=14.7550, longitude=-17.3900),
+        'thies': Hopital.objects.create(nom='Hôpital de Thiès', adresse='Thiès', latitude=14.7910, longitude=-16.9256),
+    }
+
+
+def brute_force(points, lat, lng, rayon):
+    return sorted(
+        (geo.haversine(lat, lng, p['latitude'], p['longitude']), p['id']) for p in points
+        if geo.haversine(lat, lng, p['latitude'], p['longitude']) <= rayon
+    )
+
+
+class TestRealGeo:
+    """Recherche de proximité : grille en mémoire, boîte englobante SQL, k plus proches"""
+
+    def test_grid_matches_brute_force(self):
+        hasard = random.Random(42)
+        points = [
+            {'id': str(i), 'type': hasard.choice(geo.TYPES),
+             'latitude': 14.7 + hasard.uniform(-0.5, 0.5), 'longitude': -17.4 + hasard.uniform(-0.5, 0.5)}
+            for i in range(3000)
+        ]
+        grille = geo.Grille(points)
+
+        for rayon in (0.5, 3, 25):
+            resultats = grille.proches(14.7, -17.4, rayon=rayon)
+            assert [(round(d, 9), p['id']) for p, d in resultats] == [
+                (round(d, 9), i) for d, i in brute_force(points, 14.7, -17.4, rayon)
+            ]
+
+        cinq = grille.proches(14.7, -17.4, k=5, types={'pharmacie'})
+        attendus = brute_force([p for p in points if p['type'] == 'pharmacie'], 14.7, -17.4, 1000)[:5]
+        assert [p['id'] for p, _ in cinq] == [i for _, i in attendus]
+
+    def test_nearby_endpoint_sorted_and_filtered(self, api_client, centres, django_assert_num_queries):
+        response = api_client.get('/api/health-facilities/nearby/', {'lat': 14.68, 'lng': -17.44, 'radius': 15})
+
+        assert response.status_code == 200
+        assert [c['nom'] for c in response.data] == ['Pharmacie Médina', 'Hôpital du Plateau', 'Cabinet Pikine']
+        assert response.data[0]['distance'] < response.data[1]['distance']
+
+        # Grille construite : plus aucune requête SQL
+        with django_assert_num_queries(0):
+            response = api_client.get(
+                '/api/health-facilities/nearby/', {'lat': 14.68, 'lng': -17.44, 'radius': 15, 'type': 'hopital'}
+            )
+        assert [c['id'] for c in response.data] == [f"hopital_{centres['plateau'].pk}"]
+
+    def test_k_nearest_and_paging(self, api_client, centres):
+        plus_proches = api_client.get('/api/health-facilities/nearby/', {'lat': 14.79, 'lng': -16.93, 'k': 2})
+        assert [c['nom'] for c in plus_proches.data] == ['Hôpital de Thiès', 'Cabinet Pikine']
+
+        page = api_client.get(
+            '/api/health-facilities/nearby/', {'lat': 14.68, 'lng': -17.44, 'radius': 100, 'page_size': 3, 'page': 2}
+        )
+        assert page.data['count'] == 4
+        assert [c['nom'] for c in page.data['results']] == ['Hôpital de Thiès']
+
+        assert api_client.get('/api/health-facilities/nearby/', {'type': 'veterinaire'}).status_code == 400
+
+    @pytest.mark.parametrize('parametres', [
+        {'lat': 'nan', 'lng': -17.44},
+        {'lat': 14.68, 'lng': 'inf'},
+        {'lat': '1e308', 'lng': -17.44},
+        {'lat': 91, 'lng': -17.44},
+        {'lat': 14.68, 'lng': -181},
+        {'lat': 14.68, 'lng': -17.44, 'radius': -1},
+        {'lat': 14.68, 'lng': -17.44, 'radius': 'inf'},
+    ])
+    def test_invalid_position_is_rejected(self, api_client, centres, parametres):
+        assert api_client.get('/api/health-facilities/nearby/', parametres).status_code == 400
+
+    def test_grid_rebuilt_after_facility_change(self, api_client, centres, django_capture_on_commit_callbacks):
+        parametres = {'lat': 14.68, 'lng': -17.44, 'radius': 5}
+        assert len(api_client.get('/api/health-facilities/nearby/', parametres).data) == 2
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Pharmacie.objects.create(nom='Pharmacie Sandaga', adresse='Dakar', latitude=14.6720, longitude=-17.4370)
+            centres['medina'].delete()
+
+        noms = [c['nom'] for c in api_client.get('/api/health-facilities/nearby/', parametres).data]
+        assert noms == ['Pharmacie Sandaga', 'Hôpital du Plateau']
+
+    def test_grid_follows_changes_made_by_other_workers(self, api_client, centres, settings):
+        parametres = {'lat': 14.68, 'lng': -17.44, 'radius': 5}
+        assert len(api_client.get('/api/health-facilities/nearby/', parametres).data) == 2
+
+        # Écriture d'un autre worker : aucun on_commit de ce processus ne s'exécute
+        Pharmacie.objects.create(nom='Pharmacie Sandaga', adresse='Dakar', latitude=14.6720, longitude=-17.4370)
+        assert len(api_client.get('/api/health-facilities/nearby/', parametres).data) == 2
+
+        # Intervalle écoulé : la version lue en base a changé, la grille est reconstruite
+        settings.GEO_GRID_CHECK_INTERVAL = 0
+        noms = [c['nom'] for c in api_client.get('/api/health-facilities/nearby/', parametres).data]
+        assert noms == ['Pharmacie Médina', 'Pharmacie Sandaga', 'Hôpital du Plateau']
+
+    def test_database_bounding_box_engine(self, centres, settings):
+        settings.GEO_INDEX = 'base'
+
+        assert [c['nom'] for c, _ in geo.proches(14.68, -17.44, rayon=15)] == [
+            'Pharmacie Médina', 'Hôpital du Plateau', 'Cabinet Pikine'
+        ]
+        assert [c['nom'] for c, _ in geo.proches(14.68, -17.44, k=1, types={'hopital'})] == ['Hôpital du Plateau']
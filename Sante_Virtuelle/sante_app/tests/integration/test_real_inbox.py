@@ -0,0 +1,67 @@
+import pytest
+from sante_app.models import User, Conversation, Message
+
+
+@pytest.fixture
+def medecin(db):
+    return User.objects.create_user(
+        username='dr_inbox', password='Test123!', role='medecin', first_name='Khady', last_name='Fall'
+    )
+
+
+def creer_conversations(medecin, nombre):
+    conversations = []
+    for i in range(nombre):
+        patient = User.objects.create_user(
+            username=f'patient_inbox_{i}', password='Test123!', role='patient',
+            first_name='Patient', last_name=str(i)
+        )
+        conversation = Conversation.objects.create(subject=f'Sujet {i}')
+        conversation.participants.add(medecin, patient)
+        Message.objects.create(conversation=conversation, sender=patient, content=f'Question {i}')
+        Message.objects.create(conversation=conversation, sender=patient, content=f'Relance {i}')
+        Message.objects.create(conversation=conversation, sender=medecin, content=f'Réponse {i}')
+        conversations.append(conversation)
+    return conversations
+
+
+class TestRealInbox:
+    """Boîte de réception en un nombre constant de requêtes"""
+
+    def test_inbox_fields_are_annotated(self, api_client, medecin):
+        conversation, = creer_conversations(medecin, 1)
+        patient = conversation.participants.exclude(pk=medecin.pk).get()
+
+        api_client.force_authenticate(user=medecin)
+        donnees, = api_client.get('/api/messages/conversations/').json()
+        assert donnees['last_message'] == 'Réponse 0'
+        assert donnees['unread_count'] == 2
+        assert donnees['patient_name'] == 'Patient 0'
+
+        api_client.force_authenticate(user=patient)
+        donnees, = api_client.get('/api/messages/conversations/').json()
+        assert donnees['unread_count'] == 1
+        assert donnees['recipient_name'] == 'Dr. Khady Fall'
+
+    def test_query_count_does_not_grow_with_conversations(
+        self, api_client, medecin, django_assert_num_queries
+    ):
+        creer_conversations(medecin, 12)
+        api_client.force_authenticate(user=medecin)
+
+        # Conversations annotées + participants préchargés
+        with django_assert_num_queries(2):
+            response = api_client.get('/api/messages/conversations/')
+        assert len(response.json()) == 12
+
+    def test_inbox_is_cursor_paginated(self, api_client, medecin):
+        creer_conversations(medecin, 5)
+        api_client.force_authenticate(user=medecin)
+
+        premiere = api_client.get('/api/messages/inbox/', {'limit': 3}).json()
+        suivante = api_client.get(premiere['next']).json()
+
+        sujets = [c['subject'] for c in premiere['results'] + suivante['results']]
+        assert len(premiere['results']) == 3
+        assert sorted(sujets) == [f'Sujet {i}' for i in range(5)]
+        assert suivante['next'] is None
@@ -0,0 +1,37 @@
+import pytest
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from sante_app.management.commands import audit_indexes
+from sante_app.models import Urgence
+
+
+class TestRealIndexAudit:
+    """Les requêtes de référence passent par leurs index (EXPLAIN)"""
+
+    def test_reference_queries_use_their_indexes(self, db):
+        rapport = audit_indexes.auditer()
+
+        en_echec = [requete['nom'] for requete in rapport['requetes'] if requete['ok'] is False]
+        assert en_echec == []
+        assert rapport['absents'] == []
+
+    def test_unique_constraints_are_not_reported_unused(self, db):
+        rapport = audit_indexes.auditer()
+
+        assert 'unique_rappel_rdv_type' in audit_indexes.index_declares()
+        assert not set(rapport['inutilises']) & audit_indexes.contraintes_uniques()
+
+    def test_full_scan_is_reported(self, db):
+        requetes = [(
+            'Urgences par téléphone', Urgence.objects.filter(telephone_contact='770000000'),
+            ('urgence_statut_priorite_idx',), False,
+        )]
+
+        with mock.patch.object(audit_indexes, '_requetes_reference', return_value=requetes):
+            out = StringIO()
+            call_command('audit_indexes', stdout=out)
+
+        assert "⚠️ Urgences par téléphone" in out.getvalue()
+        assert 'plan : Urgence' in out.getvalue()
+        assert "1 requête(s) sans l'index attendu" in out.getvalue()
@@ -0,0 +1,65 @@
+import pytest
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from sante_app.models import User, RappelMedicament, HistoriquePriseMedicament, NotificationOutbox
+from sante_app.scheduler import MedicationReminderScheduler
+
+
+@pytest.fixture
+def patient(db):
+    return User.objects.create_user(
+        username='patient_rappel', password='Test123!', role='patient',
+        email='patient.rappel@example.com', first_name='Awa'
+    ).patient_profile
+
+
+def creer_rappel(patient, heure, **kwargs):
+    valeurs = dict(
+        patient=patient, medicament='Doliprane', dosage='1 comprimé',
+        frequence='1 fois par jour', heure_rappel=heure,
+        date_debut=timezone.localdate() - timedelta(days=1),
+    )
+    valeurs.update(kwargs)
+    return RappelMedicament.objects.create(**valeurs)
+
+
+def instant(heure):
+    return timezone.make_aware(datetime.combine(timezone.localdate(), heure))
+
+
+class TestRealMedicationDispatch:
+    """Envoi des rappels de médicaments par plage horaire indexée"""
+
+    def test_only_due_reminders_are_sent_once(self, patient):
+        du = creer_rappel(patient, time(8, 1))
+        creer_rappel(patient, time(8, 5))
+        creer_rappel(patient, time(8, 0), actif=False)
+        creer_rappel(patient, time(8, 0), date_fin=timezone.localdate() - timedelta(days=1))
+        planificateur = MedicationReminderScheduler()
+
+        assert planificateur.dispatch_medication_reminders(instant(time(8, 0, 30)))['envois'] == 1
+        assert list(HistoriquePriseMedicament.objects.values_list('rappel', flat=True)) == [du.pk]
+        assert NotificationOutbox.objects.get().destinataires == ['patient.rappel@example.com']
+
+        # La minute suivante, le rappel est déjà dans l'historique du jour
+        assert planificateur.dispatch_medication_reminders(instant(time(8, 1, 10)))['envois'] == 0
+        assert NotificationOutbox.objects.count() == 1
+
+    def test_window_wraps_around_midnight(self, patient):
+        creer_rappel(patient, time(0, 0))
+        creer_rappel(patient, time(23, 59))
+        creer_rappel(patient, time(12, 0))
+
+        dus = MedicationReminderScheduler().due_medication_reminders(instant(time(23, 59, 40)))
+
+        assert sorted(r.heure_rappel for r in dus) == [time(0, 0), time(23, 59)]
+
+    def test_dispatch_cost_does_not_depend_on_reminder_count(self, patient, django_assert_num_queries):
+        for minute in range(0, 60, 5):
+            creer_rappel(patient, time(10, minute))
+        creer_rappel(patient, time(9, 0))
+        creer_rappel(patient, time(9, 1))
+
+        # SELECT des rappels dus + INSERT historique + INSERT outbox (+ SAVEPOINT/RELEASE du test)
+        with django_assert_num_queries(5):
+            assert MedicationReminderScheduler().dispatch_medication_reminders(instant(time(9, 0)))['envois'] == 2
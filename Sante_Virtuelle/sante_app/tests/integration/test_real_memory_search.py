@@ -0,0 +1,155 @@
+import pytest
+from unittest import mock
+from django.core.management import call_command
+from sante_app import index_memoire, recherche
+from sante_app.models import User, Article, Medecin, ChatbotKnowledgeBase
+
+
+@pytest.fixture(autouse=True)
+def moteur_memoire(settings):
+    settings.SEARCH_BACKEND = 'memoire'
+    settings.SEARCH_INDEX_PATH = None
+    index_memoire.reinitialiser()
+    yield
+    index_memoire.reinitialiser()
+
+
+@pytest.fixture
+def auteur(db):
+    user = User.objects.create_user(
+        username='dr_memoire', password='Test123!', role='medecin',
+        first_name='Moussa', last_name='Diop'
+    )
+    user.medecin.specialite = 'Pédiatrie'
+    user.medecin.save()
+    return user.medecin
+
+
+def publier(auteur, titre, contenu, statut='valide'):
+    return Article.objects.create(titre=titre, contenu=contenu, auteur=auteur, statut=statut)
+
+
+class TestRealMemorySearch:
+    """Index inversé en mémoire : BM25, mises à jour par signaux, instantané mmap"""
+
+    def test_bm25_ranking_without_queries(self, auteur, django_assert_num_queries):
+        dans_contenu = publier(auteur, 'Conseils de saison', 'Le paludisme revient avec les pluies')
+        dans_titre = publier(auteur, 'Paludisme : les bons réflexes', 'Moustiquaire et consultation rapide')
+        publier(auteur, 'Sommeil', 'Bien dormir')
+        index = index_memoire.index()
+
+        with django_assert_num_queries(0):
+            resultats = index.rechercher(Article, 'paludisme')
+            # Tous les mots d'abord, sinon au moins un ; le dernier en préfixe
+            assert [pk for pk, _ in index.rechercher(Article, 'paludisme moustiq')] == [dans_titre.pk]
+            assert [pk for pk, _ in index.rechercher(Article, 'paludisme grossesse')] == [
+                dans_titre.pk, dans_contenu.pk
+            ]
+
+        assert [pk for pk, _ in resultats] == [dans_titre.pk, dans_contenu.pk]
+        assert resultats[0][1] > resultats[1][1]
+
+    def test_queryset_interface_matches_database_engines(self, auteur):
+        article = publier(auteur, 'Prévenir le diabète', "L'alimentation des diabétiques")
+        publier(auteur, 'Diabète : brouillon', 'Non publié', statut='brouillon')
+
+        valides = Article.objects.filter(statut='valide')
+        assert list(recherche.rechercher(valides, 'Diabétique')) == [article]
+        assert list(recherche.rechercher(Medecin.objects.all(), 'diop pediatre')) == [auteur]
+        assert not recherche.rechercher(valides, 'grossesse').exists()
+
+    @pytest.mark.parametrize('saisie', ['pedia', 'pediat', 'pediatri', 'pediatrie'])
+    def test_partial_word_matches_its_stem(self, auteur, saisie):
+        article = publier(auteur, 'La pédiatrie au quotidien', 'Consultation et suivi')
+        publier(auteur, 'Sommeil', 'Bien dormir')
+
+        assert [pk for pk, _ in index_memoire.index().rechercher(Article, saisie)] == [article.pk]
+        assert list(recherche.rechercher(Medecin.objects.all(), saisie)) == [auteur]
+
+    def test_signals_update_loaded_index_after_commit(
+        self, auteur, django_capture_on_commit_callbacks
+    ):
+        index_memoire.index()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            entree = ChatbotKnowledgeBase.objects.create(
+                keyword='fièvre', response='Consultez un médecin si la fièvre persiste', category='symptoms'
+            )
+            auteur.user.last_name = 'Sow'
+            auteur.user.save()
+        assert list(recherche.rechercher(ChatbotKnowledgeBase.objects.all(), 'fievre')) == [entree]
+        assert list(recherche.rechercher(Medecin.objects.all(), 'sow')) == [auteur]
+        assert not recherche.rechercher(Medecin.objects.all(), 'diop').exists()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            entree.delete()
+        assert index_memoire.index().rechercher(ChatbotKnowledgeBase, 'fievre') == []
+
+    def test_snapshot_is_reused_until_tables_change(self, auteur, settings, tmp_path):
+        article = publier(auteur, 'Vaccination des enfants', 'Calendrier vaccinal')
+        settings.SEARCH_INDEX_PATH = str(tmp_path / 'recherche.idx')
+        call_command('index_recherche')
+
+        attendu = index_memoire.IndexMemoire.charger(settings.SEARCH_INDEX_PATH).rechercher(Article, 'vaccin')
+        assert [pk for pk, _ in attendu] == [article.pk]
+
+        # Instantané à jour : repris tel quel (postings lus dans le fichier mappé)
+        index = index_memoire.index()
+        assert isinstance(index.collections['sante_app.Article'].postings['vaccin'][0], memoryview)
+        assert index.rechercher(Article, 'vaccin') == attendu
+
+        # Modification hors du processus : l'empreinte change, la collection est reconstruite
+        index_memoire.reinitialiser()
+        nouvel_article = publier(auteur, 'Vaccination adulte', 'Rappels')
+        index = index_memoire.index()
+        assert [pk for pk, _ in index.rechercher(Article, 'adulte')] == [nouvel_article.pk]
+
+    def test_snapshot_postings_are_copied_on_write(self, auteur, tmp_path):
+        publier(auteur, 'Hydratation', 'Boire pendant la chaleur')
+        chemin = str(tmp_path / 'recherche.idx')
+        index = index_memoire.IndexMemoire()
+        index.construire(Article)
+        index.sauvegarder(chemin)
+
+        relu = index_memoire.IndexMemoire.charger(chemin)
+        relu.mettre_a_jour(Article, 999, 'hydrat canicul')
+        relu.mettre_a_jour(Article, 998, 'chaleur')
+
+        assert {pk for pk, _ in relu.rechercher(Article, 'hydratation')} == {999, Article.objects.get().pk}
+        assert [pk for pk, _ in relu.rechercher(Article, 'canicule')] == [999]
+
+    def test_queryset_filters_apply_before_top_k(self, auteur, settings):
+        settings.SEARCH_MEMORY_MAX_RESULTS = 3
+        for i in range(5):
+            publier(auteur, f'Paludisme {i}', 'Paludisme et pluies', statut='brouillon')
+        valide = publier(auteur, 'Conseils', 'Le paludisme en saison sèche')
+
+        # Moins pertinent que les cinq brouillons, mais seul article valide
+        assert list(recherche.rechercher(Article.objects.filter(statut='valide'), 'paludisme')) == [valide]
+        assert valide not in recherche.rechercher(Article.objects.all(), 'paludisme')
+
+    def test_queryset_filters_read_only_candidate_rows(self, auteur, django_assert_num_queries):
+        valide = publier(auteur, 'Conseils', 'Le paludisme en saison sèche')
+        brouillon = publier(auteur, 'Paludisme', 'Brouillon', statut='brouillon')
+        for i in range(5):
+            publier(auteur, f'Sommeil {i}', 'Bien dormir')
+        index_memoire.index()
+
+        with mock.patch.object(index_memoire, 'TAILLE_LOT_FILTRE', 1):
+            with django_assert_num_queries(3) as requetes:
+                # Deux candidats, un lot chacun, puis le chargement des lignes retenues
+                assert list(recherche.rechercher(Article.objects.filter(statut='valide'), 'paludisme')) == [valide]
+        assert all(' IN (' in requete['sql'] for requete in requetes.captured_queries[:2])
+        assert brouillon not in recherche.rechercher(Article.objects.filter(statut='valide'), 'paludisme')
+
+    def test_snapshot_is_rebuilt_after_doctor_rename(self, auteur, settings, tmp_path):
+        settings.SEARCH_INDEX_PATH = str(tmp_path / 'recherche.idx')
+        call_command('index_recherche')
+
+        # Renommage sans changer le nombre de médecins ni le plus grand pk
+        auteur.user.last_name = 'Ndiaye'
+        auteur.user.save()
+        index_memoire.reinitialiser()
+
+        assert list(recherche.rechercher(Medecin.objects.all(), 'ndiaye')) == [auteur]
+        assert not recherche.rechercher(Medecin.objects.all(), 'diop').exists()
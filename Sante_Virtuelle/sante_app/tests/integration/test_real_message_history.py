@@ -0,0 +1,72 @@
+import pytest
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from sante_app.models import User, Conversation, Message
+
+
+@pytest.fixture
+def conversation(db):
+    patient = User.objects.create_user(username='patient_histo', password='Test123!', role='patient')
+    medecin = User.objects.create_user(username='dr_histo', password='Test123!', role='medecin')
+    conversation = Conversation.objects.create(subject='Suivi')
+    conversation.participants.add(patient, medecin)
+    return conversation, patient, medecin
+
+
+def ecrire(conversation, auteur, nombre):
+    return [
+        Message.objects.create(conversation=conversation, sender=auteur, content=f'Message {i}')
+        for i in range(nombre)
+    ]
+
+
+class TestRealMessageHistory:
+    """Historique paginé et accusés de lecture groupés"""
+
+    def test_history_is_paginated_with_cursors(self, api_client, conversation):
+        conversation, patient, medecin = conversation
+        messages = ecrire(conversation, patient, 7)
+        url = f'/api/messages/conversations/{conversation.pk}/messages/'
+        api_client.force_authenticate(user=medecin)
+
+        page = api_client.get(url, {'limit': 3}).json()
+        assert [m['id'] for m in page['results']] == [m.pk for m in messages[:-4:-1]]
+        assert page['has_more']
+
+        page = api_client.get(url, {'limit': 3, 'before': page['before']}).json()
+        assert [m['id'] for m in page['results']] == [m.pk for m in messages[3:0:-1]]
+
+        nouveaux = ecrire(conversation, patient, 2)
+        page = api_client.get(url, {'after': messages[-1].pk}).json()
+        assert [m['id'] for m in page['results']] == [m.pk for m in reversed(nouveaux)]
+        assert not page['has_more']
+
+    def test_read_receipts_are_a_single_update(self, api_client, conversation, django_assert_num_queries):
+        conversation, patient, medecin = conversation
+        ecrire(conversation, patient, 30)
+        ecrire(conversation, medecin, 2)
+        api_client.force_authenticate(user=medecin)
+
+        # Conversation, UPDATE des accusés, compteur du lecteur (SELECT + UPDATE),
+        # autres participants, page de messages (+ SAVEPOINT/RELEASE)
+        with django_assert_num_queries(8):
+            response = api_client.get(f'/api/messages/conversations/{conversation.pk}/messages/')
+
+        assert response.status_code == 200
+        assert not Message.objects.filter(sender=patient, is_read=False).exists()
+        assert Message.objects.filter(sender=medecin, is_read=False).count() == 2
+
+    def test_sender_is_notified_over_channel_layer(self, api_client, conversation):
+        conversation, patient, medecin = conversation
+        ecrire(conversation, patient, 2)
+        channel_layer = get_channel_layer()
+        canal = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(f'user_{patient.pk}', canal)
+
+        api_client.force_authenticate(user=medecin)
+        api_client.get(f'/api/messages/conversations/{conversation.pk}/messages/')
+
+        evenement = async_to_sync(channel_layer.receive)(canal)
+        assert evenement['type'] == 'messages_read'
+        assert evenement['conversation_id'] == conversation.pk
+        assert evenement['reader_id'] == medecin.pk
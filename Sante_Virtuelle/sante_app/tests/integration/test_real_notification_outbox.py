@@ -0,0 +1,136 @@
+import pytest
+from unittest import mock
+from django.core import mail
+from django.core.mail import get_connection
+from django.utils import timezone
+from sante_app import compteurs
+from sante_app.models import User, Medecin, NotificationOutbox, NotificationUrgence, Urgence
+from sante_app.notifications import NotificationService
+from sante_app.outbox import envoyer_lot, mettre_en_file_lot
+from sante_app.views import notifier_medecins_urgence
+
+
+@pytest.fixture
+def patient_user(db):
+    return User.objects.create_user(
+        username='patient_outbox', password='Test123!', role='patient',
+        email='patient.outbox@example.com', first_name='Fatou'
+    )
+
+
+class TestRealNotificationOutbox:
+    """Les emails passent par l'outbox avant d'être envoyés"""
+
+    def test_notification_is_queued_not_sent(self, patient_user):
+        NotificationService.send_welcome_email(patient_user)
+
+        assert len(mail.outbox) == 0
+        entree = NotificationOutbox.objects.get()
+        assert entree.destinataires == ['patient.outbox@example.com']
+        assert entree.statut == 'en_attente'
+
+    def test_worker_sends_queued_emails(self, patient_user):
+        NotificationService.send_welcome_email(patient_user)
+
+        resultat = envoyer_lot()
+
+        assert resultat['envoyes'] == 1
+        assert len(mail.outbox) == 1
+        assert mail.outbox[0].to == ['patient.outbox@example.com']
+        assert NotificationOutbox.objects.get().statut == 'envoye'
+
+    def test_failed_send_is_retried_with_backoff(self, patient_user, settings):
+        settings.NOTIFICATION_OUTBOX_MAX_ATTEMPTS = 2
+        NotificationService.send_welcome_email(patient_user)
+
+        with mock.patch('sante_app.outbox._envoyer', side_effect=OSError('SMTP indisponible')):
+            resultat = envoyer_lot()
+
+        entree = NotificationOutbox.objects.get()
+        assert resultat['echecs'] == 1
+        assert entree.statut == 'en_attente'
+        assert entree.tentatives == 1
+        assert entree.prochaine_tentative > timezone.now()
+        # Pas encore dû : le lot suivant ne le reprend pas
+        assert envoyer_lot()['lus'] == 0
+
+        NotificationOutbox.objects.update(prochaine_tentative=timezone.now())
+        with mock.patch('sante_app.outbox._envoyer', side_effect=OSError('SMTP indisponible')):
+            envoyer_lot()
+        assert NotificationOutbox.objects.get().statut == 'echec'
+
+    def test_batch_is_claimed_before_sending(self, patient_user):
+        NotificationService.send_welcome_email(patient_user)
+        vus = []
+
+        def envoyer(entree, connection):
+            # La réservation est déjà écrite : un autre worker ne reprend pas le message
+            vus.append(NotificationOutbox.objects.get(pk=entree.pk).statut)
+            assert envoyer_lot()['lus'] == 0
+
+        with mock.patch('sante_app.outbox._envoyer', side_effect=envoyer):
+            resultat = envoyer_lot()
+
+        assert vus == ['en_cours']
+        assert resultat['envoyes'] == 1
+        assert NotificationOutbox.objects.get().statut == 'envoye'
+
+    def test_crashed_worker_batch_is_resent_after_lease(self, patient_user):
+        NotificationService.send_welcome_email(patient_user)
+
+        with mock.patch('sante_app.outbox._envoyer', side_effect=KeyboardInterrupt):
+            with pytest.raises(KeyboardInterrupt):
+                envoyer_lot()
+
+        entree = NotificationOutbox.objects.get()
+        assert entree.statut == 'en_cours'
+        assert entree.prochaine_tentative > timezone.now()
+        assert envoyer_lot()['lus'] == 0
+
+        # Bail expiré : le message est repris
+        NotificationOutbox.objects.update(prochaine_tentative=timezone.now())
+        assert envoyer_lot()['envoyes'] == 1
+        assert len(mail.outbox) == 1
+        assert NotificationOutbox.objects.get().statut == 'envoye'
+
+    def test_batch_reuses_one_smtp_connection(self, db, settings):
+        settings.NOTIFICATION_MESSAGES_PER_CONNECTION = 10
+        mettre_en_file_lot([
+            ('Rappel', 'Message', 'noreply@example.com', [f'patient{i}@example.com'])
+            for i in range(25)
+        ])
+
+        with mock.patch('sante_app.outbox.get_connection', wraps=get_connection) as ouvrir:
+            resultat = envoyer_lot()
+
+        assert resultat['envoyes'] == 25
+        assert len(mail.outbox) == 25
+        # 25 messages, 10 par connexion : 3 connexions au lieu de 25
+        assert ouvrir.call_count == 3
+        assert resultat['connexions'] == 3
+
+    def test_urgence_fan_out_is_queued_in_bulk(self, patient_user, settings, django_assert_num_queries):
+        settings.URGENCE_MAX_MEDECINS_NOTIFIES = 0
+        for i in range(4):
+            medecin = User.objects.create_user(
+                username=f'dr_urgence_{i}', password='Test123!', role='medecin',
+                email=f'dr.urgence{i}@example.com'
+            ).medecin
+            medecin.disponibilite = i != 3
+            medecin.save()
+        urgence = Urgence.objects.create(
+            patient=patient_user.patient_profile, type_urgence='Douleur thoracique',
+            description='Douleur intense', symptomes='Douleur', telephone_contact='770000000'
+        )
+
+        for medecin in Medecin.objects.all():
+            compteurs.recompter(medecin.user_id)
+
+        # SELECT médecins, INSERT notifications, compteurs (SELECT + un seul UPDATE), INSERT outbox
+        # (+ SAVEPOINT/RELEASE du test)
+        with django_assert_num_queries(7):
+            notifier_medecins_urgence(urgence)
+
+        assert NotificationUrgence.objects.filter(urgence=urgence).count() == 3
+        assert NotificationOutbox.objects.count() == 3
+        assert not NotificationOutbox.objects.filter(destinataires=['dr.urgence3@example.com']).exists()
@@ -0,0 +1,79 @@
+import pytest
+import time
+from unittest import mock
+from django.core.cache import cache
+from sante_app import cache_public
+from sante_app.models import User, Pharmacie
+
+
+@pytest.fixture(autouse=True)
+def vider_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def utilisateurs(db):
+    User.objects.create_user(username='patient_public', password='Test123!', role='patient')
+    User.objects.create_user(username='dr_public', password='Test123!', role='medecin')
+
+
+def vieillir(nom, secondes):
+    """Fait comme si la valeur en cache avait été calculée il y a ``secondes``"""
+    valeur, calcule_le = cache.get(f'public:{nom}')
+    cache.set(f'public:{nom}', (valeur, calcule_le - secondes))
+
+
+class TestRealPublicCache:
+    """Endpoints anonymes servis en stale-while-revalidate"""
+
+    def test_homepage_hits_database_once_per_interval(
+        self, api_client, utilisateurs, django_assert_num_queries
+    ):
+        premiere = api_client.get('/api/statistics/public/')
+        assert premiere.status_code == 200
+        assert premiere.data['total_users'] == 2
+        assert premiere.data['total_doctors'] == 1
+        assert 'max-age=60' in premiere['Cache-Control']
+
+        with django_assert_num_queries(0):
+            for _ in range(20):
+                assert api_client.get('/api/statistics/public/').data == premiere.data
+
+    def test_stale_value_is_served_while_one_refresh_runs(self, api_client, utilisateurs):
+        api_client.get('/api/statistics/public/')
+        User.objects.create_user(username='nouveau_public', password='Test123!', role='patient')
+        vieillir('statistiques_publiques', 120)
+
+        with mock.patch('sante_app.cache_public._rafraichir_en_arriere_plan') as rafraichir:
+            reponses = [api_client.get('/api/statistics/public/') for _ in range(5)]
+
+        # La valeur périmée est servie sans attendre, un seul recalcul est lancé
+        assert all(reponse.data['total_users'] == 2 for reponse in reponses)
+        rafraichir.assert_called_once_with('statistiques_publiques')
+
+        cache_public.rafraichir('statistiques_publiques')
+        assert api_client.get('/api/statistics/public/').data['total_users'] == 3
+
+    def test_cold_cache_waits_for_running_computation(self, utilisateurs, settings, django_assert_num_queries):
+        settings.PUBLIC_CACHE_WAIT = 1
+        calcule = cache_public._SOURCES['statistiques_publiques']()
+        # Un autre processus a pris le verrou et publie sa valeur pendant l'attente
+        cache.add('public:statistiques_publiques:verrou', 1)
+
+        def publier(_):
+            cache.set('public:statistiques_publiques', (calcule, time.time()))
+
+        with mock.patch('sante_app.cache_public.time.sleep', side_effect=publier):
+            with django_assert_num_queries(0):
+                assert cache_public.lire('statistiques_publiques') == calcule
+
+    def test_scheduler_refreshes_only_requested_sources(self, api_client, db):
+        Pharmacie.objects.create(
+            nom='Pharmacie du Port', adresse='Dakar', latitude=14.67, longitude=-17.43
+        )
+        api_client.get('/api/health-facilities/')
+
+        assert cache_public.rafraichir_tout() == 1
+        assert cache.get('public:statistiques_publiques') is None
@@ -0,0 +1,57 @@
+import pytest
+from datetime import timedelta
+from unittest import mock
+from django.utils import timezone
+from sante_app.models import BailTache, ExecutionTache
+from sante_app.verrous import executer_tache, prendre_bail, purger_historique, rendre_bail
+
+
+class TestRealSchedulerCoordination:
+    """Une seule exécution par période, quel que soit le nombre de workers"""
+
+    def test_lease_is_exclusive_until_it_expires(self, db):
+        assert prendre_bail('rappels', timedelta(seconds=60), proprietaire='worker-1')
+        assert not prendre_bail('rappels', timedelta(seconds=60), proprietaire='worker-2')
+        # Le détenteur peut renouveler son bail
+        assert prendre_bail('rappels', timedelta(seconds=60), proprietaire='worker-1')
+
+        BailTache.objects.update(expire_le=timezone.now() - timedelta(seconds=1))
+        assert prendre_bail('rappels', timedelta(seconds=60), proprietaire='worker-2')
+        assert BailTache.objects.get().proprietaire == 'worker-2'
+
+    def test_released_lease_can_be_taken(self, db):
+        prendre_bail('outbox', timedelta(seconds=60), proprietaire='worker-1')
+        rendre_bail('outbox', proprietaire='worker-1')
+
+        assert prendre_bail('outbox', timedelta(seconds=60), proprietaire='worker-2')
+
+    def test_job_runs_once_per_period_and_records_metrics(self, db):
+        tache = mock.Mock(return_value={'lues': 12, 'envois': 3})
+
+        execution = executer_tache('rappels_rdv', tache, intervalle=300)
+        # Un autre worker (autre processus) tombe dans la même période
+        with mock.patch('sante_app.verrous.PROPRIETAIRE', 'autre-worker'):
+            assert executer_tache('rappels_rdv', tache, intervalle=300) is None
+
+        assert tache.call_count == 1
+        assert execution.statut == 'succes'
+        assert (execution.lignes_lues, execution.envois) == (12, 3)
+        assert ExecutionTache.objects.count() == 1
+
+    def test_failed_job_is_recorded(self, db):
+        execution = executer_tache('outbox', mock.Mock(side_effect=OSError('SMTP indisponible')), intervalle=15)
+
+        assert execution.statut == 'echec'
+        assert 'SMTP indisponible' in execution.erreur
+
+    def test_old_runs_are_purged(self, db, settings):
+        settings.SCHEDULER_HISTORY_DAYS = 14
+        maintenant = timezone.now()
+        for jours in (30, 15, 13, 0):
+            ExecutionTache.objects.create(
+                tache='outbox', proprietaire='w1', debut=maintenant - timedelta(days=jours), statut='succes'
+            )
+
+        assert purger_historique() == 2
+        assert sorted((maintenant - debut).days for debut in ExecutionTache.objects.values_list('debut', flat=True)) == [0, 13]
+        assert purger_historique() == 0
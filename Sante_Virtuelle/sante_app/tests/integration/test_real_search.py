@@ -0,0 +1,105 @@
+import pytest
+from rest_framework.test import APIRequestFactory
+from sante_app import recherche
+from sante_app.views import articles_publics
+from sante_app.models import User, Article, Medecin
+
+
+@pytest.fixture
+def auteur(db):
+    user = User.objects.create_user(
+        username='dr_recherche', password='Test123!', role='medecin',
+        first_name='Aïssatou', last_name='Ndiaye'
+    )
+    user.medecin.specialite = 'Cardiologie'
+    user.medecin.save()
+    return user.medecin
+
+
+def publier(auteur, titre, contenu, statut='valide', **champs):
+    return Article.objects.create(
+        titre=titre, contenu=contenu, resume=champs.pop('resume', ''), auteur=auteur, statut=statut, **champs
+    )
+
+
+class TestRealSearch:
+    """Recherche plein texte : document maintenu, racinisation, accents, classement"""
+
+    def test_terms_are_folded_and_stemmed(self):
+        assert recherche.termes('Les Vaccinations des enfants') == recherche.termes('vaccination enfant')
+        assert recherche.termes('diabète') == recherche.termes('DIABETIQUE')
+        assert recherche.termes('cardiologue') == recherche.termes('Cardiologie')
+
+    def test_document_follows_edits(self, auteur):
+        article = publier(auteur, 'Hypertension', 'Contenu')
+        assert 'hypertension' in article.document_recherche
+
+        article.titre = 'Paludisme'
+        article.save(update_fields=['titre'])
+
+        article.refresh_from_db()
+        assert recherche.termes('paludisme')[0] in article.document_recherche.split()
+        assert 'hypertension' not in article.document_recherche
+
+    def test_accents_stemming_and_prefix(self, auteur):
+        article = publier(auteur, 'Prévenir le diabète', "L'alimentation des diabétiques au quotidien")
+        publier(auteur, 'Sommeil', 'Bien dormir')
+
+        valides = Article.objects.filter(statut='valide')
+        assert list(recherche.rechercher(valides, 'diabete')) == [article]
+        assert list(recherche.rechercher(valides, 'Diabétique')) == [article]
+        # Saisie en cours : le dernier mot est cherché en préfixe
+        assert list(recherche.rechercher(valides, 'aliment')) == [article]
+        assert not recherche.rechercher(valides, 'grossesse').exists()
+
+    @pytest.mark.parametrize('saisie', ['cardio', 'cardiol', 'cardiolog', 'cardiologi', 'cardiologie'])
+    def test_partial_word_matches_its_stem(self, auteur, saisie):
+        article = publier(auteur, 'La cardiologie au quotidien', 'Consultation et suivi')
+        publier(auteur, 'Sommeil', 'Bien dormir')
+
+        valides = Article.objects.filter(statut='valide')
+        assert list(recherche.rechercher(valides, saisie)) == [article]
+        assert list(recherche.rechercher(valides, f'consultation {saisie}')) == [article]
+        assert list(recherche.RechercheSimple().filtrer(valides, saisie)) == [article]
+
+    def test_partial_word_does_not_match_unrelated_stems(self, auteur):
+        publier(auteur, 'La cardiologie au quotidien', 'Consultation et suivi')
+
+        assert not recherche.rechercher(Article.objects.all(), 'cardiaq').exists()
+
+    def test_title_match_ranks_first(self, auteur):
+        dans_contenu = publier(auteur, 'Conseils de saison', 'Le paludisme revient avec les pluies')
+        dans_titre = publier(auteur, 'Paludisme : les bons réflexes', 'Moustiquaire et consultation rapide')
+
+        resultats = list(recherche.rechercher(Article.objects.all(), 'paludisme'))
+
+        assert resultats == [dans_titre, dans_contenu]
+
+    def test_doctor_document_follows_user_name(self, auteur):
+        auteur.user.last_name = 'Sarr'
+        auteur.user.save()
+
+        assert list(recherche.rechercher(Medecin.objects.all(), 'sarr cardio')) == [auteur]
+        assert not recherche.rechercher(Medecin.objects.all(), 'ndiaye').exists()
+
+    def test_search_endpoint_uses_index(self, api_client, auteur, django_assert_max_num_queries):
+        publier(auteur, 'Vaccination des enfants', 'Calendrier vaccinal')
+        publier(auteur, 'Vaccination brouillon', 'Non publié', statut='brouillon')
+
+        with django_assert_max_num_queries(2):
+            response = api_client.get('/api/search/', {'q': 'vaccins'})
+
+        assert response.status_code == 200
+        assert [article['title'] for article in response.data['articles']] == ['Vaccination des enfants']
+        assert response.data['articles'][0]['author'] == 'Dr. Aïssatou Ndiaye'
+
+    def test_public_articles_search(self, auteur):
+        publier(auteur, 'Hydratation', 'Boire pendant la chaleur')
+        publier(auteur, 'Chaleur et personnes âgées', 'Canicule : hydratation et repos')
+
+        response = articles_publics(APIRequestFactory().get('/', {'search': 'hydratation'}))
+
+        assert response.status_code == 200
+        assert [article['titre'] for article in response.data['results']] == [
+            'Hydratation', 'Chaleur et personnes âgées'
+        ]
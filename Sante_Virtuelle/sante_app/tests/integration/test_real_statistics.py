@@ -0,0 +1,99 @@
+import pytest
+from datetime import date, time, timedelta
+from django.core.cache import cache
+from sante_app import statistiques
+from sante_app.models import User, RendezVous, Article, StatistiqueJournaliere
+
+
+@pytest.fixture(autouse=True)
+def vider_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def rendez_vous(db):
+    medecin = User.objects.create_user(username='dr_stats', password='Test123!', role='medecin')
+    patient = User.objects.create_user(username='patient_stats', password='Test123!', role='patient')
+    aujourd_hui = date.today()
+    for jours, heure, statut in [
+        (-40, 9, 'TERMINE'), (-10, 9, 'TERMINE'), (-3, 9, 'CANCELLED'),
+        (-1, 10, 'TERMINE'), (0, 11, 'CONFIRMED'), (2, 12, 'PENDING'),
+    ]:
+        RendezVous.objects.create(
+            patient=patient, medecin=medecin,
+            date=aujourd_hui + timedelta(days=jours), heure=time(heure, 0), statut=statut
+        )
+    return aujourd_hui
+
+
+class TestRealStatistics:
+    """Tableaux de bord admin calculés par agrégation conditionnelle"""
+
+    def test_appointment_dashboard_in_one_query(self, rendez_vous, django_assert_num_queries):
+        with django_assert_num_queries(1):
+            stats = statistiques.tableau_rendez_vous()
+
+        assert stats['total_appointments'] == 6
+        assert stats['today_appointments'] == 1
+        # Comme avant : date >= il y a 7 jours, rendez-vous à venir compris
+        assert stats['week_appointments'] == 4
+        assert stats['month_appointments'] == 5
+        assert stats['completed_appointments'] == 3
+        assert {'statut': 'CANCELLED', 'count': 1} in stats['appointments_by_status']
+        assert not any(ligne['statut'] == 'RESCHEDULED' for ligne in stats['appointments_by_status'])
+
+    def test_admin_endpoint_serves_cached_snapshot(self, api_client, rendez_vous, django_assert_num_queries):
+        admin = User.objects.create_user(username='admin_stats', password='Test123!', role='admin')
+        api_client.force_authenticate(user=admin)
+
+        premiere = api_client.get('/api/admin/statistics/')
+        assert premiere.status_code == 200
+        assert premiere.data['total_rendez_vous'] == 6
+        assert premiere.data['total_users'] == 3
+        assert premiere.data['total_medecins'] == 1
+
+        with django_assert_num_queries(0):
+            seconde = api_client.get('/api/admin/statistics/')
+        assert seconde.data == premiere.data
+
+    def test_non_admin_is_rejected(self, api_client, rendez_vous):
+        api_client.force_authenticate(user=User.objects.get(username='patient_stats'))
+
+        assert api_client.get('/api/admin/appointments/statistics/').status_code == 403
+
+    def test_daily_rollup_matches_live_counts(self, rendez_vous, settings, django_assert_num_queries):
+        en_direct = statistiques.agregats_rendez_vous()
+
+        assert statistiques.consolider_journees() == 4
+        assert StatistiqueJournaliere.objects.get(jour=rendez_vous - timedelta(days=1)).termines == 1
+
+        settings.STATISTICS_DAILY_ROLLUP = True
+        # Cumul des jours passés + comptage direct des jours non consolidés
+        with django_assert_num_queries(2):
+            assert statistiques.agregats_rendez_vous() == en_direct
+
+    def test_rollup_recomputes_recent_days(self, rendez_vous, settings):
+        settings.STATISTICS_DAILY_ROLLUP = True
+        statistiques.consolider_journees()
+        RendezVous.objects.filter(date=rendez_vous - timedelta(days=3)).update(statut='TERMINE')
+
+        statistiques.consolider_journees()
+
+        journee = StatistiqueJournaliere.objects.get(jour=rendez_vous - timedelta(days=3))
+        assert journee.annules == 0
+        assert journee.termines == 1
+        assert statistiques.agregats_rendez_vous()['termines'] == 4
+
+    def test_article_dashboard(self, db, django_assert_num_queries):
+        auteur = User.objects.create_user(username='dr_auteur_stats', password='Test123!', role='medecin').medecin
+        for titre, statut, vues in [('A', 'valide', 10), ('B', 'valide', 5), ('C', 'brouillon', 3)]:
+            Article.objects.create(titre=titre, contenu='Contenu', auteur=auteur, statut=statut, vues=vues)
+
+        with django_assert_num_queries(2):
+            stats = statistiques.tableau_articles()
+
+        assert stats['total'] == 3
+        assert stats['valides'] == 2
+        assert stats['total_vues'] == 15
@@ -0,0 +1,70 @@
+import pytest
+from datetime import date, time, timedelta
+from sante_app.models import User, RendezVous, Consultation, Teleconsultation
+
+
+@pytest.fixture
+def rendez_vous(db):
+    medecin = User.objects.create_user(username='dr_statut', password='Test123!', role='medecin')
+    patient = User.objects.create_user(username='patient_statut', password='Test123!', role='patient')
+    rdv = RendezVous.objects.create(
+        patient=patient, medecin=medecin,
+        date=date.today() + timedelta(days=2), heure=time(9, 0), statut='PENDING'
+    )
+    return RendezVous.objects.get(pk=rdv.pk)
+
+
+def creer_consultation(rdv):
+    return Consultation.objects.create(
+        date=rdv.date, heure=rdv.heure, rendez_vous=rdv,
+        patient=rdv.patient.patient_profile, medecin=rdv.medecin.medecin
+    )
+
+
+class TestRealStatusTransitions:
+    """Suivi des changements de statut sans relecture de la ligne"""
+
+    def test_save_does_not_refetch(self, rendez_vous, django_assert_num_queries):
+        rendez_vous.description = 'Contrôle'
+
+        # Un seul UPDATE, sans SELECT préalable
+        with django_assert_num_queries(1):
+            rendez_vous.save()
+
+    def test_reschedule_keeps_original_slot(self, rendez_vous):
+        rendez_vous.date = rendez_vous.date + timedelta(days=1)
+        rendez_vous.heure = time(11, 0)
+        rendez_vous.statut = 'RESCHEDULED'
+        rendez_vous.save()
+
+        rendez_vous.refresh_from_db()
+        assert rendez_vous.original_heure == time(9, 0)
+        assert rendez_vous.original_date == date.today() + timedelta(days=2)
+
+    def test_cancellation_cascades_with_single_updates(self, rendez_vous):
+        rendez_vous.statut = 'CONFIRMED'
+        rendez_vous.save()
+        consultation = creer_consultation(rendez_vous)
+        Teleconsultation.objects.create(consultation=consultation, channel_name='canal-statut')
+
+        rendez_vous = RendezVous.objects.get(pk=rendez_vous.pk)
+        rendez_vous.statut = 'CANCELLED'
+        rendez_vous.save()
+
+        consultation.refresh_from_db()
+        assert consultation.statut == 'annulee'
+        assert Teleconsultation.objects.get(consultation=consultation).ended_at is not None
+        # L'annulation n'est plus transformée en TERMINE par une cascade de save()
+        rendez_vous.refresh_from_db()
+        assert rendez_vous.statut == 'CANCELLED'
+
+    def test_consultation_status_updates_appointment(self, rendez_vous):
+        rendez_vous.statut = 'CONFIRMED'
+        rendez_vous.save()
+        consultation = creer_consultation(rendez_vous)
+
+        consultation.statut = 'terminee'
+        consultation.save()
+
+        rendez_vous.refresh_from_db()
+        assert rendez_vous.statut == 'TERMINE'
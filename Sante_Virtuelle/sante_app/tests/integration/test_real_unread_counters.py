@@ -0,0 +1,86 @@
+import pytest
+from unittest import mock
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from sante_app import compteurs
+from sante_app.models import User, Conversation, Message, Notification, CompteurNonLus
+
+
+@pytest.fixture
+def conversation(db):
+    patient = User.objects.create_user(username='patient_badge', password='Test123!', role='patient')
+    medecin = User.objects.create_user(username='dr_badge', password='Test123!', role='medecin')
+    conversation = Conversation.objects.create(subject='Badge')
+    conversation.participants.add(patient, medecin)
+    return conversation, patient, medecin
+
+
+class TestRealUnreadCounters:
+    """Compteurs de non-lus tenus à jour à l'écriture"""
+
+    def test_counters_follow_messages_and_reads(self, api_client, conversation):
+        conversation, patient, medecin = conversation
+        for i in range(3):
+            Message.objects.create(conversation=conversation, sender=patient, content=f'Question {i}')
+        Message.objects.create(conversation=conversation, sender=medecin, content='Réponse')
+
+        assert compteurs.lire(medecin.pk).messages == 3
+        assert compteurs.lire(patient.pk).messages == 1
+
+        api_client.force_authenticate(user=medecin)
+        api_client.get(f'/api/messages/conversations/{conversation.pk}/messages/')
+
+        assert api_client.get('/api/messages/unread-count/').json() == {'unread_count': 0}
+        assert compteurs.lire(patient.pk).messages == 1
+
+    def test_badge_endpoint_reads_one_row(self, api_client, conversation, django_assert_num_queries):
+        conversation, patient, medecin = conversation
+        Message.objects.create(conversation=conversation, sender=patient, content='Bonjour')
+        Notification.objects.create(
+            medecin=medecin.medecin, type='article_valide', titre='Article validé', message='OK'
+        )
+        api_client.force_authenticate(user=medecin)
+
+        with django_assert_num_queries(1):
+            response = api_client.get('/api/badges/')
+
+        assert response.json() == {'messages': 1, 'notifications': 1, 'urgences': 0, 'total': 2}
+
+        api_client.post('/api/notifications/mark-all-as-read/')
+        assert api_client.get('/api/badges/').json()['notifications'] == 0
+
+    def test_counters_match_a_full_recount(self, conversation):
+        conversation, patient, medecin = conversation
+        messages = [
+            Message.objects.create(conversation=conversation, sender=patient, content=str(i)) for i in range(5)
+        ]
+        messages[0].delete()
+        Message.objects.filter(pk=messages[1].pk).update(is_read=True)
+        compteurs.messages_lus(medecin.pk, 1)
+
+        materialise = CompteurNonLus.objects.get(user=medecin).en_dict()
+        assert compteurs.recompter(medecin.pk).en_dict() == materialise
+
+    def test_delta_is_kept_when_counter_row_is_created_concurrently(self, conversation):
+        conversation, patient, medecin = conversation
+        # Ligne créée par un autre recomptage, qui ne voit pas l'écriture en cours
+        CompteurNonLus.objects.filter(user=medecin).delete()
+        CompteurNonLus.objects.create(user=medecin, messages=2, notifications=0, urgences=0)
+
+        with mock.patch('sante_app.compteurs._existants', return_value=set()):
+            compteurs.ajuster({medecin.pk: {'messages': 1}})
+
+        assert CompteurNonLus.objects.get(user=medecin).messages == 3
+
+    def test_badge_is_pushed_after_commit(self, conversation, django_capture_on_commit_callbacks):
+        conversation, patient, medecin = conversation
+        channel_layer = get_channel_layer()
+        canal = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(f'user_{medecin.pk}', canal)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            Message.objects.create(conversation=conversation, sender=patient, content='Nouveau')
+
+        evenement = async_to_sync(channel_layer.receive)(canal)
+        assert evenement['type'] == 'badge_update'
+        assert evenement['messages'] == 1
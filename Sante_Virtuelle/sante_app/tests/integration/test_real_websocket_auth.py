@@ -0,0 +1,137 @@
+import json
+import pytest
+from datetime import date, time
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from channels.routing import URLRouter
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+from sante_app import routing
+from sante_app.middleware import JWTAuthMiddlewareStack
+from sante_app.models import User, Consultation, ConsultationMessage
+
+application = JWTAuthMiddlewareStack(URLRouter(routing.websocket_urlpatterns))
+
+
+class WebsocketCommunicator(ApplicationCommunicator):
+    """Client WebSocket minimal (channels.testing dépend de daphne)"""
+
+    def __init__(self, application, url):
+        path, _, query_string = url.partition('?')
+        super().__init__(application, {
+            'type': 'websocket', 'path': path, 'query_string': query_string.encode(),
+            'headers': [], 'subprotocols': [],
+        })
+
+    async def connect(self):
+        await self.send_input({'type': 'websocket.connect'})
+        reponse = await self.receive_output(1)
+        return reponse['type'] == 'websocket.accept', None
+
+    async def send_json_to(self, data):
+        await self.send_input({'type': 'websocket.receive', 'text': json.dumps(data)})
+
+    async def receive_json_from(self):
+        return json.loads((await self.receive_output(1))['text'])
+
+    async def disconnect(self):
+        await self.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await self.wait(1)
+
+
+@pytest.fixture
+def consultation(db):
+    medecin = User.objects.create_user(
+        username='dr_ws', password='Test123!', role='medecin', first_name='Amadou', last_name='Ba'
+    )
+    patient = User.objects.create_user(username='patient_ws', password='Test123!', role='patient')
+    return Consultation.objects.create(
+        date=date.today(), heure=time(10, 0),
+        patient=patient.patient_profile, medecin=medecin.medecin
+    )
+
+
+def url_consultation(consultation, user, token=None):
+    url = f'/ws/consultation/{consultation.pk}/{user.id}/'
+    return f'{url}?token={token}' if token else url
+
+
+class TestRealWebsocketAuth:
+    """Poignée de main WebSocket authentifiée par JWT"""
+
+    def test_participant_connects_and_message_is_a_single_insert(self, consultation):
+        medecin = consultation.medecin.user
+
+        url = url_consultation(consultation, medecin, AccessToken.for_user(medecin))
+
+        @async_to_sync
+        async def echanger(contenu):
+            communicator = WebsocketCommunicator(application, url)
+            connected, _ = await communicator.connect()
+            assert connected
+            await communicator.send_json_to({'content': contenu})
+            recu = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return recu
+
+        echanger('Première connexion')
+        # Participants en cache : l'utilisateur du jeton puis l'INSERT du message
+        with CaptureQueriesContext(connection) as requetes:
+            recu = echanger('Bonjour')
+
+        assert recu['content'] == 'Bonjour'
+        assert recu['sender_name'] == 'Amadou Ba'
+        assert [q['sql'].split()[0] for q in requetes.captured_queries] == ['SELECT', 'INSERT']
+        assert ConsultationMessage.objects.filter(sender=medecin).count() == 2
+
+    def test_handshake_is_rejected_without_valid_token(self, consultation):
+        patient = consultation.patient.user
+        intrus = User.objects.create_user(username='intrus_ws', password='Test123!', role='patient')
+
+        @async_to_sync
+        async def connecter(url):
+            communicator = WebsocketCommunicator(application, url)
+            connected, _ = await communicator.connect()
+            await communicator.disconnect()
+            return connected
+
+        # Sans jeton, jeton invalide, identifiant d'URL usurpé, non-participant
+        assert not connecter(url_consultation(consultation, patient))
+        assert not connecter(url_consultation(consultation, patient, 'jeton-invalide'))
+        assert not connecter(url_consultation(consultation, patient, AccessToken.for_user(intrus)))
+        assert not connecter(url_consultation(consultation, intrus, AccessToken.for_user(intrus)))
+        assert connecter(url_consultation(consultation, patient, AccessToken.for_user(patient)))
+
+    def test_reconnections_reuse_cached_participants(self, consultation, django_assert_num_queries):
+        patient = consultation.patient.user
+        url = url_consultation(consultation, patient, AccessToken.for_user(patient))
+
+        @async_to_sync
+        async def connecter():
+            communicator = WebsocketCommunicator(application, url)
+            connected, _ = await communicator.connect()
+            await communicator.disconnect()
+            return connected
+
+        assert connecter()
+        # Une lecture de l'utilisateur par clé primaire par poignée de main
+        with django_assert_num_queries(5):
+            for _ in range(5):
+                assert connecter()
+
+    def test_deactivated_user_is_rejected_immediately(self, consultation):
+        patient = consultation.patient.user
+        url = url_consultation(consultation, patient, AccessToken.for_user(patient))
+
+        @async_to_sync
+        async def connecter():
+            communicator = WebsocketCommunicator(application, url)
+            connected, _ = await communicator.connect()
+            await communicator.disconnect()
+            return connected
+
+        assert connecter()
+        # update() : aucun signal, aucune invalidation de cache à attendre
+        User.objects.filter(pk=patient.pk).update(is_active=False)
+        assert not connecter()
@@ -50,6 +50,7 @@ urlpatterns = [
     path("medecins/mes-disponibilites/", views.MedecinViewSet.as_view({'get': 'mes_disponibilites'}), name="medecin-mes-disponibilites"),
     path("medecins/mes-indisponibilites/", views.MedecinViewSet.as_view({'get': 'mes_indisponibilites'}), name="medecin-mes-indisponibilites"),
     path("rendezvous/creneaux_disponibles/", views.RendezVousViewSet.as_view({'get': 'creneaux_disponibles'}), name="rendezvous-creneaux-disponibles"),
+    path("rendezvous/creneaux_disponibles_multi/", views.RendezVousViewSet.as_view({'get': 'creneaux_disponibles_multi'}), name="rendezvous-creneaux-disponibles-multi"),
 
     # User profile endpoints
     path("users/profile/", views.UserViewSet.as_view({'get': 'profile', 'put': 'update_profile', 'patch': 'update_profile'}), name="user-profile"),
@@ -93,6 +94,7 @@ urlpatterns = [
     # Health Facilities for Geolocation
     path('health-facilities/', views.health_facilities, name='health-facilities'),
     path('health-facilities/nearby/', views.nearby_health_facilities, name='nearby-health-facilities'),
+    path('health-facilities/geojson/', views.health_facilities_geojson, name='health-facilities-geojson'),
 
     # Auth routes
     path('auth/register/', RegisterView.as_view(), name="register"),
@@ -150,11 +152,13 @@ urlpatterns = [
     
     # === MESSAGING FUNCTIONALITY ===
     path('messages/conversations/', views.get_conversations, name='get-conversations'),
+    path('messages/inbox/', views.inbox, name='messages-inbox'),
     path('messages/conversations/create/', views.create_conversation, name='create-conversation'),
     path('messages/conversations/<int:conversation_id>/messages/', views.get_messages, name='get-messages'),
     path('messages/send/', views.send_message, name='send-message'),
     path('messages/<int:message_id>/mark-read/', views.mark_message_as_read, name='mark-message-read'),
     path('messages/unread-count/', views.get_unread_count, name='get-unread-count'),
+    path('badges/', views.badges, name='badges'),
     
     # === NOTIFICATIONS ===
     path('notifications/', views.NotificationListView.as_view(), name='notification-list'),
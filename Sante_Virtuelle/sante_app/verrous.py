@@ -0,0 +1,168 @@
+"""
+Coordination des tâches planifiées entre plusieurs processus.
+
+Sous gunicorn, chaque worker démarre son propre BackgroundScheduler (voir
+apps.py) : sans coordination, chaque tâche s'exécute autant de fois qu'il y a
+de workers. ``executer_tache`` enveloppe chaque tâche :
+
+1. Bail en base (BailTache) : le premier worker qui prend le bail d'une tâche
+   l'exécute, les autres sautent leur tour jusqu'à l'expiration du bail
+   (un peu moins que l'intervalle de la tâche). Si le worker qui l'a pris
+   s'arrête, un autre reprend la tâche à la période suivante.
+2. Sur PostgreSQL, un verrou consultatif (pg_try_advisory_lock) est tenu
+   pendant l'exécution : une exécution plus longue que son bail ne peut pas
+   chevaucher la suivante. Sur SQLite (tests, développement), le bail suffit.
+3. Chaque exécution est enregistrée dans ExecutionTache (durée, lignes lues,
+   envois, erreur). La tâche retourne un dict {'lues': ..., 'envois': ...}.
+   L'historique est purgé chaque nuit (``purger_historique``, tâche
+   ``task_history_purge``) au-delà de SCHEDULER_HISTORY_DAYS jours.
+
+Réglages (settings.py) :
+    SCHEDULER_COORDINATION   'bail' (défaut) ou 'aucune' (un seul processus)
+    SCHEDULER_LEASE_RATIO    fraction de l'intervalle couverte par le bail (0.9)
+    SCHEDULER_HISTORY_DAYS   jours d'historique ExecutionTache conservés (14)
+"""
+from contextlib import contextmanager
+from datetime import timedelta
+import hashlib
+import logging
+import os
+import socket
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PROPRIETAIRE = f"{socket.gethostname()}:{os.getpid()}"
+
+TAILLE_LOT_PURGE = 5000
+
+
+def _cle_verrou(nom):
+    """Clé bigint stable pour pg_try_advisory_lock"""
+    return int.from_bytes(hashlib.blake2b(nom.encode(), digest_size=8).digest(), 'big', signed=True)
+
+
+def prendre_bail(nom, duree, proprietaire=None):
+    """
+    Prend le bail ``nom`` pour ``duree`` (timedelta) s'il est libre ou expiré.
+    Retourne True si ce processus détient le bail.
+    """
+    from .models import BailTache
+
+    proprietaire = proprietaire or PROPRIETAIRE
+    maintenant = timezone.now()
+    expire_le = maintenant + duree
+    # Un seul UPDATE conditionnel : atomique quel que soit le nombre de workers
+    pris = BailTache.objects.filter(
+        Q(expire_le__lte=maintenant) | Q(proprietaire=proprietaire), nom=nom
+    ).update(proprietaire=proprietaire, expire_le=expire_le)
+    if pris:
+        return True
+
+    try:
+        with transaction.atomic():
+            BailTache.objects.create(nom=nom, proprietaire=proprietaire, expire_le=expire_le)
+        return True
+    except IntegrityError:
+        # Le bail existe et appartient à un autre worker
+        return False
+
+
+def rendre_bail(nom, proprietaire=None):
+    """Libère le bail immédiatement (arrêt propre du scheduler)"""
+    from .models import BailTache
+
+    BailTache.objects.filter(nom=nom, proprietaire=proprietaire or PROPRIETAIRE).update(expire_le=timezone.now())
+
+
+@contextmanager
+def verrou_consultatif(nom):
+    """Verrou consultatif PostgreSQL tenu pendant le bloc ; toujours accordé ailleurs"""
+    if connection.vendor != 'postgresql':
+        yield True
+        return
+
+    cle = _cle_verrou(nom)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [cle])
+        obtenu = cursor.fetchone()[0]
+    try:
+        yield obtenu
+    finally:
+        if obtenu:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [cle])
+
+
+def _fermer_connexions_obsoletes():
+    """Comme en fin de requête : les threads du scheduler ne passent pas par les signaux HTTP"""
+    if not connection.in_atomic_block:
+        close_old_connections()
+
+
+def executer_tache(nom, fonction, intervalle):
+    """
+    Exécute ``fonction`` si ce worker obtient le bail de la tâche ``nom``.
+    ``intervalle`` est la période de la tâche, en secondes.
+    Retourne l'ExecutionTache enregistrée, ou None si un autre worker s'en charge.
+    """
+    from .models import ExecutionTache
+
+    _fermer_connexions_obsoletes()
+    try:
+        if getattr(settings, 'SCHEDULER_COORDINATION', 'bail') == 'bail':
+            ratio = getattr(settings, 'SCHEDULER_LEASE_RATIO', 0.9)
+            if not prendre_bail(nom, timedelta(seconds=intervalle * ratio)):
+                return None
+
+        with verrou_consultatif(nom) as obtenu:
+            if not obtenu:
+                logger.info(f"⏭️ Tâche {nom} déjà en cours sur un autre worker")
+                return None
+
+            debut = timezone.now()
+            chrono = time.monotonic()
+            statut, erreur, stats = 'succes', '', {}
+            try:
+                stats = fonction() or {}
+            except Exception as e:
+                statut, erreur = 'echec', str(e)
+                logger.error(f"❌ Tâche {nom} en échec : {e}")
+
+            return ExecutionTache.objects.create(
+                tache=nom,
+                proprietaire=PROPRIETAIRE,
+                debut=debut,
+                duree_ms=int((time.monotonic() - chrono) * 1000),
+                statut=statut,
+                lignes_lues=stats.get('lues', 0),
+                envois=stats.get('envois', 0),
+                erreur=erreur,
+            )
+    finally:
+        _fermer_connexions_obsoletes()
+
+
+def purger_historique(jours=None):
+    """
+    Supprime les ExecutionTache de plus de ``jours`` jours (SCHEDULER_HISTORY_DAYS),
+    par lots pour ne pas verrouiller la table. Retourne le nombre de lignes supprimées.
+    """
+    from .models import ExecutionTache
+
+    jours = jours if jours is not None else getattr(settings, 'SCHEDULER_HISTORY_DAYS', 14)
+    anciennes = ExecutionTache.objects.filter(debut__lt=timezone.now() - timedelta(days=jours))
+    supprimees = 0
+    while True:
+        lot = list(anciennes.order_by().values_list('pk', flat=True)[:TAILLE_LOT_PURGE])
+        if not lot:
+            break
+        supprimees += ExecutionTache.objects.filter(pk__in=lot).delete()[0]
+    if supprimees:
+        logger.info(f"🧹 {supprimees} exécution(s) de tâche purgée(s)")
+    return supprimees
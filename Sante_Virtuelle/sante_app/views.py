@@ -1,10 +1,14 @@
 import logging  # Added logging import
+import math
+import re
 from django.shortcuts import render, get_object_or_404
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_GET
 from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
 from django.db.models import Q, Count, Case, When, IntegerField, Sum, Avg
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.contrib.auth import authenticate, get_user_model  # Added get_user_model import
 from django.contrib.auth.models import User
 import logging
@@ -36,6 +40,12 @@ from .serializers import (
     UserSerializer, RegisterSerializer  # Added UserSerializer and RegisterSerializer
 )
 from .permissions import IsMedecin
+from .availability import charger_journee, charger_periode, iter_creneaux_libres, jour_semaine
+from . import cache_public, compteurs, etablissements, geo, recherche, statistiques
+from .conflicts import check_appointment_conflict
+from .messagerie import (
+    TAILLE_PAGE_MESSAGES, TAILLE_PAGE_MESSAGES_MAX, boite_de_reception, marquer_conversation_lue, page_messages,
+)
 
 # Add these imports for admin statistics
 from datetime import date, timedelta, datetime, time as datetime_time
@@ -44,67 +54,6 @@ from .notifications import NotificationService
 
 logger = logging.getLogger(__name__)
 
-# Utility function for robust conflict detection
-def check_appointment_conflict(medecin_user, date_rdv, heure_rdv, duration_minutes, exclude_rdv_id=None):
-    """
-    Check if there's a conflict with existing appointments
-    Returns tuple: (has_conflict, conflicting_appointment)
-    """
-    # Calculate time range for the new appointment
-    new_start = datetime.combine(date_rdv, heure_rdv)
-    new_end = new_start + timedelta(minutes=duration_minutes)
-    
-    # Get existing appointments for this doctor on this date that are not cancelled or finished
-    existing_appointments = RendezVous.objects.filter(
-        medecin=medecin_user,
-        date=date_rdv
-    ).exclude(
-        statut__in=['CANCELLED', 'TERMINE']
-    )
-    
-    # Exclude the current appointment if we're updating
-    if exclude_rdv_id:
-        existing_appointments = existing_appointments.exclude(id=exclude_rdv_id)
-    
-    # Check each existing appointment for time overlap
-    for appointment in existing_appointments:
-        # Get the doctor's availability for this appointment's day to get the correct duration
-        appt_jour_semaine = appointment.date.strftime('%A').lower()
-        jour_mapping = {
-            'monday': 'lundi',
-            'tuesday': 'mardi',
-            'wednesday': 'mercredi',
-            'thursday': 'jeudi',
-            'friday': 'vendredi',
-            'saturday': 'samedi',
-            'sunday': 'dimanche'
-        }
-        appt_jour_fr = jour_mapping.get(appt_jour_semaine, '')
-        
-        try:
-            # Get the doctor's availability for this day to determine appointment duration
-            medecin = Medecin.objects.get(user=medecin_user)
-            appt_disponibilite = DisponibiliteMedecin.objects.get(
-                medecin=medecin, 
-                jour=appt_jour_fr, 
-                actif=True
-            )
-            appt_duree = timedelta(minutes=appt_disponibilite.duree_consultation)
-        except (Medecin.DoesNotExist, DisponibiliteMedecin.DoesNotExist):
-            # Fallback to default 30 minutes if no availability found
-            appt_duree = timedelta(minutes=30)
-        
-        # Calculate appointment time range
-        appt_start = datetime.combine(appointment.date, appointment.heure)
-        appt_end = appt_start + appt_duree
-        
-        # Check for time overlap using strict overlap detection
-        # Two intervals [a,b) and [c,d) overlap if a < d and c < b
-        if new_start < appt_end and appt_start < new_end:
-            return True, appointment
-    
-    return False, None
-
 # --------------------
 # Patients
 # --------------------
@@ -274,107 +223,41 @@ class MedecinViewSet(viewsets.ModelViewSet):
                 'error': str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    # Bornes de la recherche des prochains créneaux
+    PROCHAINS_CRENEAUX_HORIZON = 30
+    PROCHAINS_CRENEAUX_HORIZON_MAX = 90
+    PROCHAINS_CRENEAUX_LIMIT_MAX = 50
+
     @action(detail=True, methods=['get'], permission_classes=[AllowAny])
     def prochains_creneaux(self, request, pk=None):
         """
         Get next available slots for a doctor
-        Query parameters: limit (default 5)
+        Query parameters: limit (default 5), horizon (days, default 30)
         """
-        from .models import DisponibiliteMedecin, IndisponibiliteMedecin, RendezVous
         from django.utils import timezone
-        import datetime
-        
-        limit = int(request.query_params.get('limit', 5))
-        
+        from itertools import islice
+
+        try:
+            limit = int(request.query_params.get('limit', 5))
+            horizon = int(request.query_params.get('horizon', self.PROCHAINS_CRENEAUX_HORIZON))
+        except ValueError:
+            return Response({'error': 'limit et horizon doivent être des entiers'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, self.PROCHAINS_CRENEAUX_LIMIT_MAX))
+        horizon = max(1, min(horizon, self.PROCHAINS_CRENEAUX_HORIZON_MAX))
+
         try:
             # Get the doctor - pk is the user ID, not the medecin ID
             medecin = Medecin.objects.get(user_id=pk)
         except Medecin.DoesNotExist:
             return Response({'error': 'Médecin non trouvé'}, status=status.HTTP_404_NOT_FOUND)
-        
-        # Get all doctor's availabilities
-        disponibilites = DisponibiliteMedecin.objects.filter(medecin=medecin, actif=True)
-        
-        creneaux_trouves = []
-        current_date = timezone.now().date()
-        
-        # Try to find next available slots
-        for i in range(30):  # Check next 30 days
-            check_date = current_date + datetime.timedelta(days=i)
-            jour_semaine = check_date.strftime('%A').lower()
-            jour_mapping = {
-                'monday': 'lundi',
-                'tuesday': 'mardi',
-                'wednesday': 'mercredi',
-                'thursday': 'jeudi',
-                'friday': 'vendredi',
-                'saturday': 'samedi',
-                'sunday': 'dimanche',
-            }
-            
-            if jour_semaine in jour_mapping:
-                jour_fr = jour_mapping[jour_semaine]
-                
-                # Check if doctor has availability on this day
-                dispos_jour = disponibilites.filter(jour=jour_fr)
-                if not dispos_jour.exists():
-                    continue
-                
-                # For each availability slot on this day
-                for disponibilite in dispos_jour:
-                    # Check if there's an unavailability on this date
-                    if IndisponibiliteMedecin.objects.filter(
-                        medecin=medecin,
-                        date_debut__lte=check_date,
-                        date_fin__gte=check_date
-                    ).exists():
-                        continue  # Skip this day if there's an unavailability
-                    
-                    # Generate time slots for this day
-                    current_time = disponibilite.heure_debut
-                    while current_time < disponibilite.heure_fin:
-                        # Skip lunch break if it exists
-                        if (disponibilite.pause_dejeuner_debut and 
-                            disponibilite.pause_dejeuner_fin and
-                            disponibilite.pause_dejeuner_debut <= current_time < disponibilite.pause_dejeuner_fin):
-                            current_time = disponibilite.pause_dejeuner_fin
-                            continue
-                        
-                        # Check if this time slot is already booked
-                        heure_rdv = current_time
-                        fin_rdv = (datetime.datetime.combine(datetime.date.today(), current_time) + 
-                                  datetime.timedelta(minutes=disponibilite.duree_consultation)).time()
-                        
-                        # Check for conflicts with existing appointments
-                        conflit = RendezVous.objects.filter(
-                            medecin=medecin.user,
-                            date=check_date,
-                            heure__lt=fin_rdv,
-                            heure__gte=heure_rdv,
-                            statut__in=['PENDING', 'CONFIRMED']
-                        ).exists()
-                        
-                        if not conflit:
-                            # This slot is available
-                            creneaux_trouves.append({
-                                'date': check_date,
-                                'heure': current_time,
-                                'duree': disponibilite.duree_consultation
-                            })
-                        
-                        # Move to next time slot
-                        current_time = (datetime.datetime.combine(datetime.date.today(), current_time) + 
-                                       datetime.timedelta(minutes=disponibilite.duree_consultation)).time()
-                        
-                        # Stop if we've reached the limit
-                        if len(creneaux_trouves) >= limit:
-                            break
-                
-                # Stop if we've reached the limit
-                if len(creneaux_trouves) >= limit:
-                    break
-        
-        return Response(creneaux_trouves[:limit])
+
+        maintenant = timezone.now()
+        creneaux = islice(iter_creneaux_libres(medecin, maintenant.date(), horizon, maintenant), limit)
+
+        return Response([
+            {'date': date_creneau, 'heure': heure, 'duree': duree}
+            for date_creneau, heure, duree in creneaux
+        ])
 
 # --------------------
 # Rendez-vous
@@ -393,16 +276,22 @@ class RendezVousViewSet(viewsets.ModelViewSet):
     
     def get_serializer_class(self):
         return RendezVousSerializer
+
+    # Bornes de la recherche multi-médecins
+    MAX_JOURS_RECHERCHE = 31
+    MAX_MEDECINS_RECHERCHE = 50
     
     @action(detail=False, methods=['get'], url_path='creneaux_disponibles')
     def creneaux_disponibles(self, request):
         """
         Retourne les créneaux disponibles pour un médecin à une date donnée.
-        Un créneau est indisponible UNIQUEMENT si un RDV confirmé/en_attente existe.
+        Un créneau est indisponible si un RDV confirmé/en_attente existe, pendant la
+        pause déjeuner ou pendant une indisponibilité déclarée du médecin.
+        La grille de la journée est servie par le moteur de disponibilité (availability.py).
         """
         from django.utils import timezone
-        from datetime import datetime, timedelta, time
-        from .models import Medecin, DisponibiliteMedecin, RendezVous
+        from datetime import datetime
+        from .models import Medecin
 
         try:
             # 1. VALIDATION DES PARAMÈTRES
@@ -437,117 +326,25 @@ class RendezVousViewSet(viewsets.ModelViewSet):
 
             # 3. RÉCUPÉRER LE MÉDECIN
             try:
-                medecin = Medecin.objects.get(id=medecin_id)
+                medecin = Medecin.objects.select_related('user').get(id=medecin_id)
             except Medecin.DoesNotExist:
                 return Response({
                     'error': 'Médecin introuvable'
                 }, status=404)
 
-            # 1️⃣ APRÈS avoir récupéré l'objet Medecin :
-            print(f"🔍 Médecin trouvé: {medecin.user.get_full_name()} (Medecin.id={medecin.id}, User.id={medecin.user.id})")
-
-            # 4. RÉCUPÉRER LE JOUR DE LA SEMAINE
-            jours_mapping = {
-                0: 'lundi', 1: 'mardi', 2: 'mercredi', 3: 'jeudi',
-                4: 'vendredi', 5: 'samedi', 6: 'dimanche'
-            }
-            jour = jours_mapping[date_obj.weekday()]
-
-            # 5. RÉCUPÉRER LA DISPONIBILITÉ DU MÉDECIN POUR CE JOUR
-            disponibilite = DisponibiliteMedecin.objects.filter(
-                medecin=medecin,
-                jour=jour,
-                actif=True
-            ).first()
+            # 4. GRILLE DE LA JOURNÉE (cache, reconstruite seulement si absente)
+            journee = charger_journee(medecin, date_obj)
 
-            if not disponibilite:
+            if not journee.travaille:
                 return Response({
                     'date': date_str,
                     'medecin_id': medecin_id,
                     'slots': [],
-                    'message': f'Le médecin ne travaille pas le {jour}'
+                    'message': f'Le médecin ne travaille pas le {jour_semaine(date_obj)}'
                 }, status=200)
 
-            # 6. RÉCUPÉRER TOUS LES RDV CONFIRMÉS/EN_ATTENTE POUR CE MÉDECIN CE JOUR
-            rdv_existants = RendezVous.objects.filter(
-                medecin=medecin.user,  # Note: medecin is a User instance
-                date=date_obj,
-                statut__in=['CONFIRMED', 'PENDING']  # CRITIQUE: Inclure aussi PENDING
-            )
-
-            # 2️⃣ APRÈS avoir récupéré les RDV existants :
-            print(f"🔍 Recherche RDV pour date={date_obj}, medecin_user_id={medecin.user.id}")
-            print(f"📋 RDV existants trouvés: {rdv_existants.count()}")
-            for rdv in rdv_existants:
-                print(f"  ➡️ RDV #{rdv.numero}: {rdv.heure.strftime('%H:%M')} (Statut: {rdv.statut})")
-
-            # 3️⃣ APRÈS avoir construit heures_reservees :
-            heures_reservees = set()
-            for rdv in rdv_existants:
-                heure_str = rdv.heure.strftime('%H:%M')
-                heures_reservees.add(heure_str)
-            print(f"⏰ Heures réservées: {heures_reservees}")
-
-            # 7. GÉNÉRER TOUS LES CRÉNEAUX
-            slots = []
-            heure_debut = disponibilite.heure_debut
-            heure_fin = disponibilite.heure_fin
-            duree_minutes = disponibilite.duree_consultation or 30
-
-            current_time = datetime.combine(date_obj, heure_debut)
-            end_time = datetime.combine(date_obj, heure_fin)
-            delta = timedelta(minutes=duree_minutes)
-
-            maintenant = timezone.now()
-
-            while current_time < end_time:
-
-                heure_str = current_time.time().strftime('%H:%M')
-                
-                # 4️⃣ DANS la boucle de génération des créneaux, AJOUTE ce print :
-                est_reserve = heure_str in heures_reservees
-                
-                if est_reserve:  # Print seulement les créneaux réservés
-                    print(f"  🔴 Créneau {heure_str} → RÉSERVÉ (disponible=False)")
-                
-                print(f"🔍 Check créneau {heure_str} - Réservé: {est_reserve}")
-                
-                print(f"DEBUG: Checking slot {heure_str} for date {date_obj}")
-                print(f"DEBUG: Current time: {current_time.time()}, Now: {maintenant.time()}")
-
-                # VÉRIFICATIONS D'INDISPONIBILITÉ
-                est_disponible = True
-                motif_indisponibilite = None
-
-                # A. Vérifier si dans le passé (pour aujourd'hui)
-                if date_obj == maintenant.date():
-                    if current_time.time() <= maintenant.time():
-                        est_disponible = False
-                        motif_indisponibilite = "Heure passée"
-                        print(f"DEBUG: Slot {heure_str} is in the past. Current time: {maintenant.time()}")
-
-                # B. Vérifier pause déjeuner
-                if est_disponible and disponibilite.pause_dejeuner_debut and disponibilite.pause_dejeuner_fin:
-                    if disponibilite.pause_dejeuner_debut <= current_time.time() < disponibilite.pause_dejeuner_fin:
-                        est_disponible = False
-                        motif_indisponibilite = "Pause déjeuner"
-
-                # C. Vérifier si RDV existe déjà (CRITIQUE)
-                if est_disponible and est_reserve:
-                    est_disponible = False
-                    motif_indisponibilite = "Déjà réservé"
-                    print(f"DEBUG: Slot {heure_str} marked as unavailable because it's already booked")
-
-                slots.append({
-                    'heure': heure_str,
-                    'disponible': est_disponible,
-                    'motif_indisponibilite': motif_indisponibilite
-                })
-
-                current_time += delta
-
-            print(f"⏰ Créneaux générés: {slots}")
-            print(f"✅ {len(slots)} créneaux générés, {sum(1 for s in slots if s['disponible'])} disponibles")
+            # 5. CRÉNEAUX (les heures passées sont calculées à la lecture)
+            slots = journee.creneaux(timezone.now())
 
             return Response({
                 'date': date_str,
@@ -564,6 +361,82 @@ class RendezVousViewSet(viewsets.ModelViewSet):
                 'error': f'Erreur serveur: {str(e)}'
             }, status=500)
     
+    @action(detail=False, methods=['get'], url_path='creneaux_disponibles_multi')
+    def creneaux_disponibles_multi(self, request):
+        """
+        GET /api/rendezvous/creneaux_disponibles_multi/
+        Créneaux libres de plusieurs médecins sur une période, en une seule réponse.
+        Paramètres : specialite OU medecin_ids (ids Medecin séparés par des virgules),
+                     date_debut (YYYY-MM-DD), date_fin (optionnelle, max 31 jours)
+        """
+        from django.utils import timezone
+        from datetime import datetime
+
+        specialite = request.query_params.get('specialite')
+        medecin_ids = request.query_params.get('medecin_ids')
+        date_debut_str = request.query_params.get('date_debut')
+        date_fin_str = request.query_params.get('date_fin') or date_debut_str
+
+        if not date_debut_str or not (specialite or medecin_ids):
+            return Response({
+                'error': 'date_debut et specialite ou medecin_ids sont requis'
+            }, status=400)
+
+        try:
+            date_debut = datetime.strptime(date_debut_str, '%Y-%m-%d').date()
+            date_fin = datetime.strptime(date_fin_str, '%Y-%m-%d').date()
+        except ValueError:
+            return Response({
+                'error': 'Format de date invalide. Utilisez YYYY-MM-DD'
+            }, status=400)
+
+        maintenant = timezone.now()
+        date_debut = max(date_debut, maintenant.date())
+        if date_fin < date_debut:
+            return Response({
+                'error': 'Impossible de réserver dans le passé'
+            }, status=400)
+        if (date_fin - date_debut).days >= self.MAX_JOURS_RECHERCHE:
+            return Response({
+                'error': f'La période ne peut pas dépasser {self.MAX_JOURS_RECHERCHE} jours'
+            }, status=400)
+
+        medecins = Medecin.objects.select_related('user').order_by('id')
+        if medecin_ids:
+            try:
+                ids = [int(i) for i in medecin_ids.split(',') if i.strip()]
+            except ValueError:
+                return Response({'error': 'medecin_ids invalide'}, status=400)
+            medecins = medecins.filter(id__in=ids)
+        else:
+            medecins = medecins.filter(specialite__iexact=specialite)
+        medecins = list(medecins[:self.MAX_MEDECINS_RECHERCHE])
+
+        grilles = charger_periode(medecins, date_debut, date_fin)
+
+        resultats = []
+        for medecin in medecins:
+            jours = []
+            for journee in grilles[medecin.id]:
+                if not journee.travaille:
+                    continue
+                slots = [s['heure'] for s in journee.creneaux(maintenant) if s['disponible']]
+                if slots:
+                    jours.append({'date': journee.date.isoformat(), 'slots': slots})
+            resultats.append({
+                'medecin_id': medecin.id,
+                'medecin_user_id': medecin.user_id,
+                'medecin_nom': f"{medecin.user.first_name} {medecin.user.last_name}",
+                'specialite': medecin.specialite,
+                'jours': jours,
+            })
+
+        return Response({
+            'date_debut': date_debut.isoformat(),
+            'date_fin': date_fin.isoformat(),
+            'medecins': resultats,
+        }, status=200)
+
     @action(detail=False, methods=['get'], url_path='upcoming', permission_classes=[IsAuthenticated])
     def upcoming(self, request):
         """GET /api/rendezvous/upcoming/ - Rendez-vous à venir du patient"""
@@ -1289,7 +1162,7 @@ class ArticleViewSet(viewsets.ModelViewSet):
         
         # Increment view count for public access
         if hasattr(instance, 'incrementer_vues'):
-            instance.incrementer_vues()
+            instance.incrementer_vues(request)
             
         # Serialize and return the response
         serializer = self.get_serializer(instance)
@@ -1471,8 +1344,10 @@ class MarkNotificationAsReadView(APIView):
             # Get the medecin profile for the current user
             medecin = request.user.medecin
             notification = Notification.objects.get(pk=pk, medecin=medecin)
+            with transaction.atomic():
+                if Notification.objects.filter(pk=notification.pk, lu=False).update(lu=True):
+                    compteurs.notifications_lues(request.user.id, 1)
             notification.lu = True
-            notification.save()
             serializer = NotificationSerializer(notification)
             return Response(serializer.data)
         except Notification.DoesNotExist:
@@ -1488,7 +1363,9 @@ class MarkAllNotificationsAsReadView(APIView):
         try:
             # Get the medecin profile for the current user
             medecin = request.user.medecin
-            Notification.objects.filter(medecin=medecin, lu=False).update(lu=True)
+            with transaction.atomic():
+                marquees = Notification.objects.filter(medecin=medecin, lu=False).update(lu=True)
+                compteurs.notifications_lues(request.user.id, marquees)
             return Response({'message': 'Toutes les notifications ont été marquées comme lues'})
         except AttributeError:
             return Response({'error': 'Utilisateur non médecin'}, status=403)
@@ -1801,13 +1678,12 @@ def doctor_reschedule_appointment(request, pk):
                           status=status.HTTP_400_BAD_REQUEST)
         
         # Check if the doctor is already booked at this time slot (excluding the current appointment)
-        conflicting_appointments = RendezVous.objects.filter(
-            medecin=rdv.medecin,
-            date=new_date,
-            heure=new_heure
-        ).exclude(pk=pk).exclude(statut__in=['CANCELLED'])
+        try:
+            has_conflict, _ = check_appointment_conflict(rdv.medecin_id, new_date, new_heure, exclude_rdv_id=rdv.pk)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        if conflicting_appointments.exists():
+        if has_conflict:
             return Response({
                 "error": "Ce créneau est déjà réservé. Veuillez choisir un autre créneau."
             }, status=status.HTTP_400_BAD_REQUEST)
@@ -1828,7 +1704,13 @@ def doctor_reschedule_appointment(request, pk):
             rdv.original_date = old_date
             rdv.original_heure = old_heure
             
-        rdv.save()
+        try:
+            with transaction.atomic():
+                rdv.save()
+        except IntegrityError:
+            return Response({
+                "error": "Ce créneau est déjà réservé. Veuillez choisir un autre créneau."
+            }, status=status.HTTP_400_BAD_REQUEST)
         
         # Send notification to patient about the rescheduling
         NotificationService.send_appointment_reschedule(rdv, old_date, old_heure)
@@ -1968,6 +1850,13 @@ def propose_reschedule(request, pk):
         if not new_date or not new_heure:
             return Response({"error": "Veuillez fournir une nouvelle date et heure"}, status=400)
         
+        try:
+            has_conflict, _ = check_appointment_conflict(rdv.medecin_id, new_date, new_heure, exclude_rdv_id=rdv.pk)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        if has_conflict:
+            return Response({"error": "Ce créneau est déjà réservé. Veuillez choisir un autre créneau."}, status=400)
+        
         # Create a rescheduling request (doesn't change the original appointment yet)
         # In a real implementation, you might want to create a separate model for rescheduling requests
         # For now, we'll update the appointment with a special status
@@ -1982,7 +1871,11 @@ def propose_reschedule(request, pk):
         rdv.heure = new_heure
         rdv.statut = "RESCHEDULED"
         rdv.description = f"Demande de reprogrammation: {reason}" if reason else rdv.description
-        rdv.save()
+        try:
+            with transaction.atomic():
+                rdv.save()
+        except IntegrityError:
+            return Response({"error": "Ce créneau est déjà réservé. Veuillez choisir un autre créneau."}, status=400)
         
         # Send notification to the doctor about the rescheduling request
         NotificationService.send_reschedule_request(rdv)
@@ -1998,169 +1891,29 @@ def propose_reschedule(request, pk):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def admin_statistics(request):
-    """Statistiques pour le dashboard admin"""
-    try:
-        print(f"Admin statistics called by user: {request.user.username} with role: {request.user.role}")
-        # Vérifier que l'utilisateur est admin
-        if request.user.role != 'admin':
-            print(f"User {request.user.username} is not admin, role: {request.user.role}")
-            return Response({'error': 'Accès non autorisé'}, status=403)
-
-        today = date.today()
-        week_ago = today - timedelta(days=7)
-        month_ago = today - timedelta(days=30)
-        
-        print("Calculating statistics...")
-
-        # Test each model query individually to identify the issue
-        try:
-            total_users = User.objects.count()
-            print(f"Total users: {total_users}")
-        except Exception as e:
-            print(f"Error counting users: {e}")
-            total_users = 0
-
-        try:
-            total_patients = Patient.objects.count()
-            print(f"Total patients: {total_patients}")
-        except Exception as e:
-            print(f"Error counting patients: {e}")
-            total_patients = 0
-
-        try:
-            total_medecins = Medecin.objects.count()
-            print(f"Total medecins: {total_medecins}")
-        except Exception as e:
-            print(f"Error counting medecins: {e}")
-            total_medecins = 0
-
-        try:
-            total_rendez_vous = RendezVous.objects.count()
-            print(f"Total rendez_vous: {total_rendez_vous}")
-        except Exception as e:
-            print(f"Error counting rendez_vous: {e}")
-            total_rendez_vous = 0
-
-        try:
-            rendez_vous_today = RendezVous.objects.filter(date=today).count()
-            print(f"Rendez_vous today: {rendez_vous_today}")
-        except Exception as e:
-            print(f"Error counting rendez_vous today: {e}")
-            rendez_vous_today = 0
-
-        try:
-            rendez_vous_week = RendezVous.objects.filter(date__gte=week_ago).count()
-            print(f"Rendez_vous week: {rendez_vous_week}")
-        except Exception as e:
-            print(f"Error counting rendez_vous week: {e}")
-            rendez_vous_week = 0
-
-        try:
-            rendez_vous_month = RendezVous.objects.filter(date__gte=month_ago).count()
-            print(f"Rendez_vous month: {rendez_vous_month}")
-        except Exception as e:
-            print(f"Error counting rendez_vous month: {e}")
-            rendez_vous_month = 0
-
-        try:
-            rendez_vous_by_status = list(RendezVous.objects.values('statut').annotate(count=Count('id')))
-            print(f"Rendez_vous by status: {rendez_vous_by_status}")
-        except Exception as e:
-            print(f"Error getting rendez_vous by status: {e}")
-            rendez_vous_by_status = []
-
-        try:
-            new_users_week = User.objects.filter(date_joined__gte=week_ago).count()
-            print(f"New users week: {new_users_week}")
-        except Exception as e:
-            print(f"Error counting new users week: {e}")
-            new_users_week = 0
-
-        try:
-            new_users_month = User.objects.filter(date_joined__gte=month_ago).count()
-            print(f"New users month: {new_users_month}")
-        except Exception as e:
-            print(f"Error counting new users month: {e}")
-            new_users_month = 0
-
-        try:
-            total_consultations = Consultation.objects.count()
-            print(f"Total consultations: {total_consultations}")
-        except Exception as e:
-            print(f"Error counting consultations: {e}")
-            total_consultations = 0
-
-        try:
-            total_pathologies = Pathologie.objects.count()
-            print(f"Total pathologies: {total_pathologies}")
-        except Exception as e:
-            print(f"Error counting pathologies: {e}")
-            total_pathologies = 0
-
-        try:
-            total_medicaments = Medicament.objects.count()
-            print(f"Total medicaments: {total_medicaments}")
-        except Exception as e:
-            print(f"Error counting medicaments: {e}")
-            total_medicaments = 0
-
-        stats = {
-            'total_users': total_users,
-            'total_patients': total_patients,
-            'total_medecins': total_medecins,
-            'total_rendez_vous': total_rendez_vous,
-            'rendez_vous_today': rendez_vous_today,
-            'rendez_vous_week': rendez_vous_week,
-            'rendez_vous_month': rendez_vous_month,
-            'rendez_vous_by_status': rendez_vous_by_status,
-            'new_users_week': new_users_week,
-            'new_users_month': new_users_month,
-            'total_consultations': total_consultations,
-            'total_pathologies': total_pathologies,
-            'total_medicaments': total_medicaments,
-        }
+    """Statistiques pour le dashboard admin (agrégats en cache, voir statistiques.py)"""
+    if request.user.role != 'admin':
+        return Response({'error': 'Accès non autorisé'}, status=403)
 
-        print("Admin statistics completed successfully")
-        return Response(stats)
+    try:
+        return Response(statistiques.instantane('admin', statistiques.tableau_admin))
     except Exception as e:
-        import traceback
-        error_details = {
-            'error': str(e),
-            'type': type(e).__name__,
-            'traceback': traceback.format_exc()
-        }
-        print(f"Admin statistics error: {error_details}")
-        return Response(error_details, status=500)
+        logger.error(f"❌ Erreur statistiques admin : {e}")
+        return Response({'error': str(e), 'type': type(e).__name__}, status=500)
 
 # ---------- Public Statistics ----------
+def _reponse_publique(donnees):
+    """Réponse d'un endpoint anonyme : les proxys et navigateurs peuvent la garder un intervalle"""
+    response = Response(donnees)
+    patch_cache_control(response, public=True, max_age=getattr(settings, 'PUBLIC_CACHE_REFRESH', 60))
+    return response
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def public_statistics(request):
-    """Public statistics for the homepage (no authentication required)"""
-    from django.db.models import Count
-    from datetime import date, timedelta
-
-    today = date.today()
-    week_ago = today - timedelta(days=7)
-    month_ago = today - timedelta(days=30)
-
-    stats = {
-        'total_users': User.objects.count(),
-        'total_patients': Patient.objects.count(),
-        'total_doctors': Medecin.objects.count(),
-        'total_clinics': Clinique.objects.count(),
-        'total_pharmacies': Pharmacie.objects.count(),
-        'total_hospitals': Hopital.objects.count(),
-        'total_dentists': Dentiste.objects.count(),
-        'total_appointments': RendezVous.objects.count(),
-        'appointments_today': RendezVous.objects.filter(date=today).count(),
-        'appointments_week': RendezVous.objects.filter(date__gte=week_ago).count(),
-        'appointments_month': RendezVous.objects.filter(date__gte=month_ago).count(),
-        'new_users_week': User.objects.filter(date_joined__gte=week_ago).count(),
-        'new_users_month': User.objects.filter(date_joined__gte=month_ago).count(),
-    }
-
-    return Response(stats)
+    """Public statistics for the homepage (no authentication required), served from cache_public"""
+    return _reponse_publique(cache_public.lire('statistiques_publiques'))
 
 # ========== ARTICLES PUBLICS ==========
 
@@ -2178,13 +1931,9 @@ def articles_publics(request):
         articles = articles.filter(categorie=categorie)
 
     if search:
-        from django.db.models import Q
-        articles = articles.filter(
-            Q(titre__icontains=search) |
-            Q(contenu__icontains=search) |
-            Q(tags__icontains=search) |
-            Q(resume__icontains=search)
-        )
+        # Classés par pertinence plutôt que par date
+        articles = recherche.rechercher(articles, search)
+    articles = articles.select_related('auteur__user')
 
     # Pagination
     from rest_framework.pagination import PageNumberPagination
@@ -2204,7 +1953,7 @@ def article_detail_public(request, slug):
     """Détail d'un article public"""
     try:
         article = Article.objects.get(slug=slug, statut='valide')
-        article.incrementer_vues()
+        article.incrementer_vues(request)
         serializer = ArticleSerializer(article, context={'request': request})
         return Response(serializer.data)
     except Article.DoesNotExist:
@@ -2643,13 +2392,8 @@ class ArticleViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
     def statistiques(self, request):
         """Statistiques des articles pour le dashboard admin"""
-        stats = {
-            'total': Article.objects.count(),
-            'en_attente': Article.objects.filter(statut='en_attente').count(),
-            'valides': Article.objects.filter(statut='valide').count(),
-            'desactives': Article.objects.filter(statut='desactive').count(),
-            'brouillons': Article.objects.filter(statut='brouillon').count(),
-        }
+        tableau = statistiques.instantane('articles', statistiques.tableau_articles)
+        stats = {cle: tableau[cle] for cle in ('total', 'en_attente', 'valides', 'desactives', 'brouillons')}
         return Response(stats)
 
     @action(detail=True, methods=['delete'], permission_classes=[IsAdminUser])
@@ -2781,19 +2525,7 @@ def articles_statistics(request):
     if request.user.role != 'admin':
         return Response({'error': 'Accès réservé aux administrateurs'}, status=403)
 
-    from django.db.models import Count, Sum
-    stats = {
-        'total': Article.objects.count(),
-        'brouillons': Article.objects.filter(statut='brouillon').count(),
-        'en_attente': Article.objects.filter(statut='en_attente').count(),
-        'valides': Article.objects.filter(statut='valide').count(),
-        'refuses': Article.objects.filter(statut='refuse').count(),
-        'desactives': Article.objects.filter(statut='desactive').count(),
-        'total_vues': Article.objects.filter(statut='valide').aggregate(total=Sum('vues'))['total'] or 0,
-        'par_categorie': list(Article.objects.filter(statut='valide').values('categorie').annotate(count=Count('id')))
-    }
-
-    return Response(stats)
+    return Response(statistiques.instantane('articles', statistiques.tableau_articles))
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -2973,66 +2705,52 @@ def admin_delete_user(request, user_id):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def health_facilities(request):
-    """Liste de tous les centres de santé pour la carte"""
-    facilities = []
-
-    # Récupérer les hôpitaux
-    hopitaux = Hopital.objects.all()
-    for hopital in hopitaux:
-        facilities.append({
-            'id': f'hopital_{hopital.id}',
-            'nom': hopital.nom,
-            'type': 'hopital',
-            'adresse': getattr(hopital, 'adresse', ''),
-            'latitude': float(getattr(hopital, 'latitude', 14.6928)),
-            'longitude': float(getattr(hopital, 'longitude', -17.4467)),
-            'telephone': getattr(hopital, 'telephone', ''),
-            'horaires': getattr(hopital, 'horaires', ''),
-        })
-
-    # Récupérer les cliniques
-    cliniques = Clinique.objects.all()
-    for clinique in cliniques:
-        facilities.append({
-            'id': f'clinique_{clinique.id}',
-            'nom': clinique.nom,
-            'type': 'clinique',
-            'adresse': getattr(clinique, 'adresse', ''),
-            'latitude': float(getattr(clinique, 'latitude', 14.6928)),
-            'longitude': float(getattr(clinique, 'longitude', -17.4467)),
-            'telephone': getattr(clinique, 'telephone', ''),
-            'horaires': getattr(clinique, 'horaires', ''),
-        })
-
-    # Récupérer les pharmacies
-    pharmacies = Pharmacie.objects.all()
-    for pharmacie in pharmacies:
-        facilities.append({
-            'id': f'pharmacie_{pharmacie.id}',
-            'nom': pharmacie.nom,
-            'type': 'pharmacie',
-            'adresse': getattr(pharmacie, 'adresse', ''),
-            'latitude': float(getattr(pharmacie, 'latitude', 14.6928)),
-            'longitude': float(getattr(pharmacie, 'longitude', -17.4467)),
-            'telephone': getattr(pharmacie, 'telephone', ''),
-            'horaires': getattr(pharmacie, 'horaires', ''),
-        })
-
-    # Récupérer les dentistes
-    dentistes = Dentiste.objects.all()
-    for dentiste in dentistes:
-        facilities.append({
-            'id': f'dentiste_{dentiste.id}',
-            'nom': dentiste.nom,
-            'type': 'dentiste',
-            'adresse': getattr(dentiste, 'adresse', ''),
-            'latitude': float(getattr(dentiste, 'latitude', 14.6928)),
-            'longitude': float(getattr(dentiste, 'longitude', -17.4467)),
-            'telephone': getattr(dentiste, 'telephone', ''),
-            'horaires': getattr(dentiste, 'horaires', ''),
-        })
-
-    return Response(facilities)
+    """Liste de tous les centres de santé pour la carte (vue de lecture unifiée, servie par cache_public)"""
+    return _reponse_publique(cache_public.lire('centres_de_sante'))
+
+
+def _accepte_gzip(request):
+    """Accept-Encoding autorise gzip : qualité > 0 pour gzip, sinon pour '*' (``gzip;q=0`` le refuse)"""
+    qualites = {}
+    for element in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        codage, *parametres = element.split(';')
+        codage = codage.strip().lower()
+        if not codage:
+            continue
+        qualite = 1.0
+        for parametre in parametres:
+            nom, _, valeur = parametre.partition('=')
+            if nom.strip().lower() == 'q':
+                try:
+                    qualite = float(valeur)
+                except ValueError:
+                    qualite = 0.0
+        qualites[codage] = qualite
+    return qualites.get('gzip', qualites.get('x-gzip', qualites.get('*', 0.0))) > 0
+
+
+def _etag_geojson(request):
+    etag = cache_public.lire('centres_geojson')['etag']
+    # Une représentation par encodage : un ETag différent pour la version gzip
+    return f'{etag}-gzip' if _accepte_gzip(request) else etag
+
+
+@require_GET
+@condition(etag_func=_etag_geojson)
+def health_facilities_geojson(request):
+    """
+    Flux GeoJSON des centres de santé localisés, pour la carte. Versionné par
+    ETag : un client qui renvoie If-None-Match reçoit 304 tant que rien n'a changé.
+    """
+    flux = cache_public.lire('centres_geojson')
+    if _accepte_gzip(request):
+        response = HttpResponse(flux['gzip'], content_type='application/geo+json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(flux['corps'], content_type='application/geo+json')
+    patch_vary_headers(response, ['Accept-Encoding'])
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
 
 
 # -------------------- Admin Chatbot Management --------------------
@@ -3132,6 +2850,9 @@ def admin_chatbot_knowledge_base(request):
         return Response({'error': 'Accès réservé aux administrateurs'}, status=403)
     
     entries = ChatbotKnowledgeBase.objects.all().order_by('-created_at')
+    search = request.GET.get('search', '').strip()
+    if search:
+        entries = recherche.rechercher(entries, search)
     serializer = ChatbotKnowledgeBaseSerializer(entries, many=True)
     return Response(serializer.data)
 
@@ -3278,6 +2999,13 @@ def admin_reschedule_appointment(request, pk):
         if not new_date or not new_time:
             return Response({'error': 'Date et heure requises pour reprogrammer'}, status=400)
         
+        try:
+            has_conflict, _ = check_appointment_conflict(appointment.medecin_id, new_date, new_time, exclude_rdv_id=appointment.pk)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=400)
+        if has_conflict:
+            return Response({'error': 'Ce créneau est déjà réservé. Veuillez choisir un autre créneau.'}, status=400)
+        
         # Store old values for notification
         old_date = appointment.date
         old_time = appointment.heure
@@ -3287,7 +3015,11 @@ def admin_reschedule_appointment(request, pk):
         appointment.date = new_date
         appointment.heure = new_time
         appointment.statut = 'RESCHEDULED'
-        appointment.save()
+        try:
+            with transaction.atomic():
+                appointment.save()
+        except IntegrityError:
+            return Response({'error': 'Ce créneau est déjà réservé. Veuillez choisir un autre créneau.'}, status=400)
         
         # Send reschedule notification if not already rescheduled
         if old_status != 'RESCHEDULED':
@@ -3308,58 +3040,10 @@ def admin_appointments_statistics(request):
     if request.user.role != 'admin':
         return Response({'error': 'Accès réservé aux administrateurs'}, status=403)
     
-    from django.db.models import Count
-    from datetime import date, timedelta
-    
-    today = date.today()
-    week_ago = today - timedelta(days=7)
-    month_ago = today - timedelta(days=30)
-    
-    stats = {
-        'total_appointments': RendezVous.objects.count(),
-        'today_appointments': RendezVous.objects.filter(date=today).count(),
-        'week_appointments': RendezVous.objects.filter(date__gte=week_ago).count(),
-        'month_appointments': RendezVous.objects.filter(date__gte=month_ago).count(),
-        'appointments_by_status': list(RendezVous.objects.values('statut').annotate(count=Count('id'))),
-        'confirmed_appointments': RendezVous.objects.filter(statut='CONFIRMED').count(),
-        'cancelled_appointments': RendezVous.objects.filter(statut='CANCELLED').count(),
-        'rescheduled_appointments': RendezVous.objects.filter(statut='RESCHEDULED').count(),
-        'pending_appointments': RendezVous.objects.filter(statut='PENDING').count(),
-        'completed_appointments': RendezVous.objects.filter(statut='TERMINE').count(),
-    }
-    
-    return Response(stats)
+    return Response(statistiques.instantane('rendez_vous', statistiques.tableau_rendez_vous))
 
 
 # -------------------- Messaging Functionality --------------------
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def get_conversations(request):
-    """Get all conversations for the current user"""
-    conversations = request.user.conversations.all()
-    serializer = ConversationSerializer(conversations, many=True, context={'request': request})
-    return Response(serializer.data)
-
-
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def get_messages(request, conversation_id):
-    """Get all messages for a specific conversation"""
-    try:
-        conversation = Conversation.objects.get(id=conversation_id, participants=request.user)
-        messages = conversation.messages.all()
-        
-        # Mark messages as read (except those sent by the current user)
-        for message in messages:
-            if message.sender != request.user and not message.is_read:
-                message.mark_as_read()
-        
-        serializer = MessageSerializer(messages, many=True, context={'request': request})
-        return Response(serializer.data)
-    except Conversation.DoesNotExist:
-        return Response({"error": "Conversation non trouvée"}, status=404)
-
-
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_conversation(request):
@@ -3435,7 +3119,10 @@ def mark_message_as_read(request, message_id):
     """Mark a message as read"""
     try:
         message = Message.objects.get(id=message_id, conversation__participants=request.user)
-        message.mark_as_read()
+        if message.sender_id != request.user.id:
+            with transaction.atomic():
+                if Message.objects.filter(pk=message.pk, is_read=False).update(is_read=True, read_at=timezone.now()):
+                    compteurs.messages_lus(request.user.id, 1)
         return Response({"message": "Message marqué comme lu"})
     except Message.DoesNotExist:
         return Response({"error": "Message non trouvé"}, status=404)
@@ -3444,13 +3131,15 @@ def mark_message_as_read(request, message_id):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_unread_count(request):
-    """Get unread messages count for the current user"""
-    unread_count = Message.objects.filter(
-        conversation__participants=request.user,
-        is_read=False
-    ).exclude(sender=request.user).count()
-    
-    return Response({"unread_count": unread_count})
+    """Get unread messages count for the current user (compteur matérialisé)"""
+    return Response({"unread_count": compteurs.lire(request.user.id).messages})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def badges(request):
+    """Compteurs de non-lus (messages, notifications, urgences) : une seule ligne lue"""
+    return Response(compteurs.lire(request.user.id).en_dict())
 
 
 # -------------------- Admin Appointment Management --------------------
@@ -3565,29 +3254,61 @@ def admin_cancel_appointment(request, pk):
 @permission_classes([IsAuthenticated])
 def get_conversations(request):
     """Get all conversations for the current user"""
-    conversations = request.user.conversations.all()
+    conversations = boite_de_reception(request.user)
     serializer = ConversationSerializer(conversations, many=True, context={'request': request})
     return Response(serializer.data)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def inbox(request):
+    """Boîte de réception paginée par curseur (?cursor=..., ?limit=...)"""
+    from rest_framework.pagination import CursorPagination
+    paginator = CursorPagination()
+    paginator.ordering = ('-updated_at', '-id')
+    paginator.page_size = 20
+    paginator.page_size_query_param = 'limit'
+    paginator.max_page_size = 100
+
+    page = paginator.paginate_queryset(boite_de_reception(request.user), request)
+    serializer = ConversationSerializer(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_messages(request, conversation_id):
-    """Get all messages for a specific conversation"""
+    """
+    Messages d'une conversation, paginés par curseur (du plus récent au plus ancien) :
+    ?before=<id> pour l'historique, ?after=<id> pour les nouveaux messages, ?limit=<n>.
+    Les messages reçus sont marqués comme lus en un seul UPDATE.
+    """
     try:
         conversation = Conversation.objects.get(id=conversation_id, participants=request.user)
-        messages = conversation.messages.all()
-        
-        # Mark messages as read (except those sent by the current user)
-        for message in messages:
-            if message.sender != request.user and not message.is_read:
-                message.mark_as_read()
-        
-        serializer = MessageSerializer(messages, many=True, context={'request': request})
-        return Response(serializer.data)
     except Conversation.DoesNotExist:
         return Response({"error": "Conversation non trouvée"}, status=404)
 
+    try:
+        before = int(request.query_params['before']) if 'before' in request.query_params else None
+        after = int(request.query_params['after']) if 'after' in request.query_params else None
+        limit = int(request.query_params.get('limit', TAILLE_PAGE_MESSAGES))
+    except ValueError:
+        return Response({"error": "Paramètres before, after et limit : entiers attendus"}, status=400)
+    limit = max(1, min(limit, TAILLE_PAGE_MESSAGES_MAX))
+
+    # Mark messages as read (except those sent by the current user)
+    marquer_conversation_lue(conversation, request.user)
+
+    messages, has_more = page_messages(conversation, before=before, after=after, limit=limit)
+    serializer = MessageSerializer(messages, many=True, context={'request': request})
+    return Response({
+        "results": serializer.data,
+        "has_more": has_more,
+        # Curseurs pour la page suivante (plus ancienne) et les nouveaux messages
+        "before": messages[-1].id if messages else before,
+        "after": messages[0].id if messages else after,
+    })
+
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -3730,19 +3451,25 @@ def urgences_patient(request):
 
 
 def notifier_medecins_urgence(urgence):
-    """Envoyer des notifications aux médecins disponibles"""
+    """Envoyer des notifications aux médecins disponibles (en lot)"""
+    from django.conf import settings
+    from .notifications import NotificationService
+
     # Récupérer les médecins disponibles (vous pouvez affiner la logique)
-    medecins = Medecin.objects.filter(disponibilite='disponible')[:5]  # Top 5
+    limite = getattr(settings, 'URGENCE_MAX_MEDECINS_NOTIFIES', 5)
+    medecins = Medecin.objects.filter(disponibilite=True).select_related('user')
+    if limite:
+        medecins = medecins[:limite]
+    medecins = list(medecins)
 
-    for medecin in medecins:
-        NotificationUrgence.objects.create(
-            urgence=urgence,
-            medecin=medecin
-        )
+    with transaction.atomic():
+        NotificationUrgence.objects.bulk_create([
+            NotificationUrgence(urgence=urgence, medecin=medecin) for medecin in medecins
+        ])
+        compteurs.urgences_notifiees([medecin.user_id for medecin in medecins])
 
-        # Envoyer email au médecin
-        from .notifications import NotificationService
-        NotificationService.send_urgence_notification_medecin(urgence, medecin)
+    # Emails aux médecins : un seul INSERT dans l'outbox, envoyés sur une connexion SMTP partagée
+    NotificationService.send_urgence_notification_medecins(urgence, medecins)
 
 
 # ========== URGENCES MÉDECIN ==========
@@ -3859,9 +3586,11 @@ def notification_marquer_lue(request, pk):
         medecin = Medecin.objects.get(user=request.user)
         notification = NotificationUrgence.objects.get(pk=pk, medecin=medecin)
 
-        notification.lue = True
-        notification.date_lecture = timezone.now()
-        notification.save()
+        with transaction.atomic():
+            if NotificationUrgence.objects.filter(pk=notification.pk, lue=False).update(
+                lue=True, date_lecture=timezone.now()
+            ):
+                compteurs.urgences_lues(request.user.id, 1)
 
         return Response({'message': 'Notification marquée comme lue'})
     except NotificationUrgence.DoesNotExist:
@@ -3877,15 +3606,7 @@ def urgences_admin_dashboard(request):
     if request.user.role != 'admin':
         return Response({'error': 'Accès réservé aux administrateurs'}, status=403)
 
-    stats = {
-        'total': Urgence.objects.count(),
-        'en_attente': Urgence.objects.filter(statut='en_attente').count(),
-        'prise_en_charge': Urgence.objects.filter(statut='prise_en_charge').count(),
-        'resolues': Urgence.objects.filter(statut='resolue').count(),
-        'critiques': Urgence.objects.filter(priorite='critique', statut__in=['en_attente', 'prise_en_charge']).count(),
-        'par_priorite': list(Urgence.objects.values('priorite').annotate(count=models.Count('id'))),
-        'temps_moyen_prise_en_charge': 'À calculer',  # TODO
-    }
+    stats = statistiques.instantane('urgences', statistiques.tableau_urgences)
 
     # Urgences récentes
     urgences_recentes = Urgence.objects.all().order_by('-date_creation')[:10]
@@ -3972,12 +3693,8 @@ def search(request):
             'appointments': []
         })
     
-    # Search doctors
-    doctors = Medecin.objects.filter(
-        Q(user__first_name__icontains=query) |
-        Q(user__last_name__icontains=query) |
-        Q(specialite__icontains=query)
-    )[:10]
+    # Search doctors (full-text index, see recherche.py)
+    doctors = recherche.rechercher(Medecin.objects.select_related('user'), query)[:10]
     
     doctors_data = []
     for doctor in doctors:
@@ -3991,7 +3708,7 @@ def search(request):
     # Search patients (only for authenticated users with proper permissions)
     patients_data = []
     if request.user.is_authenticated and request.user.role in ['medecin', 'admin']:
-        patients = Patient.objects.filter(
+        patients = Patient.objects.select_related("user").filter(
             Q(user__first_name__icontains=query) |
             Q(user__last_name__icontains=query)
         )[:10]
@@ -4004,13 +3721,10 @@ def search(request):
                 'lastVisit': '2023-10-15'  # In a real implementation, this would be from actual data
             })
     
-    # Search articles
-    articles = Article.objects.filter(
-        Q(titre__icontains=query) |
-        Q(contenu__icontains=query) |
-        Q(resume__icontains=query) |
-        Q(tags__icontains=query)
-    ).filter(statut='valide')[:10]
+    # Search articles, best matches first
+    articles = recherche.rechercher(
+        Article.objects.filter(statut='valide').select_related('auteur__user'), query
+    )[:10]
     
     articles_data = []
     for article in articles:
@@ -4040,14 +3754,14 @@ def search(request):
             appointments = appointments.filter(medecin=request.user)
         # Admin can see all appointments
         
-        appointments = appointments[:10]
+        appointments = appointments.select_related('patient', 'medecin__medecin')[:10]
         
         for appointment in appointments:
             appointments_data.append({
-                'id': appointment.id,
+                'id': appointment.pk,
                 'patient': f"{appointment.patient.first_name} {appointment.patient.last_name}",
                 'doctor': f"Dr. {appointment.medecin.first_name} {appointment.medecin.last_name}",
-                'specialty': getattr(appointment.medecin.medecin_profile, 'specialite', '') if hasattr(appointment.medecin, 'medecin_profile') else '',
+                'specialty': getattr(getattr(appointment.medecin, 'medecin', None), 'specialite', ''),
                 'date': appointment.date.strftime('%Y-%m-%d') if appointment.date else '',
                 'time': appointment.heure.strftime('%H:%M') if appointment.heure else '',
                 'status': appointment.get_statut_display()
@@ -4064,101 +3778,46 @@ def search(request):
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def nearby_health_facilities(request):
-    """Liste des centres de santé à proximité d'une position donnée"""
+    """
+    Centres de santé à proximité d'une position, du plus proche au plus éloigné.
+
+    Paramètres : lat, lng, radius (km, 10 par défaut), k (les k plus proches ;
+    sans radius, quelle que soit la distance), type (un ou plusieurs types
+    séparés par des virgules), page / page_size (réponse paginée).
+    """
     try:
         lat = float(request.GET.get('lat', 14.6937))
         lng = float(request.GET.get('lng', -17.444))
-        radius = float(request.GET.get('radius', 10))  # Rayon en km, par défaut 10km
+        k = int(request.GET['k']) if request.GET.get('k') else None
+        if k is not None and 'radius' not in request.GET:
+            radius = None
+        else:
+            radius = float(request.GET.get('radius', 10))  # Rayon en km, par défaut 10km
     except ValueError:
         return Response({'error': 'Paramètres de localisation invalides'}, status=400)
-    
-    # Fonction pour calculer la distance entre deux points (formule de Haversine)
-    def calculate_distance(lat1, lon1, lat2, lon2):
-        from math import radians, cos, sin, asin, sqrt
-        # Convertir les degrés en radians
-        lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-        
-        # Formule de Haversine
-        dlon = lon2 - lon1
-        dlat = lat2 - lat1
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * asin(sqrt(a))
-        r = 6371  # Rayon de la Terre en km
-        return c * r
-    
-    # Récupérer tous les centres de santé
-    facilities = []
-    
-    # Récupérer les hôpitaux
-    hopitaux = Hopital.objects.all()
-    for hopital in hopitaux:
-        if hopital.latitude and hopital.longitude:
-            distance = calculate_distance(lat, lng, float(hopital.latitude), float(hopital.longitude))
-            if distance <= radius:
-                facilities.append({
-                    'id': f'hopital_{hopital.id}',
-                    'nom': hopital.nom,
-                    'type': 'hopital',
-                    'adresse': getattr(hopital, 'adresse', ''),
-                    'latitude': float(hopital.latitude),
-                    'longitude': float(hopital.longitude),
-                    'telephone': getattr(hopital, 'telephone', ''),
-                    'horaires': getattr(hopital, 'horaires', ''),
-                    'distance': round(distance, 2)
-                })
-
-    # Récupérer les cliniques
-    cliniques = Clinique.objects.all()
-    for clinique in cliniques:
-        if clinique.latitude and clinique.longitude:
-            distance = calculate_distance(lat, lng, float(clinique.latitude), float(clinique.longitude))
-            if distance <= radius:
-                facilities.append({
-                    'id': f'clinique_{clinique.id}',
-                    'nom': clinique.nom,
-                    'type': 'clinique',
-                    'adresse': getattr(clinique, 'adresse', ''),
-                    'latitude': float(clinique.latitude),
-                    'longitude': float(clinique.longitude),
-                    'telephone': getattr(clinique, 'telephone', ''),
-                    'horaires': getattr(clinique, 'horaires', ''),
-                    'distance': round(distance, 2)
-                })
-
-    # Récupérer les pharmacies
-    pharmacies = Pharmacie.objects.all()
-    for pharmacie in pharmacies:
-        if pharmacie.latitude and pharmacie.longitude:
-            distance = calculate_distance(lat, lng, float(pharmacie.latitude), float(pharmacie.longitude))
-            if distance <= radius:
-                facilities.append({
-                    'id': f'pharmacie_{pharmacie.id}',
-                    'nom': pharmacie.nom,
-                    'type': 'pharmacie',
-                    'adresse': getattr(pharmacie, 'adresse', ''),
-                    'latitude': float(pharmacie.latitude),
-                    'longitude': float(pharmacie.longitude),
-                    'telephone': getattr(pharmacie, 'telephone', ''),
-                    'horaires': getattr(pharmacie, 'horaires', ''),
-                    'distance': round(distance, 2)
-                })
+    # float() accepte nan, inf et 1e308 : la position doit être finie et sur le globe
+    coordonnees_valides = (
+        math.isfinite(lat) and math.isfinite(lng) and -90 <= lat <= 90 and -180 <= lng <= 180
+    )
+    rayon_valide = radius is None or (math.isfinite(radius) and radius >= 0)
+    if not coordonnees_valides or not rayon_valide or (k is not None and k < 1):
+        return Response({'error': 'Paramètres de localisation invalides'}, status=400)
 
-    # Récupérer les dentistes
-    dentistes = Dentiste.objects.all()
-    for dentiste in dentistes:
-        if dentiste.latitude and dentiste.longitude:
-            distance = calculate_distance(lat, lng, float(dentiste.latitude), float(dentiste.longitude))
-            if distance <= radius:
-                facilities.append({
-                    'id': f'dentiste_{dentiste.id}',
-                    'nom': dentiste.nom,
-                    'type': 'dentiste',
-                    'adresse': getattr(dentiste, 'adresse', ''),
-                    'latitude': float(dentiste.latitude),
-                    'longitude': float(dentiste.longitude),
-                    'telephone': getattr(dentiste, 'telephone', ''),
-                    'horaires': getattr(dentiste, 'horaires', ''),
-                    'distance': round(distance, 2)
-                })
+    types = {t for t in request.GET.get('type', '').split(',') if t}
+    if types - set(geo.TYPES):
+        return Response({'error': f"Type inconnu, attendu : {', '.join(geo.TYPES)}"}, status=400)
+
+    facilities = [
+        {**centre, 'distance': round(distance, 2)}
+        for centre, distance in geo.proches(lat, lng, rayon=radius, k=k, types=types or None)
+    ]
+
+    if 'page' in request.GET or 'page_size' in request.GET:
+        from rest_framework.pagination import PageNumberPagination
+        paginator = PageNumberPagination()
+        paginator.page_size = 20
+        paginator.page_size_query_param = 'page_size'
+        paginator.max_page_size = 100
+        return paginator.get_paginated_response(paginator.paginate_queryset(facilities, request))
 
     return Response(facilities)
\ No newline at end of file
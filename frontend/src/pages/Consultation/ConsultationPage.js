@@ -74,7 +74,8 @@ function ConsultationPage() {
     if (!user || !id) return;
 
     // Connect to WebSocket
-    const wsUrl = `ws://localhost:8000/ws/consultation/${id}/${user.id}/`;
+    const token = localStorage.getItem("access_token");
+    const wsUrl = `ws://localhost:8000/ws/consultation/${id}/${user.id}/?token=${token}`;
     webSocketService.connect(wsUrl);
 
     // Listen for messages
@@ -72,7 +72,8 @@ const Messagerie = () => {
   const loadMessages = async (conversationId) => {
     try {
       const response = await messageAPI.getMessages(conversationId);
-      setMessages(response.data);
+      // Page la plus récente, renvoyée du plus récent au plus ancien
+      setMessages(response.data.results.slice().reverse());
 
       // Recharger les conversations pour mettre à jour unread_count
       loadConversations();
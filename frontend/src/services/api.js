@@ -400,13 +400,15 @@ export const appointmentAPI = {
 // Message APIs
 export const messageAPI = {
   getConversations: () => api.get("messages/conversations/"),
-  getMessages: (conversationId) =>
-    api.get(`messages/conversations/${conversationId}/messages/`),
+  getInbox: (params = {}) => api.get("messages/inbox/", { params }),
+  getMessages: (conversationId, params = {}) =>
+    api.get(`messages/conversations/${conversationId}/messages/`, { params }),
   createConversation: (data) =>
     api.post("messages/conversations/create/", data),
   sendMessage: (data) => api.post("messages/send/", data),
   markMessageAsRead: (messageId) => api.put(`messages/${messageId}/mark-read/`),
   getUnreadCount: () => api.get("messages/unread-count/"),
+  getBadges: () => api.get("badges/"),
 };
 
 // Hospital APIs